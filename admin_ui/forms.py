@@ -91,8 +91,16 @@ class APIConfigurationForm(forms.ModelForm):
             'authentication', 
             'rate_limit_enabled', 
             'rate_limit', 
+            'rate_limit_mode', 
             'max_retries', 
             'retry_backoff', 
+            'connect_timeout', 
+            'read_timeout', 
+            'total_timeout', 
+            'max_concurrent_requests', 
+            'request_compression', 
+            'compression_min_size', 
+            'accept_encoding', 
             'default_headers', 
             'is_active'
         ]
@@ -101,7 +109,8 @@ class APIConfigurationForm(forms.ModelForm):
             'default_headers': forms.Textarea(attrs={'rows': 5}), # Use Textarea for JSON
         }
         help_texts = {
-            'rate_limit': 'Format: number/timeunit (e.g., 100/hour, 5/second).',
+            'rate_limit': 'Format: number/timeunit, several limits separated by ";" and an optional burst '
+                          '(e.g., 100/hour, 10/second;1000/hour, 300/15minute, 100/hour burst=10).',
             'default_headers': 'Enter default HTTP headers as JSON.',
         }
 
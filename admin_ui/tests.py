@@ -1,3 +1,31 @@
 from django.test import TestCase
 
-# Create your tests here.
+from .forms import APIConfigurationForm
+
+
+class APIConfigurationFormTests(TestCase):
+
+    def test_compression_settings_are_editable(self):
+        form = APIConfigurationForm(data={
+            'name': 'api',
+            'base_url': 'https://api.example.com',
+            'rate_limit': '100/hour',
+            'rate_limit_mode': 'fail',
+            'max_retries': 3,
+            'connect_timeout': 5,
+            'read_timeout': 30,
+            'total_timeout': 120,
+            'max_concurrent_requests': 10,
+            'request_compression': 'gzip',
+            'compression_min_size': 512,
+            'accept_encoding': 'gzip',
+            'default_headers': '{}',
+            'is_active': True,
+        })
+
+        self.assertTrue(form.is_valid(), form.errors)
+        api_config = form.save()
+        self.assertEqual(
+            (api_config.request_compression, api_config.compression_min_size, api_config.accept_encoding),
+            ('gzip', 512, 'gzip')
+        )
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
-from .models import APIAuthentication, APIConfiguration, APIEndpoint, FunctionDefinition
+from .models import APIAuthentication, APIConfiguration, APIEndpoint, FunctionDefinition, IdempotencyRecord
 
 class APIEndpointInline(admin.TabularInline):
     model = APIEndpoint
@@ -50,14 +50,24 @@ class APIConfigurationAdmin(admin.ModelAdmin):
             'fields': ('name', 'description', 'base_url', 'authentication', 'is_active')
         }),
         (_('Rate Limiting'), {
-            'fields': ('rate_limit_enabled', 'rate_limit'),
+            'fields': ('rate_limit_enabled', 'rate_limit', 'rate_limit_mode'),
         }),
         (_('Retry Configuration'), {
             'fields': ('max_retries', 'retry_backoff'),
         }),
+        (_('Timeouts'), {
+            'fields': ('connect_timeout', 'read_timeout', 'total_timeout'),
+        }),
+        (_('Concurrency'), {
+            'fields': ('max_concurrent_requests',),
+        }),
         (_('Headers'), {
             'fields': ('default_headers',),
         }),
+        (_('Compression'), {
+            'fields': ('request_compression', 'compression_min_size', 'accept_encoding'),
+            'classes': ('collapse',),
+        }),
     )
 
 @admin.register(APIEndpoint)
@@ -75,7 +85,19 @@ class APIEndpointAdmin(admin.ModelAdmin):
             'classes': ('collapse',),
         }),
         (_('Response Configuration'), {
-            'fields': ('response_mapping',),
+            'fields': ('response_mapping', 'max_response_size', 'stream_response'),
+            'classes': ('collapse',),
+        }),
+        (_('Timeouts'), {
+            'fields': ('connect_timeout', 'read_timeout', 'total_timeout'),
+            'classes': ('collapse',),
+        }),
+        (_('Caching'), {
+            'fields': ('cache_enabled', 'cache_ttl'),
+            'classes': ('collapse',),
+        }),
+        (_('Hedging'), {
+            'fields': ('hedge_enabled', 'hedge_percentile'),
             'classes': ('collapse',),
         }),
     )
@@ -96,3 +118,10 @@ class FunctionDefinitionAdmin(admin.ModelAdmin):
             'fields': ('parameter_mapping',),
         }),
     )
+
+@admin.register(IdempotencyRecord)
+class IdempotencyRecordAdmin(admin.ModelAdmin):
+    list_display = ('key', 'endpoint', 'status', 'attempts', 'created_at', 'updated_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('key',)
+    readonly_fields = ('key', 'endpoint', 'status', 'attempts', 'locked_until', 'request', 'response', 'created_at', 'updated_at')
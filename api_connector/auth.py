@@ -0,0 +1,187 @@
+import base64
+import threading
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
+
+from .models import APIAuthentication
+from .oauth import get_token_manager
+
+EMPTY_HEADERS: Mapping[str, str] = MappingProxyType({})
+
+
+class AuthStrategy:
+    """
+    Authentication material of an APIAuthentication, resolved once
+
+    `headers` are part of the request dict (and therefore of logs and cache
+    keys); `wire_headers` are only sent on the wire, so credentials such as
+    Basic auth passwords are never recorded. Both are read-only and shared
+    by all calls.
+    """
+
+    __slots__ = ('auth_id', 'version', 'headers', 'wire_headers')
+
+    def __init__(
+        self,
+        auth: Optional[APIAuthentication] = None,
+        headers: Optional[Dict[str, str]] = None,
+        wire_headers: Optional[Dict[str, bytes]] = None
+    ):
+        """
+        Args:
+            auth: APIAuthentication the strategy was built from
+            headers: Headers recorded in the request dict
+            wire_headers: Headers only added when sending the request
+        """
+        self.auth_id = auth.pk if auth else None
+        self.version = auth.updated_at if auth else None
+        self.headers = MappingProxyType(headers) if headers else EMPTY_HEADERS
+        self.wire_headers = MappingProxyType(wire_headers) if wire_headers else EMPTY_HEADERS
+
+    def get_headers(self) -> Mapping[str, str]:
+        """
+        Get the headers recorded in the request dict
+        """
+        return self.headers
+
+    def is_ready(self) -> bool:
+        """
+        Check whether get_headers can answer without blocking
+        """
+        return True
+
+
+class OAuth2Strategy(AuthStrategy):
+    """
+    Bearer header for an OAuth 2.0 token kept valid by the token manager
+    """
+
+    __slots__ = ('auth', 'token_manager', '_token', '_token_headers')
+
+    def __init__(self, auth: APIAuthentication):
+        super().__init__(auth)
+        self.auth = auth
+        self.token_manager = get_token_manager()
+        self._token = None
+        self._token_headers = EMPTY_HEADERS
+
+    def get_headers(self) -> Mapping[str, str]:
+        token = self.token_manager.get_token(self.auth)
+
+        # Only build a new header mapping when the token changed
+        if token != self._token:
+            self._token_headers = MappingProxyType({'Authorization': f"Bearer {token}"})
+            self._token = token
+        return self._token_headers
+
+    def is_ready(self) -> bool:
+        return self.token_manager.has_valid_token(self.auth)
+
+
+NO_AUTH = AuthStrategy()
+
+
+def build_auth_strategy(auth: Optional[APIAuthentication]) -> AuthStrategy:
+    """
+    Resolve an APIAuthentication into an AuthStrategy
+
+    Args:
+        auth: APIAuthentication object or None
+
+    Returns:
+        AuthStrategy object
+    """
+    if auth is None:
+        return NO_AUTH
+
+    if auth.auth_type == 'api_key':
+        # API Key authentication
+        if auth.api_key and auth.api_key_name:
+            return AuthStrategy(auth, headers={auth.api_key_name: auth.api_key})
+
+    elif auth.auth_type == 'bearer':
+        # Bearer token authentication
+        if auth.token:
+            return AuthStrategy(auth, headers={'Authorization': f"Bearer {auth.token}"})
+
+    elif auth.auth_type == 'basic':
+        # Basic authentication, encoded like requests' HTTPBasicAuth
+        if auth.username and auth.password:
+            credentials = f"{auth.username}:{auth.password}".encode('latin1')
+            value = b'Basic ' + base64.b64encode(credentials)
+            return AuthStrategy(auth, wire_headers={'Authorization': value})
+
+    elif auth.auth_type == 'oauth2':
+        return OAuth2Strategy(auth)
+
+    return AuthStrategy(auth)
+
+
+class AuthStrategyCache:
+    """
+    Process-wide cache of AuthStrategy objects per APIAuthentication
+
+    Entries are invalidated by post_save/post_delete signals (see
+    api_connector.signals) and rebuilt when the record's updated_at changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._strategies: Dict[int, AuthStrategy] = {}
+
+    def get(self, auth: Optional[APIAuthentication]) -> AuthStrategy:
+        """
+        Get the strategy for an authentication
+
+        Args:
+            auth: APIAuthentication object or None
+
+        Returns:
+            AuthStrategy object
+        """
+        if auth is None:
+            return NO_AUTH
+
+        strategy = self._strategies.get(auth.pk)
+        if strategy is not None and strategy.version == auth.updated_at:
+            return strategy
+
+        strategy = build_auth_strategy(auth)
+        with self._lock:
+            self._strategies[auth.pk] = strategy
+        return strategy
+
+    def invalidate(self, auth_id: int) -> None:
+        """
+        Drop the strategy of an authentication
+        """
+        with self._lock:
+            self._strategies.pop(auth_id, None)
+
+    def clear(self) -> None:
+        """
+        Drop all strategies
+        """
+        with self._lock:
+            self._strategies.clear()
+
+
+_auth_strategies: Optional[AuthStrategyCache] = None
+_auth_strategies_lock = threading.Lock()
+
+
+def get_auth_strategies() -> AuthStrategyCache:
+    """
+    Get the process-wide auth strategy cache
+
+    Returns:
+        AuthStrategyCache object
+    """
+    global _auth_strategies
+
+    if _auth_strategies is None:
+        with _auth_strategies_lock:
+            if _auth_strategies is None:
+                _auth_strategies = AuthStrategyCache()
+
+    return _auth_strategies
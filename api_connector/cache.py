@@ -0,0 +1,406 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+from core import codec
+
+logger = logging.getLogger('api_hub.api_connector.cache')
+
+# Request headers that only make a request conditional and are not part of the cache key
+CONDITIONAL_HEADERS = ('If-None-Match', 'If-Modified-Since')
+
+
+class CacheEntry:
+    """
+    Cached response for a GET request
+    """
+
+    __slots__ = ('response', 'etag', 'last_modified', 'fresh_until')
+
+    def __init__(
+        self,
+        response: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        fresh_until: float = 0.0
+    ):
+        """
+        Args:
+            response: Response dict serialized as JSON
+            etag: ETag validator
+            last_modified: Last-Modified validator
+            fresh_until: Epoch time until which the response may be served without revalidation
+        """
+        self.response = response
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fresh_until = fresh_until
+
+    def is_fresh(self) -> bool:
+        return time.time() < self.fresh_until
+
+    def get_response(self) -> Dict[str, Any]:
+        """
+        Get a private copy of the cached response dict
+        """
+        response_dict = codec.loads(self.response)
+        response_dict['cached'] = True
+        return response_dict
+
+    def get_conditional_headers(self) -> Dict[str, str]:
+        """
+        Get the headers to revalidate the entry with
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def dumps(self) -> str:
+        return codec.dumps([self.response, self.etag, self.last_modified, self.fresh_until])
+
+    @classmethod
+    def loads(cls, value: Any) -> 'CacheEntry':
+        return cls(*codec.loads(value))
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """
+    Parse a Cache-Control header into a dict of directives
+
+    Args:
+        value: Header value (e.g., "public, max-age=60")
+
+    Returns:
+        Dict of lower-cased directive names to their value (or None)
+    """
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, argument = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+def get_freshness(headers: Dict[str, str], default_ttl: float) -> Optional[float]:
+    """
+    Get how long a response may be served from the cache without revalidation
+
+    s-maxage and max-age take precedence over Expires; responses without
+    explicit freshness information get the endpoint's default TTL.
+
+    Args:
+        headers: Response headers
+        default_ttl: Freshness for responses that do not specify any
+
+    Returns:
+        Freshness lifetime in seconds, or None if the response must not be stored
+    """
+    headers = {name.lower(): value for name, value in headers.items()}
+    directives = parse_cache_control(headers.get('cache-control'))
+
+    if 'no-store' in directives:
+        return None
+    if 'no-cache' in directives:
+        return 0.0
+
+    for directive in ('s-maxage', 'max-age'):
+        if directive in directives:
+            try:
+                return max(0.0, float(directives[directive]))
+            except (TypeError, ValueError):
+                return 0.0
+
+    if 'expires' in headers:
+        try:
+            expires = parsedate_to_datetime(headers['expires'])
+            date = parsedate_to_datetime(headers['date']) if 'date' in headers else None
+            now = date.timestamp() if date else time.time()
+            return max(0.0, expires.timestamp() - now)
+        except (TypeError, ValueError, IndexError):
+            # Invalid Expires values (e.g. "0") mean already expired
+            return 0.0
+
+    return float(default_ttl)
+
+
+class ResponseCache:
+    """
+    Two-tier HTTP cache for GET endpoints
+
+    Entries live in an in-process LRU and, when a Redis URL is configured,
+    in Redis so that all workers share them. Fresh entries are served
+    without calling the API; stale entries with an ETag or Last-Modified
+    validator are revalidated with a conditional request, and a 304 answer
+    reuses the cached body.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        redis_url: Optional[str] = None,
+        stale_ttl: float = 3600,
+        prefix: str = 'httpcache'
+    ):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of entries in the in-process LRU
+            redis_url: Redis URL for the shared tier (None = in-process only)
+            stale_ttl: How long stale entries with validators are kept for revalidation
+            prefix: Redis key prefix
+        """
+        self.max_entries = max_entries
+        self.stale_ttl = stale_ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._stats: Dict[int, Dict[str, int]] = {}
+
+        self.client = None
+        if redis_url:
+            import redis
+
+            self.client = redis.Redis.from_url(redis_url)
+
+    @property
+    def shared(self) -> bool:
+        return self.client is not None
+
+    def make_key(self, request: Dict[str, Any], authentication: Any = None) -> str:
+        """
+        Build the cache key for a request
+
+        The key covers the URL, query parameters, request headers (which
+        include API keys and bearer tokens) and the authentication record,
+        so responses are never shared between credentials.
+
+        Args:
+            request: Request dict built by APIConnectorService
+            authentication: APIAuthentication used for the call
+
+        Returns:
+            Cache key
+        """
+        headers = {
+            name: value for name, value in (request['headers'] or {}).items()
+            if name not in CONDITIONAL_HEADERS
+        }
+        material = codec.dumpb(
+            [
+                request['method'].upper(),
+                request['url'],
+                request['params'] or {},
+                headers,
+                authentication.pk if authentication else None
+            ],
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(material).hexdigest()
+
+    def lookup(self, key: str) -> Optional[CacheEntry]:
+        """
+        Get the entry for a key from the in-process tier, then the shared tier
+
+        Args:
+            key: Cache key
+
+        Returns:
+            CacheEntry object or None
+        """
+        now = time.time()
+        local_entry = None
+
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                entry, expires_at = item
+                if now < expires_at:
+                    self._entries.move_to_end(key)
+                    local_entry = entry
+                else:
+                    del self._entries[key]
+
+        # A stale local entry may have been revalidated by another worker
+        if self.client is None or (local_entry is not None and local_entry.is_fresh()):
+            return local_entry
+
+        try:
+            pipeline = self.client.pipeline()
+            pipeline.get(f"{self.prefix}:{key}")
+            pipeline.pttl(f"{self.prefix}:{key}")
+            value, ttl = pipeline.execute()
+        except Exception as e:
+            logger.exception(f"Error reading the shared HTTP cache: {str(e)}")
+            return local_entry
+
+        if value is None:
+            return local_entry
+
+        entry = CacheEntry.loads(value)
+        if ttl > 0:
+            self._store_local(key, entry, ttl / 1000.0)
+        return entry
+
+    def update(
+        self,
+        endpoint_id: int,
+        key: str,
+        entry: Optional[CacheEntry],
+        response_dict: Dict[str, Any],
+        default_ttl: float
+    ) -> Dict[str, Any]:
+        """
+        Store a fresh response, or refresh a revalidated entry
+
+        Args:
+            endpoint_id: ID of the endpoint (for metrics)
+            key: Cache key
+            entry: Entry the request was revalidating, if any
+            response_dict: Response dict built for the API answer
+            default_ttl: Freshness for responses that do not specify any
+
+        Returns:
+            Response dict to hand back to the caller (the cached one on a 304)
+        """
+        status_code = response_dict.get('status_code')
+        headers = response_dict.get('headers') or {}
+
+        if status_code == 304 and entry is not None:
+            self._count(endpoint_id, 'revalidations')
+            freshness = get_freshness(headers, default_ttl)
+            if freshness is not None:
+                entry.fresh_until = time.time() + freshness
+                self._store(key, entry)
+            return entry.get_response()
+
+        self._count(endpoint_id, 'misses')
+
+        # Only complete successful bodies are cached; oversize ones live in spool files
+        if status_code != 200 or response_dict.get('truncated'):
+            return response_dict
+
+        freshness = get_freshness(headers, default_ttl)
+        if freshness is None:
+            return response_dict
+
+        lowered = {name.lower(): value for name, value in headers.items()}
+        new_entry = CacheEntry(
+            codec.dumps(response_dict, default=str),
+            etag=lowered.get('etag'),
+            last_modified=lowered.get('last-modified'),
+            fresh_until=time.time() + freshness
+        )
+        if freshness > 0 or new_entry.etag or new_entry.last_modified:
+            self._store(key, new_entry)
+            self._count(endpoint_id, 'stores')
+
+        return response_dict
+
+    def hit(self, endpoint_id: int, entry: CacheEntry) -> Dict[str, Any]:
+        """
+        Serve a fresh entry
+
+        Args:
+            endpoint_id: ID of the endpoint (for metrics)
+            entry: Fresh CacheEntry
+
+        Returns:
+            Cached response dict
+        """
+        self._count(endpoint_id, 'hits')
+        return entry.get_response()
+
+    def clear(self) -> None:
+        """
+        Drop all in-process entries and counters
+        """
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+
+    def stats(self) -> Dict[int, Dict[str, Any]]:
+        """
+        Get cache counters per endpoint for this process
+
+        Returns:
+            Dict keyed by endpoint ID with hits, revalidations, misses,
+            stores and the hit ratio (hits and revalidations over all lookups)
+        """
+        with self._lock:
+            result = {}
+            for endpoint_id, counters in self._stats.items():
+                served = counters['hits'] + counters['revalidations']
+                total = served + counters['misses']
+                result[endpoint_id] = {
+                    **counters,
+                    'hit_ratio': served / total if total else 0.0,
+                }
+            return result
+
+    def _store(self, key: str, entry: CacheEntry) -> None:
+        lifetime = max(0.0, entry.fresh_until - time.time())
+        if entry.etag or entry.last_modified:
+            lifetime += self.stale_ttl
+        if lifetime <= 0:
+            return
+
+        self._store_local(key, entry, lifetime)
+
+        if self.client is not None:
+            try:
+                self.client.set(f"{self.prefix}:{key}", entry.dumps(), px=int(lifetime * 1000))
+            except Exception as e:
+                logger.exception(f"Error writing the shared HTTP cache: {str(e)}")
+
+    def _store_local(self, key: str, entry: CacheEntry, lifetime: float) -> None:
+        with self._lock:
+            self._entries[key] = (entry, time.time() + lifetime)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _count(self, endpoint_id: int, counter: str) -> None:
+        with self._lock:
+            counters = self._stats.setdefault(endpoint_id, {
+                'hits': 0,
+                'revalidations': 0,
+                'misses': 0,
+                'stores': 0,
+            })
+            counters[counter] += 1
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Get the process-wide HTTP response cache
+
+    Returns:
+        ResponseCache configured from settings
+    """
+    global _response_cache
+
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache(
+                    max_entries=getattr(settings, 'API_CONNECTOR_HTTP_CACHE_SIZE', 1000),
+                    redis_url=getattr(settings, 'API_CONNECTOR_HTTP_CACHE_REDIS_URL', None),
+                    stale_ttl=getattr(settings, 'API_CONNECTOR_HTTP_CACHE_STALE_TTL', 3600)
+                )
+
+    return _response_cache
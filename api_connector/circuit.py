@@ -0,0 +1,367 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('api_hub.api_connector.circuit')
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised when a call is short-circuited because the API's circuit is open
+    """
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        """
+        Args:
+            message: Error message
+            retry_after: Seconds until the circuit lets a trial call through
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BaseCircuitBreaker:
+    """
+    Base class for circuit breaker backends
+
+    A circuit is closed while the API is healthy. When the share of failed
+    or slow calls in the current window reaches the failure rate, the
+    circuit opens and every call fails fast for the open duration. After
+    that the circuit is half-open: a few trial calls are let through, and
+    it closes again once they all succeed or re-opens on the first failure.
+    """
+
+    def __init__(
+        self,
+        failure_rate: float = 0.5,
+        slow_call_threshold: float = 10,
+        min_calls: int = 10,
+        window: float = 60,
+        open_duration: float = 30,
+        half_open_calls: int = 3
+    ):
+        """
+        Initialize the circuit breaker
+
+        Args:
+            failure_rate: Share of failed calls (0-1) that opens the circuit
+            slow_call_threshold: Calls slower than this many seconds count as failures
+            min_calls: Minimum number of calls in the window before the circuit can open
+            window: Length of the statistics window in seconds
+            open_duration: How long the circuit stays open in seconds
+            half_open_calls: Number of trial calls allowed while half-open
+        """
+        self.failure_rate = failure_rate
+        self.slow_call_threshold = slow_call_threshold
+        self.min_calls = min_calls
+        self.window = window
+        self.open_duration = open_duration
+        self.half_open_calls = half_open_calls
+
+    @property
+    def shared(self) -> bool:
+        """
+        Whether circuit state lives outside the process (calls do network I/O)
+        """
+        return False
+
+    def allow(self, key: str) -> Tuple[bool, float]:
+        """
+        Check whether a call may be made
+
+        Args:
+            key: Circuit key
+
+        Returns:
+            Tuple of (allowed, seconds until a call may be allowed)
+        """
+        raise NotImplementedError
+
+    def record(self, key: str, success: bool, elapsed: float = 0.0) -> None:
+        """
+        Record the outcome of a call
+
+        Args:
+            key: Circuit key
+            success: Whether the call succeeded
+            elapsed: Call duration in seconds
+        """
+        raise NotImplementedError
+
+    def is_open(self, key: str) -> bool:
+        """
+        Check whether the circuit currently rejects calls (without taking a trial slot)
+        """
+        raise NotImplementedError
+
+    def reset(self, key: Optional[str] = None) -> None:
+        """
+        Close the circuit for a key (or for all keys)
+        """
+        raise NotImplementedError
+
+    def _is_failure(self, success: bool, elapsed: float) -> bool:
+        return not success or (self.slow_call_threshold and elapsed > self.slow_call_threshold)
+
+
+class LocalCircuitBreaker(BaseCircuitBreaker):
+    """
+    In-process circuit breaker
+
+    Each worker process trips independently; use RedisCircuitBreaker to
+    share circuit state across the Celery fleet.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+        self._circuits: Dict[str, dict] = {}
+
+    def allow(self, key: str) -> Tuple[bool, float]:
+        now = time.monotonic()
+
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if circuit is None:
+                return True, 0.0
+
+            if circuit['state'] == 'open':
+                if now < circuit['opened_until']:
+                    return False, circuit['opened_until'] - now
+                circuit.update(state='half_open', trials=0, trial_successes=0)
+
+            if circuit['state'] == 'half_open':
+                if circuit['trials'] >= self.half_open_calls:
+                    # Trial slots that never reported back are reclaimed
+                    if now < circuit['opened_until'] + self.open_duration:
+                        return False, 1.0
+                    circuit.update(trials=0, trial_successes=0, opened_until=now)
+                circuit['trials'] += 1
+
+        return True, 0.0
+
+    def record(self, key: str, success: bool, elapsed: float = 0.0) -> None:
+        now = time.monotonic()
+        failed = self._is_failure(success, elapsed)
+
+        with self._lock:
+            circuit = self._circuits.setdefault(key, {
+                'state': 'closed',
+                'window_start': now,
+                'calls': 0,
+                'failures': 0,
+            })
+
+            if circuit['state'] == 'half_open':
+                if failed:
+                    self._open(key, circuit, now)
+                else:
+                    circuit['trial_successes'] += 1
+                    if circuit['trial_successes'] >= self.half_open_calls:
+                        circuit.update(state='closed', window_start=now, calls=0, failures=0)
+                        logger.info(f"Circuit {key} closed")
+                return
+
+            if circuit['state'] == 'open':
+                return
+
+            if now - circuit['window_start'] >= self.window:
+                circuit.update(window_start=now, calls=0, failures=0)
+
+            circuit['calls'] += 1
+            if failed:
+                circuit['failures'] += 1
+
+            if circuit['calls'] >= self.min_calls and circuit['failures'] / circuit['calls'] >= self.failure_rate:
+                self._open(key, circuit, now)
+
+    def is_open(self, key: str) -> bool:
+        with self._lock:
+            circuit = self._circuits.get(key)
+            return bool(circuit and circuit['state'] == 'open' and time.monotonic() < circuit['opened_until'])
+
+    def reset(self, key: Optional[str] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._circuits.clear()
+            else:
+                self._circuits.pop(key, None)
+
+    def _open(self, key: str, circuit: dict, now: float) -> None:
+        circuit.update(state='open', opened_until=now + self.open_duration, calls=0, failures=0)
+        logger.warning(f"Circuit {key} opened for {self.open_duration}s")
+
+
+class RedisCircuitBreaker(BaseCircuitBreaker):
+    """
+    Circuit breaker shared across processes through Redis
+
+    Circuit state lives in one hash per key and every transition is made
+    by a Lua script, so all workers see the same state.
+    """
+
+    ALLOW_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local half_open_calls = tonumber(ARGV[2])
+local open_duration = tonumber(ARGV[3])
+
+local state = redis.call('HGET', key, 'state')
+
+if state == 'open' then
+    local opened_until = tonumber(redis.call('HGET', key, 'opened_until'))
+    if now < opened_until then
+        return {0, opened_until - now}
+    end
+    redis.call('HSET', key, 'state', 'half_open', 'trials', 0, 'trial_successes', 0)
+    state = 'half_open'
+end
+
+if state == 'half_open' then
+    local trials = tonumber(redis.call('HGET', key, 'trials') or 0)
+    if trials >= half_open_calls then
+        -- Trial slots that never reported back are reclaimed
+        local opened_until = tonumber(redis.call('HGET', key, 'opened_until') or 0)
+        if now < opened_until + open_duration then
+            return {0, 1000}
+        end
+        redis.call('HSET', key, 'trials', 0, 'trial_successes', 0, 'opened_until', now)
+    end
+    redis.call('HINCRBY', key, 'trials', 1)
+end
+
+return {1, 0}
+"""
+
+    RECORD_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local failed = tonumber(ARGV[2])
+local failure_rate = tonumber(ARGV[3])
+local min_calls = tonumber(ARGV[4])
+local window = tonumber(ARGV[5])
+local open_duration = tonumber(ARGV[6])
+local half_open_calls = tonumber(ARGV[7])
+
+local state = redis.call('HGET', key, 'state') or 'closed'
+local opened = 0
+
+if state == 'half_open' then
+    if failed == 1 then
+        opened = 1
+    else
+        local successes = redis.call('HINCRBY', key, 'trial_successes', 1)
+        if successes >= half_open_calls then
+            redis.call('HSET', key, 'state', 'closed', 'window_start', now, 'calls', 0, 'failures', 0)
+        end
+    end
+elseif state == 'closed' then
+    local window_start = tonumber(redis.call('HGET', key, 'window_start') or 0)
+    if now - window_start >= window then
+        redis.call('HSET', key, 'state', 'closed', 'window_start', now, 'calls', 0, 'failures', 0)
+    end
+    local calls = redis.call('HINCRBY', key, 'calls', 1)
+    local failures = redis.call('HINCRBY', key, 'failures', failed)
+    if calls >= min_calls and failures / calls >= failure_rate then
+        opened = 1
+    end
+end
+
+if opened == 1 then
+    redis.call('HSET', key, 'state', 'open', 'opened_until', now + open_duration, 'calls', 0, 'failures', 0)
+end
+
+redis.call('PEXPIRE', key, math.ceil((window + open_duration) * 2))
+return opened
+"""
+
+    def __init__(self, url: Optional[str] = None, prefix: str = 'circuit', **kwargs):
+        """
+        Initialize the Redis circuit breaker
+
+        Args:
+            url: Redis URL (defaults to settings.CIRCUIT_BREAKER_REDIS_URL)
+            prefix: Key prefix
+        """
+        import redis
+
+        super().__init__(**kwargs)
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url or getattr(settings, 'CIRCUIT_BREAKER_REDIS_URL', settings.CELERY_BROKER_URL))
+        self.allow_script = self.client.register_script(self.ALLOW_SCRIPT)
+        self.record_script = self.client.register_script(self.RECORD_SCRIPT)
+
+    @property
+    def shared(self) -> bool:
+        return True
+
+    def allow(self, key: str) -> Tuple[bool, float]:
+        allowed, retry_after_ms = self.allow_script(
+            keys=[f"{self.prefix}:{key}"],
+            args=[self._now_ms(), self.half_open_calls, int(self.open_duration * 1000)]
+        )
+        return bool(allowed), int(retry_after_ms) / 1000.0
+
+    def record(self, key: str, success: bool, elapsed: float = 0.0) -> None:
+        opened = self.record_script(
+            keys=[f"{self.prefix}:{key}"],
+            args=[
+                self._now_ms(),
+                1 if self._is_failure(success, elapsed) else 0,
+                self.failure_rate,
+                self.min_calls,
+                int(self.window * 1000),
+                int(self.open_duration * 1000),
+                self.half_open_calls,
+            ]
+        )
+        if opened:
+            logger.warning(f"Circuit {key} opened for {self.open_duration}s")
+
+    def is_open(self, key: str) -> bool:
+        state, opened_until = self.client.hmget(f"{self.prefix}:{key}", 'state', 'opened_until')
+        return state == b'open' and self._now_ms() < int(float(opened_until))
+
+    def reset(self, key: Optional[str] = None) -> None:
+        if key is not None:
+            self.client.delete(f"{self.prefix}:{key}")
+        else:
+            for redis_key in self.client.scan_iter(f"{self.prefix}:*"):
+                self.client.delete(redis_key)
+
+    @staticmethod
+    def _now_ms() -> int:
+        return int(time.time() * 1000)
+
+
+_breaker: Optional[BaseCircuitBreaker] = None
+_breaker_lock = threading.Lock()
+
+
+def get_circuit_breaker() -> BaseCircuitBreaker:
+    """
+    Get the configured circuit breaker backend
+
+    Returns:
+        Instance of settings.CIRCUIT_BREAKER_BACKEND
+    """
+    global _breaker
+
+    if _breaker is None:
+        with _breaker_lock:
+            if _breaker is None:
+                backend = getattr(settings, 'CIRCUIT_BREAKER_BACKEND', 'api_connector.circuit.LocalCircuitBreaker')
+                _breaker = import_string(backend)(
+                    failure_rate=getattr(settings, 'CIRCUIT_BREAKER_FAILURE_RATE', 0.5),
+                    slow_call_threshold=getattr(settings, 'CIRCUIT_BREAKER_SLOW_CALL_THRESHOLD', 10),
+                    min_calls=getattr(settings, 'CIRCUIT_BREAKER_MIN_CALLS', 10),
+                    window=getattr(settings, 'CIRCUIT_BREAKER_WINDOW', 60),
+                    open_duration=getattr(settings, 'CIRCUIT_BREAKER_OPEN_DURATION', 30),
+                    half_open_calls=getattr(settings, 'CIRCUIT_BREAKER_HALF_OPEN_CALLS', 3)
+                )
+
+    return _breaker
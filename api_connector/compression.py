@@ -0,0 +1,120 @@
+import gzip
+import logging
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger('api_hub.api_connector.compression')
+
+# Levels trading a little ratio for speed, since bodies are compressed per call
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+# Encodings both requests (urllib3) and httpx decode without extra packages
+BUILTIN_ENCODINGS = ('gzip', 'deflate', 'identity')
+
+
+def is_supported(encoding: str) -> bool:
+    """
+    Check whether an encoding can be produced and decoded in this environment
+
+    Args:
+        encoding: Content coding (gzip, deflate, br, zstd or identity)
+
+    Returns:
+        True if the encoding is available
+    """
+    if encoding in BUILTIN_ENCODINGS:
+        return True
+    if encoding == 'br':
+        return brotli is not None
+    if encoding == 'zstd':
+        return zstandard is not None
+    return False
+
+
+def negotiate_accept_encoding(configured: Optional[str]) -> Optional[str]:
+    """
+    Build the Accept-Encoding header for a configuration
+
+    The HTTP clients decode responses while they are streamed, but only
+    for encodings whose decoder is installed (brotli/brotlicffi for br,
+    zstandard for zstd), so other encodings are never advertised.
+
+    Args:
+        configured: Comma-separated encodings, optionally with q-values (e.g. "zstd, br, gzip")
+
+    Returns:
+        Header value, or None to keep the client's default
+    """
+    if not configured:
+        return None
+
+    accepted = []
+    for item in configured.split(','):
+        item = item.strip()
+        encoding = item.partition(';')[0].strip().lower()
+        if not encoding:
+            continue
+        if is_supported(encoding):
+            accepted.append(item)
+        else:
+            logger.warning(f"Not accepting {encoding} responses, no decoder is installed")
+
+    return ', '.join(accepted) or None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """
+    Compress a request body
+
+    Args:
+        body: Raw body
+        encoding: gzip, br or zstd
+
+    Returns:
+        Compressed body
+
+    Raises:
+        ValueError: If the encoding is unknown or its package is not installed
+    """
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'zstd' and zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    raise ValueError(f"Unsupported request compression: {encoding}")
+
+
+def compress_body(body: bytes, encoding: str, min_size: int = 0) -> Optional[bytes]:
+    """
+    Compress a request body if it is worth it
+
+    Args:
+        body: Encoded request body
+        encoding: gzip, br or zstd
+        min_size: Bodies smaller than this many bytes are not worth compressing
+
+    Returns:
+        Compressed body, or None if the body should be sent as is
+    """
+    if len(body) < min_size:
+        return None
+
+    compressed = compress(body, encoding)
+    if len(compressed) >= len(body):
+        return None
+    return compressed
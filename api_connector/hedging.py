@@ -0,0 +1,375 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger('api_hub.api_connector.hedging')
+
+
+class HedgeCancelled(Exception):
+    """
+    Raised in an attempt that lost the race to another one
+    """
+
+
+class CancelScope:
+    """
+    Lets a hedged call abort the other attempt's in-flight response
+
+    Attempts register an abort handle for their connection before sending
+    and their response as soon as they have one; cancelling closes them,
+    which makes the losing attempt stop waiting for headers or reading
+    the body.
+    """
+
+    __slots__ = ('cancelled', '_resources', '_lock')
+
+    def __init__(self):
+        self.cancelled = False
+        self._resources: List[Any] = []
+        self._lock = threading.Lock()
+
+    def register(self, resource: Any) -> None:
+        """
+        Register a closeable resource of the attempt
+
+        Raises:
+            HedgeCancelled: If the attempt was cancelled already
+        """
+        with self._lock:
+            if not self.cancelled:
+                self._resources.append(resource)
+                return
+        resource.close()
+        raise HedgeCancelled()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            resources, self._resources = self._resources, []
+        for resource in resources:
+            try:
+                resource.close()
+            except Exception:
+                pass
+
+
+class EndpointHedgeState:
+    """
+    Recent latencies and hedge counters of an endpoint
+    """
+
+    __slots__ = ('latencies', 'hedge_flags', 'recent_hedges', 'delay', 'delay_samples',
+                 'requests', 'hedged', 'hedge_wins')
+
+    def __init__(self, window: int):
+        self.latencies = deque(maxlen=window)
+        self.hedge_flags = deque(maxlen=window)
+        self.recent_hedges = 0
+        self.delay: Optional[float] = None
+        self.delay_samples = 0
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+
+class HedgingController:
+    """
+    Runs hedged requests for latency-critical endpoints
+
+    A hedged call starts a request and, if it has not completed after the
+    endpoint's latency percentile (e.g. p95 of its recent calls), a second
+    identical one; the first to complete wins and the other is cancelled.
+    Until enough latencies are recorded, `default_delay` is used. Hedges
+    are limited to `max_rate` of an endpoint's recent calls, so a slow
+    backend never gets twice the load, and callers can veto a hedge (e.g.
+    when it would exceed the API's rate limit).
+    """
+
+    def __init__(
+        self,
+        window: int = 200,
+        min_samples: int = 20,
+        default_delay: float = 1.0,
+        max_rate: float = 0.1,
+        max_workers: int = 32
+    ):
+        """
+        Initialize the controller
+
+        Args:
+            window: Number of recent calls per endpoint the percentile and hedge rate are computed over
+            min_samples: Calls needed before the percentile is used
+            default_delay: Hedge delay in seconds until then
+            max_rate: Maximum share of recent calls that may be hedged
+            max_workers: Threads running sync hedged attempts
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.max_rate = max_rate
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._states: Dict[int, EndpointHedgeState] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def get_delay(self, endpoint_id: int, percentile: float) -> Optional[float]:
+        """
+        Get how long to wait before hedging a call
+
+        Args:
+            endpoint_id: ID of the endpoint
+            percentile: Latency percentile to hedge at
+
+        Returns:
+            Delay in seconds, or None if the endpoint's hedge budget is used up
+        """
+        with self._lock:
+            state = self._get_state(endpoint_id)
+            if state.hedge_flags and state.recent_hedges >= self.max_rate * len(state.hedge_flags):
+                return None
+            if len(state.latencies) < self.min_samples:
+                return self.default_delay
+
+            # The percentile is recomputed every tenth of a window
+            if state.delay is None or state.delay_samples >= max(1, self.window // 10):
+                latencies = sorted(state.latencies)
+                index = min(len(latencies) - 1, int(len(latencies) * percentile / 100.0))
+                state.delay = latencies[index]
+                state.delay_samples = 0
+            return state.delay
+
+    def record(self, endpoint_id: int, latency: float, hedged: bool, hedge_won: bool) -> None:
+        """
+        Record the outcome of a call
+
+        Args:
+            endpoint_id: ID of the endpoint
+            latency: Latency of the winning request in seconds
+            hedged: Whether a hedge request was sent
+            hedge_won: Whether the hedge request won
+        """
+        with self._lock:
+            state = self._get_state(endpoint_id)
+            if latency is not None:
+                state.latencies.append(latency)
+                state.delay_samples += 1
+            if len(state.hedge_flags) == state.hedge_flags.maxlen and state.hedge_flags[0]:
+                state.recent_hedges -= 1
+            state.hedge_flags.append(hedged)
+            state.recent_hedges += hedged
+            state.requests += 1
+            state.hedged += hedged
+            state.hedge_wins += hedge_won
+
+    def call(
+        self,
+        endpoint_id: int,
+        percentile: float,
+        attempt: Callable[[Optional[CancelScope]], Any],
+        discard: Optional[Callable[[Any], None]] = None,
+        admit: Optional[Callable[[], bool]] = None
+    ) -> Any:
+        """
+        Make a hedged call
+
+        Args:
+            endpoint_id: ID of the endpoint
+            percentile: Latency percentile to hedge at
+            attempt: Makes one request; called with the CancelScope to register its response with
+            discard: Releases the result of an attempt that completed but lost
+            admit: Called when the hedge is due; the hedge is not sent if it returns False
+
+        Returns:
+            Result of the winning attempt
+
+        Raises:
+            Exception: The first attempt's error if no attempt succeeded
+        """
+        delay = self.get_delay(endpoint_id, percentile)
+        if delay is None:
+            started = time.monotonic()
+            result = attempt(None)
+            self.record(endpoint_id, time.monotonic() - started, False, False)
+            return result
+
+        executor = self._get_executor()
+        scopes = [CancelScope()]
+        started = [time.monotonic()]
+        futures = [executor.submit(attempt, scopes[0])]
+
+        done, _ = wait(futures, timeout=delay)
+        if not done and (admit is None or admit()):
+            scopes.append(CancelScope())
+            started.append(time.monotonic())
+            futures.append(executor.submit(attempt, scopes[1]))
+
+        winner = None
+        error = None
+        pending = set(futures)
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=futures.index):
+                if future.exception() is None:
+                    winner = winner or future
+                elif error is None:
+                    error = future.exception()
+
+        # Cancel the loser; a result it still produces is released
+        for index, future in enumerate(futures):
+            if future is not winner:
+                scopes[index].cancel()
+                if discard is not None:
+                    future.add_done_callback(lambda f: self._discard(f, discard))
+
+        hedged = len(futures) > 1
+        if winner is None:
+            self.record(endpoint_id, None, hedged, False)
+            raise error
+
+        index = futures.index(winner)
+        self.record(endpoint_id, time.monotonic() - started[index], hedged, index == 1)
+        return winner.result()
+
+    async def acall(
+        self,
+        endpoint_id: int,
+        percentile: float,
+        attempt: Callable[[], Awaitable[Any]],
+        discard: Optional[Callable[[Any], None]] = None,
+        admit: Optional[Callable[[], Awaitable[bool]]] = None
+    ) -> Any:
+        """
+        Make a hedged call without blocking the event loop
+
+        Same semantics as call, with an async `admit`; the losing attempt's
+        task is cancelled.
+        """
+        delay = self.get_delay(endpoint_id, percentile)
+        if delay is None:
+            started = time.monotonic()
+            result = await attempt()
+            self.record(endpoint_id, time.monotonic() - started, False, False)
+            return result
+
+        started = [time.monotonic()]
+        tasks = [asyncio.ensure_future(attempt())]
+
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and (admit is None or await admit()):
+                started.append(time.monotonic())
+                tasks.append(asyncio.ensure_future(attempt()))
+
+            winner = None
+            error = None
+            pending = set(tasks)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=tasks.index):
+                    if task.exception() is None:
+                        if winner is None:
+                            winner = task
+                        elif discard is not None:
+                            discard(task.result())
+                    elif error is None:
+                        error = task.exception()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        hedged = len(tasks) > 1
+        if winner is None:
+            self.record(endpoint_id, None, hedged, False)
+            raise error
+
+        index = tasks.index(winner)
+        self.record(endpoint_id, time.monotonic() - started[index], hedged, index == 1)
+        return winner.result()
+
+    def stats(self) -> Dict[int, Dict[str, Any]]:
+        """
+        Get hedging counters per endpoint for this process
+
+        Returns:
+            Dict keyed by endpoint ID with requests, hedged, hedge_wins,
+            the hedge rate (hedged over requests), the win rate (wins over
+            hedged) and the current hedge delay
+        """
+        with self._lock:
+            return {
+                endpoint_id: {
+                    'requests': state.requests,
+                    'hedged': state.hedged,
+                    'hedge_wins': state.hedge_wins,
+                    'hedge_rate': state.hedged / state.requests if state.requests else 0.0,
+                    'win_rate': state.hedge_wins / state.hedged if state.hedged else 0.0,
+                    'delay': state.delay,
+                }
+                for endpoint_id, state in self._states.items()
+            }
+
+    def clear(self) -> None:
+        """
+        Drop all latencies and counters
+        """
+        with self._lock:
+            self._states.clear()
+
+    def _get_state(self, endpoint_id: int) -> EndpointHedgeState:
+        state = self._states.get(endpoint_id)
+        if state is None:
+            state = self._states[endpoint_id] = EndpointHedgeState(self.window)
+        return state
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='api-hedge'
+                    )
+        return self._executor
+
+    @staticmethod
+    def _discard(future: Any, discard: Callable[[Any], None]) -> None:
+        if future.cancelled() or future.exception() is not None:
+            return
+        try:
+            discard(future.result())
+        except Exception as e:
+            logger.exception(f"Error discarding hedged response: {str(e)}")
+
+
+_hedging: Optional[HedgingController] = None
+_hedging_lock = threading.Lock()
+
+
+def get_hedging() -> HedgingController:
+    """
+    Get the process-wide hedging controller
+
+    Returns:
+        HedgingController configured from settings
+    """
+    global _hedging
+
+    if _hedging is None:
+        with _hedging_lock:
+            if _hedging is None:
+                _hedging = HedgingController(
+                    window=getattr(settings, 'API_CONNECTOR_HEDGE_WINDOW', 200),
+                    min_samples=getattr(settings, 'API_CONNECTOR_HEDGE_MIN_SAMPLES', 20),
+                    default_delay=getattr(settings, 'API_CONNECTOR_HEDGE_DEFAULT_DELAY', 1.0),
+                    max_rate=getattr(settings, 'API_CONNECTOR_HEDGE_MAX_RATE', 0.1),
+                    max_workers=getattr(settings, 'API_CONNECTOR_HEDGE_MAX_WORKERS', 32)
+                )
+
+    return _hedging
@@ -0,0 +1,218 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core import codec
+from .models import APIEndpoint, IdempotencyRecord
+
+logger = logging.getLogger('api_hub.api_connector.idempotency')
+
+
+class DuplicateRequestError(Exception):
+    """
+    Raised when a call with the same idempotency key is still in flight
+    """
+
+    def __init__(self, key: str, retry_after: float):
+        """
+        Args:
+            key: Idempotency key of the call
+            retry_after: Seconds until the other call's claim expires
+        """
+        self.key = key
+        self.retry_after = retry_after
+        super().__init__(f"Call with idempotency key {key} is already in flight, retry in {retry_after:.2f}s")
+
+
+def make_idempotency_key(message_id: Any, function_name: str, function_args: Dict[str, Any]) -> str:
+    """
+    Derive the idempotency key of a function call
+
+    Args:
+        message_id: ID of the message (or other unit of work) the call belongs to
+        function_name: Name of the function
+        function_args: Arguments for the function
+
+    Returns:
+        Hex digest identifying the call
+    """
+    material = codec.dumpb([str(message_id), function_name, function_args], sort_keys=True, default=str)
+    return hashlib.sha256(material).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Claims idempotency keys and replays the outcome of completed calls
+
+    IdempotencyRecord (unique on key) is the shared lookup table: the first
+    caller claims a key by inserting its record, duplicates either get the
+    stored outcome of the completed call or a DuplicateRequestError while it
+    is in flight. Claims expire after `lock_timeout` seconds so calls lost
+    with a crashed worker can be retried. Completed outcomes are also kept
+    in an in-process LRU, so replaying them needs no query.
+
+    Claims are plain inserts on the caller's connection: a claim made
+    inside an outer transaction.atomic() block (MessageReceiverService.
+    process_message wraps processing in one) is not visible to other
+    workers until that transaction commits, so a duplicate running
+    concurrently can claim the key too. Make idempotent calls outside
+    such blocks where that matters.
+    """
+
+    def __init__(self, lock_timeout: float = 300, cache_size: int = 1000):
+        """
+        Initialize the store
+
+        Args:
+            lock_timeout: Seconds a pending call holds its key
+            cache_size: Number of completed outcomes kept in memory
+        """
+        self.lock_timeout = lock_timeout
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._completed: 'OrderedDict[str, Tuple[Dict[str, Any], Dict[str, Any]]]' = OrderedDict()
+
+    def claim(self, key: str, endpoint: APIEndpoint) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Claim a key before making the call
+
+        Only visible to other workers once the caller's transaction, if
+        any, commits.
+
+        Args:
+            key: Idempotency key
+            endpoint: APIEndpoint about to be called
+
+        Returns:
+            None if the key was claimed and the call should be made, or the
+            (request, response) of the completed call to replay
+
+        Raises:
+            DuplicateRequestError: If a call with the same key is in flight
+        """
+        outcome = self._get_cached(key)
+        if outcome is not None:
+            return outcome
+
+        now = timezone.now()
+        locked_until = now + timedelta(seconds=self.lock_timeout)
+
+        try:
+            with transaction.atomic():
+                IdempotencyRecord.objects.create(key=key, endpoint=endpoint, locked_until=locked_until)
+            return None
+        except IntegrityError:
+            pass
+
+        # Take over failed calls and calls whose claim expired
+        taken = IdempotencyRecord.objects.filter(key=key).filter(
+            Q(status='failed') | Q(status='pending', locked_until__lte=now)
+        ).update(status='pending', locked_until=locked_until, attempts=F('attempts') + 1)
+        if taken:
+            return None
+
+        record = IdempotencyRecord.objects.filter(key=key).first()
+        if record is None:
+            # Purged in the meantime
+            return self.claim(key, endpoint)
+
+        if record.status == 'completed':
+            outcome = (record.request, record.response)
+            self._store(key, outcome)
+            return self._replay(outcome)
+
+        raise DuplicateRequestError(key, max(0.0, (record.locked_until - now).total_seconds()))
+
+    def complete(self, key: str, request: Dict[str, Any], response: Dict[str, Any]) -> None:
+        """
+        Record the outcome of a call so duplicates replay it
+
+        Args:
+            key: Idempotency key
+            request: Request dict of the call
+            response: Response dict of the call
+        """
+        try:
+            IdempotencyRecord.objects.filter(key=key).update(status='completed', request=request, response=response)
+        except Exception as e:
+            logger.exception(f"Error recording idempotent call {key}: {str(e)}")
+            return
+
+        self._store(key, (request, response))
+
+    def release(self, key: str) -> None:
+        """
+        Release a key after a failed call so it can be retried
+        """
+        try:
+            IdempotencyRecord.objects.filter(key=key, status='pending').update(status='failed')
+        except Exception as e:
+            logger.exception(f"Error releasing idempotency key {key}: {str(e)}")
+
+    def purge(self, older_than: float) -> int:
+        """
+        Delete records older than the given age
+
+        Args:
+            older_than: Age in seconds
+
+        Returns:
+            Number of deleted records
+        """
+        with self._lock:
+            self._completed.clear()
+        cutoff = timezone.now() - timedelta(seconds=older_than)
+        deleted, _ = IdempotencyRecord.objects.filter(created_at__lt=cutoff).delete()
+        return deleted
+
+    def _get_cached(self, key: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        with self._lock:
+            outcome = self._completed.get(key)
+            if outcome is None:
+                return None
+            self._completed.move_to_end(key)
+        return self._replay(outcome)
+
+    def _store(self, key: str, outcome: Tuple[Dict[str, Any], Dict[str, Any]]) -> None:
+        with self._lock:
+            self._completed[key] = outcome
+            self._completed.move_to_end(key)
+            while len(self._completed) > self.cache_size:
+                self._completed.popitem(last=False)
+
+    @staticmethod
+    def _replay(outcome: Tuple[Dict[str, Any], Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        request, response = outcome
+        return dict(request or {}), {**(response or {}), 'idempotent_replay': True}
+
+
+_idempotency_store: Optional[IdempotencyStore] = None
+_idempotency_store_lock = threading.Lock()
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    """
+    Get the process-wide idempotency store
+
+    Returns:
+        IdempotencyStore configured from settings
+    """
+    global _idempotency_store
+
+    if _idempotency_store is None:
+        with _idempotency_store_lock:
+            if _idempotency_store is None:
+                _idempotency_store = IdempotencyStore(
+                    lock_timeout=getattr(settings, 'API_CONNECTOR_IDEMPOTENCY_LOCK_TIMEOUT', 300),
+                    cache_size=getattr(settings, 'API_CONNECTOR_IDEMPOTENCY_CACHE_SIZE', 1000)
+                )
+
+    return _idempotency_store
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_connector', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apiconfiguration',
+            name='max_concurrent_requests',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Maximum number of concurrent batch calls to this API (0 = unlimited)', verbose_name='Max Concurrent Requests'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:25
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_connector', '0002_apiconfiguration_max_concurrent_requests'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='apiconfiguration',
+            name='rate_limit',
+            field=models.CharField(default='100/hour', help_text='Limits without a burst are enforced over a sliding window; add burst=N to allow short bursts at an averaged rate', max_length=100, validators=[django.core.validators.RegexValidator(message='Rate limit must be one or more limits in format number/timeunit, separated by semicolons (e.g., 100/hour, 10/second;1000/hour, 100/hour burst=10)', regex='^\\s*\\d+/\\d*(?:second|minute|hour|day)(?:\\s+burst=\\d+)?\\s*(?:;\\s*\\d+/\\d*(?:second|minute|hour|day)(?:\\s+burst=\\d+)?\\s*)*$')], verbose_name='Rate Limit'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_connector', '0003_alter_apiconfiguration_rate_limit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apiconfiguration',
+            name='rate_limit_mode',
+            field=models.CharField(choices=[('fail', 'Fail immediately'), ('wait', 'Wait for a free slot')], default='fail', help_text='Whether rate-limited calls fail right away (and are rescheduled by the task) or wait in-process for a free slot (up to RATE_LIMIT_MAX_WAIT seconds)', max_length=10, verbose_name='Rate Limit Mode'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_connector', '0004_apiconfiguration_rate_limit_mode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apiconfiguration',
+            name='connect_timeout',
+            field=models.FloatField(default=5, verbose_name='Connect Timeout (s)'),
+        ),
+        migrations.AddField(
+            model_name='apiconfiguration',
+            name='read_timeout',
+            field=models.FloatField(default=30, verbose_name='Read Timeout (s)'),
+        ),
+        migrations.AddField(
+            model_name='apiconfiguration',
+            name='total_timeout',
+            field=models.FloatField(default=120, help_text='Deadline for a call including all retries and backoff (0 = no deadline)', verbose_name='Total Timeout (s)'),
+        ),
+        migrations.AddField(
+            model_name='apiendpoint',
+            name='connect_timeout',
+            field=models.FloatField(blank=True, null=True, verbose_name='Connect Timeout (s)'),
+        ),
+        migrations.AddField(
+            model_name='apiendpoint',
+            name='read_timeout',
+            field=models.FloatField(blank=True, null=True, verbose_name='Read Timeout (s)'),
+        ),
+        migrations.AddField(
+            model_name='apiendpoint',
+            name='total_timeout',
+            field=models.FloatField(blank=True, help_text='Deadline for a call including all retries and backoff (0 = no deadline)', null=True, verbose_name='Total Timeout (s)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_connector', '0005_apiconfiguration_connect_timeout_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='apiendpoint',
+            name='response_mapping',
+            field=models.JSONField(blank=True, default=dict, help_text='Mapping of internal fields to response paths, e.g. {"ids": "items.*.id", "total": {"path": "meta.total", "type": "int", "default": 0}}', verbose_name='Response Mapping'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_connector', '0006_alter_apiendpoint_response_mapping'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='functiondefinition',
+            name='parameter_mapping',
+            field=models.JSONField(default=dict, help_text='Mapping of API request parameters to function arguments: a path ("user.name"), a template ("{user.name} <{user.email}>"), {"static": value} or {"transform": "join", "fields": [...], "separator": ", "}', verbose_name='Parameter Mapping'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_connector', '0007_alter_functiondefinition_parameter_mapping'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apiendpoint',
+            name='max_response_size',
+            field=models.PositiveIntegerField(blank=True, help_text='Larger bodies are spooled to disk or dropped instead of being stored (empty = API_CONNECTOR_MAX_RESPONSE_SIZE, 0 = no limit)', null=True, verbose_name='Max Response Size (bytes)'),
+        ),
+        migrations.AddField(
+            model_name='apiendpoint',
+            name='stream_response',
+            field=models.BooleanField(default=False, help_text='Parse the response incrementally and only keep the fields used by the response mapping (requires ijson)', verbose_name='Stream Response'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_connector', '0008_apiendpoint_max_response_size_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apiendpoint',
+            name='cache_enabled',
+            field=models.BooleanField(default=False, help_text='Cache GET responses, honoring Cache-Control, ETag and Last-Modified', verbose_name='Cache Responses'),
+        ),
+        migrations.AddField(
+            model_name='apiendpoint',
+            name='cache_ttl',
+            field=models.PositiveIntegerField(default=0, help_text='Freshness for responses without Cache-Control or Expires (0 = only cache what the API allows)', verbose_name='Cache TTL (s)'),
+        ),
+    ]
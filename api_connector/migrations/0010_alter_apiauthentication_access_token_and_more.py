@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_connector', '0009_apiendpoint_cache_enabled_apiendpoint_cache_ttl'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='apiauthentication',
+            name='access_token',
+            field=models.TextField(blank=True, null=True, verbose_name='Access Token'),
+        ),
+        migrations.AlterField(
+            model_name='apiauthentication',
+            name='refresh_token',
+            field=models.TextField(blank=True, null=True, verbose_name='Refresh Token'),
+        ),
+    ]
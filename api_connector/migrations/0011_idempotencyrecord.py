@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_connector', '0010_alter_apiauthentication_access_token_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='Idempotency Key')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=1, verbose_name='Attempts')),
+                ('locked_until', models.DateTimeField(help_text='A pending call not completed by then is considered lost and may be retried', verbose_name='Locked Until')),
+                ('request', models.JSONField(blank=True, null=True, verbose_name='Request')),
+                ('response', models.JSONField(blank=True, null=True, verbose_name='Response')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+                ('endpoint', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_records', to='api_connector.apiendpoint')),
+            ],
+            options={
+                'verbose_name': 'Idempotency Record',
+                'verbose_name_plural': 'Idempotency Records',
+                'indexes': [models.Index(fields=['created_at'], name='api_connect_created_42941d_idx')],
+            },
+        ),
+    ]
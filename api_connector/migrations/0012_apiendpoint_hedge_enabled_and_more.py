@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:49
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_connector', '0011_idempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apiendpoint',
+            name='hedge_enabled',
+            field=models.BooleanField(default=False, help_text='Send a second request when the first is slower than the latency percentile below, and use whichever completes first', verbose_name='Hedge Requests'),
+        ),
+        migrations.AddField(
+            model_name='apiendpoint',
+            name='hedge_percentile',
+            field=models.FloatField(default=95, help_text='Latency percentile of recent calls after which the hedge request is sent', validators=[django.core.validators.MinValueValidator(50), django.core.validators.MaxValueValidator(99.9)], verbose_name='Hedge Percentile'),
+        ),
+    ]
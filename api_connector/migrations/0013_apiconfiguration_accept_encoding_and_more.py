@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_connector', '0012_apiendpoint_hedge_enabled_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apiconfiguration',
+            name='accept_encoding',
+            field=models.CharField(blank=True, help_text='Response encodings to negotiate, e.g. "zstd, br, gzip" (empty = client default); encodings without an installed decoder are dropped', max_length=100, verbose_name='Accept-Encoding'),
+        ),
+        migrations.AddField(
+            model_name='apiconfiguration',
+            name='compression_min_size',
+            field=models.PositiveIntegerField(default=1024, help_text='Smaller request bodies are sent uncompressed', verbose_name='Compression Min Size (bytes)'),
+        ),
+        migrations.AddField(
+            model_name='apiconfiguration',
+            name='request_compression',
+            field=models.CharField(choices=[('none', 'None'), ('gzip', 'gzip'), ('br', 'Brotli'), ('zstd', 'Zstandard')], default='none', help_text='Content-Encoding for JSON request bodies (br requires brotli, zstd requires zstandard)', max_length=10, verbose_name='Request Compression'),
+        ),
+    ]
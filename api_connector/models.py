@@ -1,6 +1,11 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
-from django.core.validators import RegexValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator, RegexValidator
+
+from core.mapping import compile_parameter_mapping, compile_response_mapping
+from core.ratelimit import RATE_LIMIT_REGEX
+from .compression import is_supported
 
 class APIAuthentication(models.Model):
     """
@@ -33,8 +38,8 @@ class APIAuthentication(models.Model):
     client_id = models.CharField(_('Client ID'), max_length=255, blank=True, null=True)
     client_secret = models.CharField(_('Client Secret'), max_length=255, blank=True, null=True)
     token_url = models.URLField(_('Token URL'), blank=True, null=True)
-    refresh_token = models.CharField(_('Refresh Token'), max_length=255, blank=True, null=True)
-    access_token = models.CharField(_('Access Token'), max_length=255, blank=True, null=True)
+    refresh_token = models.TextField(_('Refresh Token'), blank=True, null=True)
+    access_token = models.TextField(_('Access Token'), blank=True, null=True)
     expires_at = models.DateTimeField(_('Expires At'), blank=True, null=True)
     
     created_at = models.DateTimeField(_('Created At'), auto_now_add=True)
@@ -63,18 +68,31 @@ class APIConfiguration(models.Model):
         related_name='api_configurations'
     )
     
+    RATE_LIMIT_MODE_CHOICES = [
+        ('fail', _('Fail immediately')),
+        ('wait', _('Wait for a free slot')),
+    ]
+    
     # Rate limiting
     rate_limit_enabled = models.BooleanField(_('Rate Limit Enabled'), default=True)
     rate_limit = models.CharField(
         _('Rate Limit'), 
-        max_length=50, 
+        max_length=100, 
         default='100/hour',
         validators=[
             RegexValidator(
-                regex=r'^\d+/(?:second|minute|hour|day)$',
-                message=_('Rate limit must be in format: number/timeunit (e.g., 100/hour)')
+                regex=RATE_LIMIT_REGEX,
+                message=_('Rate limit must be one or more limits in format number/timeunit, '
+                          'separated by semicolons (e.g., 100/hour, 10/second;1000/hour, 100/hour burst=10)')
             )
-        ]
+        ],
+        help_text=_('Limits without a burst are enforced over a sliding window; '
+                    'add burst=N to allow short bursts at an averaged rate')
+    )
+    rate_limit_mode = models.CharField(
+        _('Rate Limit Mode'), max_length=10, choices=RATE_LIMIT_MODE_CHOICES, default='fail',
+        help_text=_('Whether rate-limited calls fail right away (and are rescheduled by the task) '
+                    'or wait in-process for a free slot (up to RATE_LIMIT_MAX_WAIT seconds)')
     )
     
     # Retry configuration
@@ -82,9 +100,42 @@ class APIConfiguration(models.Model):
     retry_backoff = models.BooleanField(_('Retry Backoff'), default=True, 
                                        help_text=_('Use exponential backoff for retries'))
     
+    # Timeouts
+    connect_timeout = models.FloatField(_('Connect Timeout (s)'), default=5)
+    read_timeout = models.FloatField(_('Read Timeout (s)'), default=30)
+    total_timeout = models.FloatField(_('Total Timeout (s)'), default=120,
+                                      help_text=_('Deadline for a call including all retries and backoff (0 = no deadline)'))
+    
+    # Concurrency
+    max_concurrent_requests = models.PositiveSmallIntegerField(
+        _('Max Concurrent Requests'), default=0,
+        help_text=_('Maximum number of concurrent batch calls to this API (0 = unlimited)')
+    )
+    
     # Headers
     default_headers = models.JSONField(_('Default Headers'), default=dict, blank=True)
     
+    REQUEST_COMPRESSION_CHOICES = [
+        ('none', _('None')),
+        ('gzip', _('gzip')),
+        ('br', _('Brotli')),
+        ('zstd', _('Zstandard')),
+    ]
+    
+    # Compression
+    request_compression = models.CharField(
+        _('Request Compression'),
+        max_length=10,
+        choices=REQUEST_COMPRESSION_CHOICES,
+        default='none',
+        help_text=_('Content-Encoding for JSON request bodies (br requires brotli, zstd requires zstandard)')
+    )
+    compression_min_size = models.PositiveIntegerField(_('Compression Min Size (bytes)'), default=1024,
+                                                       help_text=_('Smaller request bodies are sent uncompressed'))
+    accept_encoding = models.CharField(_('Accept-Encoding'), max_length=100, blank=True,
+                                       help_text=_('Response encodings to negotiate, e.g. "zstd, br, gzip" (empty = '
+                                                   'client default); encodings without an installed decoder are dropped'))
+    
     is_active = models.BooleanField(_('Active'), default=True)
     created_at = models.DateTimeField(_('Created At'), auto_now_add=True)
     updated_at = models.DateTimeField(_('Updated At'), auto_now=True)
@@ -95,6 +146,12 @@ class APIConfiguration(models.Model):
     
     def __str__(self):
         return self.name
+    
+    def clean(self):
+        super().clean()
+        
+        if self.request_compression != 'none' and not is_supported(self.request_compression):
+            raise ValidationError({'request_compression': _('The package for this compression is not installed')})
 
 
 class APIEndpoint(models.Model):
@@ -125,9 +182,37 @@ class APIEndpoint(models.Model):
                                            help_text=_('JSON template for the request body'))
     request_headers = models.JSONField(_('Request Headers'), default=dict, blank=True)
     
+    # Timeouts (override the API configuration when set)
+    connect_timeout = models.FloatField(_('Connect Timeout (s)'), blank=True, null=True)
+    read_timeout = models.FloatField(_('Read Timeout (s)'), blank=True, null=True)
+    total_timeout = models.FloatField(_('Total Timeout (s)'), blank=True, null=True,
+                                      help_text=_('Deadline for a call including all retries and backoff (0 = no deadline)'))
+    
+    # HTTP cache (GET endpoints only)
+    cache_enabled = models.BooleanField(_('Cache Responses'), default=False,
+                                        help_text=_('Cache GET responses, honoring Cache-Control, ETag and Last-Modified'))
+    cache_ttl = models.PositiveIntegerField(_('Cache TTL (s)'), default=0,
+                                            help_text=_('Freshness for responses without Cache-Control or Expires '
+                                                        '(0 = only cache what the API allows)'))
+    
+    # Hedged requests (GET endpoints only)
+    hedge_enabled = models.BooleanField(_('Hedge Requests'), default=False,
+                                        help_text=_('Send a second request when the first is slower than the latency '
+                                                    'percentile below, and use whichever completes first'))
+    hedge_percentile = models.FloatField(_('Hedge Percentile'), default=95,
+                                         validators=[MinValueValidator(50), MaxValueValidator(99.9)],
+                                         help_text=_('Latency percentile of recent calls after which the hedge request is sent'))
+    
     # Response configuration
+    max_response_size = models.PositiveIntegerField(_('Max Response Size (bytes)'), blank=True, null=True,
+                                                    help_text=_('Larger bodies are spooled to disk or dropped instead of '
+                                                                'being stored (empty = API_CONNECTOR_MAX_RESPONSE_SIZE, 0 = no limit)'))
+    stream_response = models.BooleanField(_('Stream Response'), default=False,
+                                          help_text=_('Parse the response incrementally and only keep the fields used by '
+                                                      'the response mapping (requires ijson)'))
     response_mapping = models.JSONField(_('Response Mapping'), default=dict, blank=True,
-                                      help_text=_('Mapping of response fields to internal fields'))
+                                      help_text=_('Mapping of internal fields to response paths, e.g. '
+                                                  '{"ids": "items.*.id", "total": {"path": "meta.total", "type": "int", "default": 0}}'))
     
     is_active = models.BooleanField(_('Active'), default=True)
     created_at = models.DateTimeField(_('Created At'), auto_now_add=True)
@@ -140,6 +225,15 @@ class APIEndpoint(models.Model):
     
     def __str__(self):
         return f"{self.api_config.name} - {self.name} ({self.http_method})"
+    
+    def clean(self):
+        super().clean()
+        
+        if self.response_mapping:
+            try:
+                compile_response_mapping(self.response_mapping)
+            except ValueError as e:
+                raise ValidationError({'response_mapping': str(e)})
 
 
 class FunctionDefinition(models.Model):
@@ -160,7 +254,9 @@ class FunctionDefinition(models.Model):
     
     # Parameter mapping
     parameter_mapping = models.JSONField(_('Parameter Mapping'), default=dict,
-                                       help_text=_('Mapping of function parameters to API request parameters'))
+                                       help_text=_('Mapping of API request parameters to function arguments: a path ("user.name"), '
+                                                   'a template ("{user.name} <{user.email}>"), {"static": value} or '
+                                                   '{"transform": "join", "fields": [...], "separator": ", "}'))
     
     is_active = models.BooleanField(_('Active'), default=True)
     created_at = models.DateTimeField(_('Created At'), auto_now_add=True)
@@ -172,3 +268,53 @@ class FunctionDefinition(models.Model):
     
     def __str__(self):
         return self.name
+    
+    def clean(self):
+        super().clean()
+        
+        if self.parameter_mapping:
+            try:
+                compile_parameter_mapping(self.parameter_mapping)
+            except ValueError as e:
+                raise ValidationError({'parameter_mapping': str(e)})
+
+
+class IdempotencyRecord(models.Model):
+    """
+    Model to deduplicate outbound API calls by idempotency key
+    """
+    STATUS_CHOICES = [
+        ('pending', _('Pending')),
+        ('completed', _('Completed')),
+        ('failed', _('Failed')),
+    ]
+    
+    key = models.CharField(_('Idempotency Key'), max_length=64, unique=True)
+    endpoint = models.ForeignKey(
+        APIEndpoint,
+        on_delete=models.CASCADE,
+        related_name='idempotency_records',
+        blank=True,
+        null=True
+    )
+    status = models.CharField(_('Status'), max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(_('Attempts'), default=1)
+    locked_until = models.DateTimeField(_('Locked Until'),
+                                        help_text=_('A pending call not completed by then is considered lost and may be retried'))
+    
+    # Outcome of the completed call, replayed to duplicates
+    request = models.JSONField(_('Request'), blank=True, null=True)
+    response = models.JSONField(_('Response'), blank=True, null=True)
+    
+    created_at = models.DateTimeField(_('Created At'), auto_now_add=True)
+    updated_at = models.DateTimeField(_('Updated At'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('Idempotency Record')
+        verbose_name_plural = _('Idempotency Records')
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.key} ({self.status})"
@@ -0,0 +1,344 @@
+import logging
+import threading
+import time
+import uuid
+from datetime import timedelta
+from typing import Dict, Optional, Set, Tuple
+
+import requests
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .models import APIAuthentication
+
+logger = logging.getLogger('api_hub.api_connector.oauth')
+
+
+class OAuth2TokenError(Exception):
+    """
+    Raised when no valid OAuth 2.0 access token can be obtained
+    """
+
+
+class OAuth2TokenManager:
+    """
+    Keeps OAuth 2.0 access tokens valid for APIAuthentication records
+
+    Tokens are cached in memory. A token that is about to expire (within
+    the refresh margin) is still used while a background thread refreshes
+    it, so calls only wait when a token has actually expired. Refreshes
+    are single-flight: threads of a process share a lock per
+    authentication, and processes share a Redis lock, so only one request
+    per token ever reaches the token endpoint; everyone else picks up the
+    new token from the database. After a failed background refresh the
+    next one is not started before `retry_interval` has passed; the token
+    keeps being used until it expires.
+    """
+
+    RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+    def __init__(
+        self,
+        refresh_margin: float = 300,
+        redis_url: Optional[str] = None,
+        lock_timeout: float = 30,
+        request_timeout: float = 10,
+        retry_interval: float = 30,
+        prefix: str = 'oauth2'
+    ):
+        """
+        Initialize the token manager
+
+        Args:
+            refresh_margin: Refresh tokens this many seconds before they expire
+            redis_url: Redis URL for the cross-process refresh lock (None = per-process only)
+            lock_timeout: Maximum time a refresh may hold the lock in seconds
+            request_timeout: Timeout for token endpoint requests in seconds
+            retry_interval: Seconds before a failed background refresh is retried
+            prefix: Redis key prefix
+        """
+        self.refresh_margin = refresh_margin
+        self.lock_timeout = lock_timeout
+        self.request_timeout = request_timeout
+        self.retry_interval = retry_interval
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._tokens: Dict[int, Tuple[str, float]] = {}
+        self._refresh_locks: Dict[int, threading.Lock] = {}
+        self._refreshing: Set[int] = set()
+        self._failed_at: Dict[int, float] = {}
+
+        self.client = None
+        if redis_url:
+            import redis
+
+            self.client = redis.Redis.from_url(redis_url)
+            self.release_script = self.client.register_script(self.RELEASE_SCRIPT)
+
+    def get_token(self, auth: APIAuthentication) -> str:
+        """
+        Get a valid access token
+
+        Args:
+            auth: APIAuthentication object of type oauth2
+
+        Returns:
+            Access token
+
+        Raises:
+            OAuth2TokenError: If the token is expired and cannot be refreshed
+        """
+        token, expires_at = self._get_cached(auth)
+        remaining = expires_at - time.time()
+
+        if token and remaining > 0:
+            if remaining < self.refresh_margin:
+                self._refresh_in_background(auth)
+            return token
+
+        return self._refresh(auth, min_validity=0)
+
+    def has_valid_token(self, auth: APIAuthentication) -> bool:
+        """
+        Check whether get_token can answer without waiting for a refresh
+        """
+        token, expires_at = self._get_cached(auth)
+        return bool(token) and expires_at > time.time()
+
+    def invalidate(self, auth: APIAuthentication) -> None:
+        """
+        Forget the cached token for an authentication
+        """
+        with self._lock:
+            self._tokens.pop(auth.pk, None)
+
+    def _get_cached(self, auth: APIAuthentication) -> Tuple[Optional[str], float]:
+        cached = self._tokens.get(auth.pk)
+        if cached is not None:
+            return cached
+
+        # Seed the cache from the record; an unknown expiry is treated as valid
+        if auth.access_token:
+            expires_at = auth.expires_at.timestamp() if auth.expires_at else float('inf')
+            self._store(auth.pk, auth.access_token, expires_at)
+            return auth.access_token, expires_at
+
+        return None, 0.0
+
+    def _store(self, auth_id: int, token: str, expires_at: float) -> None:
+        with self._lock:
+            self._tokens[auth_id] = (token, expires_at)
+
+    def _refresh_in_background(self, auth: APIAuthentication) -> None:
+        with self._lock:
+            if auth.pk in self._refreshing:
+                return
+            if time.monotonic() - self._failed_at.get(auth.pk, float('-inf')) < self.retry_interval:
+                return
+            self._refreshing.add(auth.pk)
+
+        def refresh():
+            try:
+                self._refresh(auth, min_validity=self.refresh_margin)
+            except Exception as e:
+                logger.exception(f"Background refresh of OAuth 2.0 token for {auth.name} failed: {str(e)}")
+                with self._lock:
+                    self._failed_at[auth.pk] = time.monotonic()
+            else:
+                with self._lock:
+                    self._failed_at.pop(auth.pk, None)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(auth.pk)
+                # The thread's database connection is not reused
+                connections.close_all()
+
+        threading.Thread(target=refresh, name=f"oauth2-refresh-{auth.pk}", daemon=True).start()
+
+    def _refresh(self, auth: APIAuthentication, min_validity: float) -> str:
+        """
+        Refresh the token unless someone else already did
+
+        Args:
+            auth: APIAuthentication object
+            min_validity: Seconds of validity a token needs to be kept as is
+
+        Returns:
+            Access token
+        """
+        with self._get_refresh_lock(auth.pk):
+            # Another thread may have refreshed while we waited for the lock
+            token, expires_at = self._tokens.get(auth.pk, (None, 0.0))
+            if token and expires_at - time.time() > min_validity:
+                return token
+
+            lock_value = self._acquire_shared_lock(auth.pk)
+            if lock_value is False:
+                # Another worker is refreshing: wait for its token to land in the database
+                token = self._wait_for_refresh(auth, min_validity)
+                if token:
+                    return token
+                lock_value = None
+
+            try:
+                # Another worker may have refreshed before we got the lock
+                token = self._load_from_database(auth, min_validity)
+                if token:
+                    return token
+
+                return self._request_token(auth)
+            finally:
+                if lock_value:
+                    self._release_shared_lock(auth.pk, lock_value)
+
+    def _request_token(self, auth: APIAuthentication) -> str:
+        """
+        Get a new token from the token endpoint and persist it
+        """
+        if not auth.token_url:
+            raise OAuth2TokenError(f"No token URL configured for {auth.name}")
+
+        if auth.refresh_token:
+            data = {'grant_type': 'refresh_token', 'refresh_token': auth.refresh_token}
+        else:
+            data = {'grant_type': 'client_credentials'}
+        if auth.client_id:
+            data['client_id'] = auth.client_id
+        if auth.client_secret:
+            data['client_secret'] = auth.client_secret
+
+        try:
+            response = requests.post(auth.token_url, data=data, timeout=self.request_timeout)
+            response.raise_for_status()
+            payload = response.json()
+            token = payload['access_token']
+        except (requests.RequestException, ValueError, KeyError) as e:
+            raise OAuth2TokenError(f"Could not refresh OAuth 2.0 token for {auth.name}: {str(e)}") from e
+
+        try:
+            expires_in = float(payload.get('expires_in') or 3600)
+        except (TypeError, ValueError):
+            expires_in = 3600.0
+
+        expires_at = timezone.now() + timedelta(seconds=expires_in)
+        fields = {'access_token': token, 'expires_at': expires_at}
+        if payload.get('refresh_token'):
+            fields['refresh_token'] = payload['refresh_token']
+
+        # update() instead of save() so a refresh does not invalidate cached plans
+        APIAuthentication.objects.filter(pk=auth.pk).update(**fields)
+        for name, value in fields.items():
+            setattr(auth, name, value)
+
+        self._store(auth.pk, token, expires_at.timestamp())
+        logger.info(f"Refreshed OAuth 2.0 token for {auth.name}, valid for {expires_in:.0f}s")
+
+        return token
+
+    def _load_from_database(self, auth: APIAuthentication, min_validity: float) -> Optional[str]:
+        """
+        Pick up a token refreshed by another worker
+
+        Returns:
+            The stored token if it is valid for at least min_validity seconds
+        """
+        stored = APIAuthentication.objects.filter(pk=auth.pk).values(
+            'access_token', 'expires_at', 'refresh_token'
+        ).first()
+        if not stored or not stored['access_token']:
+            return None
+
+        expires_at = stored['expires_at'].timestamp() if stored['expires_at'] else float('inf')
+        if stored['refresh_token']:
+            auth.refresh_token = stored['refresh_token']
+        if expires_at - time.time() <= min_validity:
+            return None
+
+        auth.access_token = stored['access_token']
+        auth.expires_at = stored['expires_at']
+        self._store(auth.pk, stored['access_token'], expires_at)
+        return stored['access_token']
+
+    def _wait_for_refresh(self, auth: APIAuthentication, min_validity: float) -> Optional[str]:
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+            token = self._load_from_database(auth, min_validity)
+            if token:
+                return token
+            if not self._is_shared_lock_held(auth.pk):
+                return self._load_from_database(auth, min_validity)
+        return None
+
+    def _acquire_shared_lock(self, auth_id: int):
+        """
+        Take the cross-process refresh lock
+
+        Returns:
+            The lock value if acquired, False if another worker holds it,
+            None if there is no shared lock (or Redis is unavailable)
+        """
+        if self.client is None:
+            return None
+
+        value = uuid.uuid4().hex
+        try:
+            if self.client.set(f"{self.prefix}:lock:{auth_id}", value, nx=True, px=int(self.lock_timeout * 1000)):
+                return value
+            return False
+        except Exception as e:
+            # Refresh without the shared lock rather than not at all
+            logger.exception(f"Error acquiring OAuth 2.0 refresh lock: {str(e)}")
+            return None
+
+    def _is_shared_lock_held(self, auth_id: int) -> bool:
+        try:
+            return bool(self.client.exists(f"{self.prefix}:lock:{auth_id}"))
+        except Exception:
+            return False
+
+    def _release_shared_lock(self, auth_id: int, value: str) -> None:
+        try:
+            self.release_script(keys=[f"{self.prefix}:lock:{auth_id}"], args=[value])
+        except Exception as e:
+            logger.exception(f"Error releasing OAuth 2.0 refresh lock: {str(e)}")
+
+    def _get_refresh_lock(self, auth_id: int) -> threading.Lock:
+        with self._lock:
+            refresh_lock = self._refresh_locks.get(auth_id)
+            if refresh_lock is None:
+                refresh_lock = self._refresh_locks[auth_id] = threading.Lock()
+            return refresh_lock
+
+
+_token_manager: Optional[OAuth2TokenManager] = None
+_token_manager_lock = threading.Lock()
+
+
+def get_token_manager() -> OAuth2TokenManager:
+    """
+    Get the process-wide OAuth 2.0 token manager
+
+    Returns:
+        OAuth2TokenManager configured from settings
+    """
+    global _token_manager
+
+    if _token_manager is None:
+        with _token_manager_lock:
+            if _token_manager is None:
+                _token_manager = OAuth2TokenManager(
+                    refresh_margin=getattr(settings, 'OAUTH2_REFRESH_MARGIN', 300),
+                    redis_url=getattr(settings, 'OAUTH2_REDIS_URL', None),
+                    lock_timeout=getattr(settings, 'OAUTH2_LOCK_TIMEOUT', 30),
+                    request_timeout=getattr(settings, 'OAUTH2_TOKEN_TIMEOUT', 10),
+                    retry_interval=getattr(settings, 'OAUTH2_REFRESH_RETRY_INTERVAL', 30)
+                )
+
+    return _token_manager
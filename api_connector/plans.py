@@ -0,0 +1,328 @@
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+
+from core.mapping import compile_response_mapping, get_parameter_mapper, response_mapping_paths
+from .auth import get_auth_strategies
+from .compression import is_supported, negotiate_accept_encoding
+from .models import APIEndpoint, FunctionDefinition
+from . import streaming
+
+logger = logging.getLogger('api_hub.api_connector.plans')
+
+
+class EndpointPlan:
+    """
+    Pre-resolved execution details for an API endpoint
+
+    Everything call_api needs that only depends on configuration (URL,
+    merged static headers, request compression, timeouts, compiled
+    response mapping, response size, cache and hedging handling, the
+    loaded API configuration and authentication and its auth strategy) is
+    computed once when the plan is built.
+    """
+
+    __slots__ = ('endpoint', 'api_config', 'authentication', 'auth_strategy', 'url', 'method',
+                 'static_headers', 'request_compression', 'compression_min_size', 'timeouts',
+                 'response_mapper', 'response_paths',
+                 'stream_response', 'max_response_size', 'cache_enabled', 'hedge_enabled',
+                 'hedge_percentile', 'built_at')
+
+    def __init__(self, endpoint: APIEndpoint):
+        """
+        Build the plan for an endpoint
+
+        Args:
+            endpoint: APIEndpoint with api_config (and its authentication) loaded
+        """
+        api_config = endpoint.api_config
+
+        self.endpoint = endpoint
+        self.api_config = api_config
+        self.authentication = api_config.authentication
+        self.auth_strategy = get_auth_strategies().get(self.authentication)
+        self.url = f"{api_config.base_url.rstrip('/')}/{endpoint.path.lstrip('/')}"
+        self.method = endpoint.http_method
+
+        # Static headers: configuration defaults overridden by the endpoint's
+        static_headers = {}
+        if api_config.default_headers:
+            static_headers.update(api_config.default_headers)
+        if endpoint.request_headers:
+            static_headers.update(endpoint.request_headers)
+        accept_encoding = negotiate_accept_encoding(api_config.accept_encoding)
+        if accept_encoding:
+            static_headers.setdefault('Accept-Encoding', accept_encoding)
+        self.static_headers = static_headers
+
+        # Request bodies are compressed for methods that send one
+        self.request_compression = None
+        self.compression_min_size = api_config.compression_min_size
+        if api_config.request_compression != 'none' and self.method.upper() != 'GET':
+            if is_supported(api_config.request_compression):
+                self.request_compression = api_config.request_compression
+            else:
+                logger.warning(f"{api_config.request_compression} is not installed, requests to "
+                               f"{api_config.name} are sent uncompressed")
+
+        # Endpoint timeouts override the configuration's
+        self.timeouts = (
+            endpoint.connect_timeout if endpoint.connect_timeout is not None else api_config.connect_timeout,
+            endpoint.read_timeout if endpoint.read_timeout is not None else api_config.read_timeout,
+            endpoint.total_timeout if endpoint.total_timeout is not None else api_config.total_timeout,
+        )
+
+        # Compile the response mapping once instead of walking paths per call
+        self.response_mapper = None
+        self.response_paths = None
+        if endpoint.response_mapping:
+            try:
+                self.response_mapper = compile_response_mapping(endpoint.response_mapping)
+                self.response_paths = response_mapping_paths(endpoint.response_mapping)
+            except ValueError as e:
+                logger.error(f"Invalid response mapping for endpoint {endpoint.pk}, mapping disabled: {str(e)}")
+
+        # Incremental parsing only keeps the mapped fields, so it needs a mapping (and ijson)
+        self.stream_response = bool(endpoint.stream_response and self.response_paths)
+        if self.stream_response and streaming.ijson is None:
+            logger.warning(f"ijson is not installed, endpoint {endpoint.pk} responses will be buffered")
+            self.stream_response = False
+
+        if endpoint.max_response_size is not None:
+            self.max_response_size = endpoint.max_response_size
+        else:
+            self.max_response_size = getattr(settings, 'API_CONNECTOR_MAX_RESPONSE_SIZE', 10 * 1024 * 1024)
+
+        # Only idempotent GET requests are cached
+        self.cache_enabled = (
+            endpoint.cache_enabled
+            and self.method.upper() == 'GET'
+            and getattr(settings, 'API_CONNECTOR_HTTP_CACHE_ENABLED', True)
+        )
+
+        # Hedging sends requests twice, which is only safe for GET requests
+        self.hedge_enabled = (
+            endpoint.hedge_enabled
+            and self.method.upper() == 'GET'
+            and getattr(settings, 'API_CONNECTOR_HEDGING_ENABLED', True)
+        )
+        self.hedge_percentile = endpoint.hedge_percentile
+
+        self.built_at = time.monotonic()
+
+
+class FunctionPlan:
+    """
+    Pre-resolved execution details for a function definition
+    """
+
+    __slots__ = ('func_def', 'endpoint_plan', 'argument_mapper', 'sends_params')
+
+    def __init__(self, func_def: FunctionDefinition, endpoint_plan: EndpointPlan):
+        """
+        Build the plan for a function definition
+
+        Args:
+            func_def: FunctionDefinition object
+            endpoint_plan: Plan for the function's endpoint
+        """
+        self.func_def = func_def
+        self.endpoint_plan = endpoint_plan
+        self.argument_mapper = get_parameter_mapper(func_def)
+
+        # GET requests take the mapped arguments as query parameters
+        self.sends_params = endpoint_plan.method.upper() == 'GET'
+
+
+class ExecutionPlanCache:
+    """
+    Process-wide cache of execution plans
+
+    Plans are invalidated by post_save/post_delete signals on the connector
+    models (see api_connector.signals). Since signals only fire in the
+    process that made the change, plans also expire after `ttl` seconds so
+    edits made elsewhere (e.g. in the admin) reach the Celery workers.
+    """
+
+    def __init__(self, ttl: float = 60):
+        """
+        Initialize the cache
+
+        Args:
+            ttl: Maximum age of a plan in seconds (0 = until invalidated)
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._functions: Dict[str, FunctionPlan] = {}
+        self._endpoints: Dict[int, EndpointPlan] = {}
+
+    def get_function_plan(self, function_name: str) -> FunctionPlan:
+        """
+        Get the plan for an active function
+
+        Args:
+            function_name: Name of the function
+
+        Returns:
+            FunctionPlan object
+
+        Raises:
+            FunctionDefinition.DoesNotExist: If the function is not found or not active
+        """
+        plan = self._get_fresh(self._functions, function_name)
+        if plan is not None:
+            return plan
+
+        func_def = self._function_queryset().get(
+            name=function_name,
+            is_active=True
+        )
+        return self._store_function(func_def)
+
+    async def aget_function_plan(self, function_name: str) -> FunctionPlan:
+        """
+        Get the plan for an active function without blocking the event loop
+
+        Args:
+            function_name: Name of the function
+
+        Returns:
+            FunctionPlan object
+
+        Raises:
+            FunctionDefinition.DoesNotExist: If the function is not found or not active
+        """
+        plan = self._get_fresh(self._functions, function_name)
+        if plan is not None:
+            return plan
+
+        func_def = await self._function_queryset().aget(
+            name=function_name,
+            is_active=True
+        )
+        return self._store_function(func_def)
+
+    async def aget_function_plans(self, function_names: Iterable[str]) -> Dict[str, FunctionPlan]:
+        """
+        Get the plans for several functions, loading all missing ones in one query
+
+        Args:
+            function_names: Names of the functions
+
+        Returns:
+            Dict of function name to FunctionPlan (inactive or unknown functions are omitted)
+        """
+        plans = {}
+        missing = set()
+
+        for function_name in set(function_names):
+            plan = self._get_fresh(self._functions, function_name)
+            if plan is not None:
+                plans[function_name] = plan
+            else:
+                missing.add(function_name)
+
+        if missing:
+            async for func_def in self._function_queryset().filter(name__in=missing, is_active=True):
+                plans[func_def.name] = self._store_function(func_def)
+
+        return plans
+
+    def get_endpoint_plan(self, endpoint: APIEndpoint) -> EndpointPlan:
+        """
+        Get the plan for an endpoint, building it from the endpoint if needed
+
+        Args:
+            endpoint: APIEndpoint object
+
+        Returns:
+            EndpointPlan object
+        """
+        plan = self.peek_endpoint_plan(endpoint)
+        if plan is not None:
+            return plan
+
+        plan = EndpointPlan(endpoint)
+        with self._lock:
+            self._endpoints[endpoint.pk] = plan
+        return plan
+
+    def peek_endpoint_plan(self, endpoint: APIEndpoint) -> Optional[EndpointPlan]:
+        """
+        Get the cached plan for an endpoint without building it
+
+        A plan built from an older version of the endpoint is ignored.
+
+        Args:
+            endpoint: APIEndpoint object
+
+        Returns:
+            EndpointPlan object or None
+        """
+        plan = self._get_fresh(self._endpoints, endpoint.pk)
+        if plan is not None and plan.endpoint.updated_at == endpoint.updated_at:
+            return plan
+        return None
+
+    def clear(self) -> None:
+        """
+        Drop all cached plans
+        """
+        with self._lock:
+            self._functions.clear()
+            self._endpoints.clear()
+
+    def _get_fresh(self, plans: dict, key) -> Optional[object]:
+        plan = plans.get(key)
+        if plan is None:
+            return None
+
+        built_at = plan.endpoint_plan.built_at if isinstance(plan, FunctionPlan) else plan.built_at
+        if self.ttl and time.monotonic() - built_at > self.ttl:
+            return None
+
+        return plan
+
+    def _store_function(self, func_def: FunctionDefinition) -> FunctionPlan:
+        endpoint_plan = EndpointPlan(func_def.api_endpoint)
+        plan = FunctionPlan(func_def, endpoint_plan)
+
+        with self._lock:
+            self._endpoints[func_def.api_endpoint_id] = endpoint_plan
+            self._functions[func_def.name] = plan
+
+        return plan
+
+    @staticmethod
+    def _function_queryset():
+        return FunctionDefinition.objects.select_related(
+            'api_endpoint',
+            'api_endpoint__api_config',
+            'api_endpoint__api_config__authentication'
+        )
+
+
+_plan_cache: Optional[ExecutionPlanCache] = None
+_plan_cache_lock = threading.Lock()
+
+
+def get_plan_cache() -> ExecutionPlanCache:
+    """
+    Get the process-wide execution plan cache
+
+    Returns:
+        ExecutionPlanCache configured from settings
+    """
+    global _plan_cache
+
+    if _plan_cache is None:
+        with _plan_cache_lock:
+            if _plan_cache is None:
+                _plan_cache = ExecutionPlanCache(
+                    ttl=getattr(settings, 'API_CONNECTOR_PLAN_TTL', 60)
+                )
+
+    return _plan_cache
@@ -1,19 +1,36 @@
+import asyncio
 import json
 import logging
+import os
 import time
-from typing import Dict, Any, Optional, Tuple, Union
+from typing import Dict, Any, List, Optional, Tuple, Union
 import requests
 from requests.auth import HTTPBasicAuth
 from datetime import datetime, timedelta
 
+from asgiref.sync import async_to_sync, sync_to_async
 from django.utils import timezone
 from django.conf import settings
 
-from core.models import RateLimitLog, ErrorLog
+from core import codec
+from core.db import database_sync_to_async
+from core.models import ErrorLog
+from core.ratelimit import RateLimitExceeded, check_rate_limit
 from .models import APIConfiguration, APIEndpoint, APIAuthentication, FunctionDefinition
+from .cache import get_response_cache
+from .circuit import CircuitOpenError, get_circuit_breaker
+from .compression import compress_body
+from .hedging import CancelScope, get_hedging
+from .idempotency import get_idempotency_store
+from .plans import EndpointPlan, FunctionPlan, get_plan_cache
+from .streaming import ResponseBody, aread_body, read_body
+from .transport import abort_handler, get_pool_registry
 
 logger = logging.getLogger('api_hub.api_connector')
 
+# Status codes that are worth retrying
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
 class APIConnectorService:
     """
     Service for connecting to external APIs
@@ -23,14 +40,21 @@ class APIConnectorService:
         """
         Initialize the API connector service
         """
-        self.session = requests.Session()
+        # Sessions are pooled per API configuration and shared process-wide
+        self.pool_registry = get_pool_registry()
+        self.circuit_breaker = get_circuit_breaker()
+        self.plans = get_plan_cache()
+        self.response_cache = get_response_cache()
+        self.idempotency = get_idempotency_store()
+        self.hedging = get_hedging()
     
     def call_api(
         self, 
         endpoint: APIEndpoint, 
         data: Dict[str, Any] = None,
         params: Dict[str, Any] = None,
-        headers: Dict[str, Any] = None
+        headers: Dict[str, Any] = None,
+        idempotency_key: Optional[str] = None
     ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
         """
         Call an API endpoint
@@ -40,112 +64,114 @@ class APIConnectorService:
             data: Request data (for POST, PUT, PATCH)
             params: Query parameters (for GET)
             headers: Additional headers
+            idempotency_key: Key deduplicating the call (ignored for GET requests)
             
         Returns:
             Tuple of (request, response)
+            
+        Raises:
+            DuplicateRequestError: If a call with the same idempotency key is in flight
         """
+        if idempotency_key and endpoint.http_method.upper() != 'GET':
+            return self._call_idempotent(endpoint, data, params, headers, idempotency_key)
+        
         start_time = time.time()
-        api_config = endpoint.api_config
+        plan = self.plans.peek_endpoint_plan(endpoint)
+        if plan is None:
+            plan = self.plans.get_endpoint_plan(self._load_endpoint(endpoint))
+        api_config = plan.api_config
+        
+        # Build request dict (also used for logging)
+        request_dict = self._build_request(plan, data, params, headers)
+        
+        # Serve fresh cached responses without calling the API
+        cache_key = cache_entry = None
+        if plan.cache_enabled:
+            cache_key = self.response_cache.make_key(request_dict, plan.authentication)
+            cache_entry = self.response_cache.lookup(cache_key)
+            if cache_entry is not None:
+                if cache_entry.is_fresh():
+                    return request_dict, self.response_cache.hit(plan.endpoint.pk, cache_entry)
+                request_dict['headers'].update(cache_entry.get_conditional_headers())
+        
+        # Fail fast while the API's circuit is open
+        self._check_circuit(api_config)
         
         # Check rate limits
         if api_config.rate_limit_enabled and settings.RATE_LIMIT_ENABLED:
-            if not self._check_rate_limit(api_config):
-                raise Exception(f"Rate limit exceeded for API {api_config.name}")
-        
-        # Prepare request
-        url = f"{api_config.base_url.rstrip('/')}/{endpoint.path.lstrip('/')}"
-        method = endpoint.http_method
-        
-        # Merge headers
-        request_headers = {}
-        if api_config.default_headers:
-            request_headers.update(api_config.default_headers)
-        if endpoint.request_headers:
-            request_headers.update(endpoint.request_headers)
-        if headers:
-            request_headers.update(headers)
-        
-        # Add authentication
-        if api_config.authentication:
-            auth_headers = self._get_auth_headers(api_config.authentication)
-            request_headers.update(auth_headers)
+            self._wait_for_rate_limit(api_config)
         
-        # Prepare request data
-        if data and endpoint.request_body_template:
-            data = self._apply_template(endpoint.request_body_template, data)
+        # Credentials that are not recorded in the request dict are only added on the wire
+        send_headers = request_dict['headers']
+        if plan.auth_strategy.wire_headers:
+            send_headers = {**send_headers, **plan.auth_strategy.wire_headers}
         
-        # Build request dict for logging
-        request_dict = {
-            'url': url,
-            'method': method,
-            'headers': request_headers,
-            'params': params,
-            'data': data
-        }
+        # Encode (and compress) the request body once for all attempts
+        send_data, send_headers = self._encode_body(plan, request_dict['data'], send_headers)
         
-        # Make the request with retry logic
+        # Make the request with retry logic, bounded by the total deadline
+        connect_timeout, read_timeout, total_timeout = plan.timeouts
+        deadline = time.monotonic() + total_timeout if total_timeout else None
         response_dict = None
         retry_count = 0
         max_retries = api_config.max_retries
         
         while retry_count <= max_retries:
             try:
-                # Make the request
-                response = self._make_request(
-                    method=method,
-                    url=url,
-                    headers=request_headers,
-                    params=params,
-                    data=data,
-                    auth=self._get_auth_object(api_config.authentication),
-                    timeout=30  # Default timeout
-                )
-                
-                # Parse response
-                try:
-                    response_data = response.json()
-                except ValueError:
-                    response_data = {'text': response.text}
+                # Make the request (hedged on endpoints with hedging) and read the body
+                timeout = self._get_attempt_timeout(connect_timeout, read_timeout, deadline)
+                if plan.hedge_enabled:
+                    response, body = self.hedging.call(
+                        plan.endpoint.pk,
+                        plan.hedge_percentile,
+                        lambda scope: self._send(plan, request_dict, send_headers, send_data, timeout, scope),
+                        discard=self._discard_attempt,
+                        admit=lambda: self._admit_hedge(api_config)
+                    )
+                else:
+                    response, body = self._send(plan, request_dict, send_headers, send_data, timeout)
+                response_dict = self._build_response(plan, response, body)
+                self._record_call(api_config, response.status_code < 500, response_dict['elapsed'])
                 
-                response_dict = {
-                    'status_code': response.status_code,
-                    'headers': dict(response.headers),
-                    'data': response_data,
-                    'elapsed': response.elapsed.total_seconds()
-                }
+                # Store cacheable responses; a 304 hands back the cached one
+                if cache_key is not None:
+                    response_dict = self.response_cache.update(
+                        plan.endpoint.pk,
+                        cache_key,
+                        cache_entry,
+                        response_dict,
+                        plan.endpoint.cache_ttl
+                    )
                 
                 # Check if response is successful
                 if response.status_code < 400:
-                    # Apply response mapping if defined
-                    if endpoint.response_mapping:
-                        response_dict['mapped_data'] = self._apply_mapping(
-                            endpoint.response_mapping, 
-                            response_data
-                        )
-                    
                     # Log successful request
                     logger.info(
                         f"API call successful: {api_config.name} - {endpoint.name} "
-                        f"({response.status_code}) in {response.elapsed.total_seconds():.2f}s"
+                        f"({response.status_code}) in {response_dict['elapsed']:.2f}s"
                     )
                     
                     break
                 else:
                     # Handle error response
-                    error_msg = f"API error: {response.status_code} - {response.text}"
+                    error_msg = f"API error: {response.status_code} - {body.text}"
                     logger.warning(error_msg)
                     
                     # Check if we should retry
-                    if response.status_code in (429, 500, 502, 503, 504) and retry_count < max_retries:
-                        retry_count += 1
-                        
-                        # Calculate backoff time
-                        backoff_time = self._calculate_backoff_time(
-                            retry_count, 
-                            api_config.retry_backoff,
+                    backoff_time = None
+                    if response.status_code in RETRYABLE_STATUS_CODES and retry_count < max_retries:
+                        backoff_time = self._get_retry_backoff(
+                            retry_count + 1,
+                            api_config,
+                            connect_timeout,
+                            deadline,
                             response
                         )
-                        
+                    
+                    if backoff_time is not None:
+                        # The retry supersedes this response, including its spooled body
+                        self._discard_attempt((response, body))
+                        retry_count += 1
                         logger.info(f"Retrying in {backoff_time:.2f}s (attempt {retry_count}/{max_retries})")
                         time.sleep(backoff_time)
                     else:
@@ -169,17 +195,20 @@ class APIConnectorService:
                     'error': str(e),
                     'elapsed': time.time() - start_time
                 }
+                self._record_call(api_config, False)
                 
                 # Check if we should retry
+                backoff_time = None
                 if retry_count < max_retries:
-                    retry_count += 1
-                    
-                    # Calculate backoff time
-                    backoff_time = self._calculate_backoff_time(
-                        retry_count, 
-                        api_config.retry_backoff
+                    backoff_time = self._get_retry_backoff(
+                        retry_count + 1,
+                        api_config,
+                        connect_timeout,
+                        deadline
                     )
-                    
+                
+                if backoff_time is not None:
+                    retry_count += 1
                     logger.info(f"Retrying in {backoff_time:.2f}s (attempt {retry_count}/{max_retries})")
                     time.sleep(backoff_time)
                 else:
@@ -195,10 +224,304 @@ class APIConnectorService:
         
         return request_dict, response_dict
     
+    async def acall_api(
+        self, 
+        endpoint: APIEndpoint, 
+        data: Dict[str, Any] = None,
+        params: Dict[str, Any] = None,
+        headers: Dict[str, Any] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Call an API endpoint without blocking the event loop
+        
+        Same semantics as call_api, but the request is made with an async
+        HTTP client and retries back off with asyncio.sleep, so many slow
+        calls can be in flight concurrently in a single worker.
+        
+        Args:
+            endpoint: APIEndpoint to call
+            data: Request data (for POST, PUT, PATCH)
+            params: Query parameters (for GET)
+            headers: Additional headers
+            idempotency_key: Key deduplicating the call (ignored for GET requests)
+            
+        Returns:
+            Tuple of (request, response)
+            
+        Raises:
+            DuplicateRequestError: If a call with the same idempotency key is in flight
+        """
+        if idempotency_key and endpoint.http_method.upper() != 'GET':
+            return await self._acall_idempotent(endpoint, data, params, headers, idempotency_key)
+        
+        start_time = time.time()
+        plan = self.plans.peek_endpoint_plan(endpoint)
+        if plan is None:
+            plan = self.plans.get_endpoint_plan(await self._aload_endpoint(endpoint))
+        api_config = plan.api_config
+        
+        # Fetch an expired OAuth 2.0 token off the event loop; valid ones come from memory
+        if not plan.auth_strategy.is_ready():
+            await database_sync_to_async(plan.auth_strategy.get_headers)()
+        
+        # Build request dict (also used for logging)
+        request_dict = self._build_request(plan, data, params, headers)
+        
+        # Serve fresh cached responses without calling the API
+        cache_key = cache_entry = None
+        if plan.cache_enabled:
+            cache_key = self.response_cache.make_key(request_dict, plan.authentication)
+            cache_entry = await self._acache(self.response_cache.lookup, cache_key)
+            if cache_entry is not None:
+                if cache_entry.is_fresh():
+                    return request_dict, self.response_cache.hit(plan.endpoint.pk, cache_entry)
+                request_dict['headers'].update(cache_entry.get_conditional_headers())
+        
+        # Fail fast while the API's circuit is open
+        await self._acircuit(self._check_circuit, api_config)
+        
+        # Check rate limits
+        if api_config.rate_limit_enabled and settings.RATE_LIMIT_ENABLED:
+            await self._await_rate_limit(api_config)
+        
+        # Credentials that are not recorded in the request dict are only added on the wire
+        send_headers = request_dict['headers']
+        if plan.auth_strategy.wire_headers:
+            send_headers = {**send_headers, **plan.auth_strategy.wire_headers}
+        
+        # Encode the request body once for all attempts, compressing it off the event loop
+        if plan.request_compression:
+            send_data, send_headers = await sync_to_async(self._encode_body, thread_sensitive=False)(
+                plan,
+                request_dict['data'],
+                send_headers
+            )
+        else:
+            send_data, send_headers = self._encode_body(plan, request_dict['data'], send_headers)
+        
+        # Make the request with retry logic, bounded by the total deadline
+        connect_timeout, read_timeout, total_timeout = plan.timeouts
+        deadline = time.monotonic() + total_timeout if total_timeout else None
+        response_dict = None
+        retry_count = 0
+        max_retries = api_config.max_retries
+        
+        while retry_count <= max_retries:
+            try:
+                # Make the request (hedged on endpoints with hedging) and read the body
+                timeout = self._get_attempt_timeout(connect_timeout, read_timeout, deadline)
+                if plan.hedge_enabled:
+                    response, body = await self.hedging.acall(
+                        plan.endpoint.pk,
+                        plan.hedge_percentile,
+                        lambda: self._asend(plan, request_dict, send_headers, send_data, timeout),
+                        discard=self._discard_attempt,
+                        admit=lambda: self._aadmit_hedge(api_config)
+                    )
+                else:
+                    response, body = await self._asend(plan, request_dict, send_headers, send_data, timeout)
+                response_dict = self._build_response(plan, response, body)
+                await self._acircuit(self._record_call, api_config, response.status_code < 500, response_dict['elapsed'])
+                
+                # Store cacheable responses; a 304 hands back the cached one
+                if cache_key is not None:
+                    response_dict = await self._acache(
+                        self.response_cache.update,
+                        plan.endpoint.pk,
+                        cache_key,
+                        cache_entry,
+                        response_dict,
+                        plan.endpoint.cache_ttl
+                    )
+                
+                # Check if response is successful
+                if response.status_code < 400:
+                    # Log successful request
+                    logger.info(
+                        f"API call successful: {api_config.name} - {endpoint.name} "
+                        f"({response.status_code}) in {response_dict['elapsed']:.2f}s"
+                    )
+                    
+                    break
+                else:
+                    # Handle error response
+                    error_msg = f"API error: {response.status_code} - {body.text}"
+                    logger.warning(error_msg)
+                    
+                    # Check if we should retry
+                    backoff_time = None
+                    if response.status_code in RETRYABLE_STATUS_CODES and retry_count < max_retries:
+                        backoff_time = await self._acircuit(
+                            self._get_retry_backoff,
+                            retry_count + 1,
+                            api_config,
+                            connect_timeout,
+                            deadline,
+                            response
+                        )
+                    
+                    if backoff_time is not None:
+                        # The retry supersedes this response, including its spooled body
+                        self._discard_attempt((response, body))
+                        retry_count += 1
+                        logger.info(f"Retrying in {backoff_time:.2f}s (attempt {retry_count}/{max_retries})")
+                        await asyncio.sleep(backoff_time)
+                    else:
+                        # Log error and break
+                        await sync_to_async(self._log_error)(
+                            api_config=api_config,
+                            endpoint=endpoint,
+                            request=request_dict,
+                            response=response_dict,
+                            error=error_msg
+                        )
+                        break
+            
+            except Exception as e:
+                # Handle request exception
+                error_msg = f"API request failed: {str(e)}"
+                logger.exception(error_msg)
+                
+                response_dict = {
+                    'status_code': 0,
+                    'error': str(e),
+                    'elapsed': time.time() - start_time
+                }
+                await self._acircuit(self._record_call, api_config, False)
+                
+                # Check if we should retry
+                backoff_time = None
+                if retry_count < max_retries:
+                    backoff_time = await self._acircuit(
+                        self._get_retry_backoff,
+                        retry_count + 1,
+                        api_config,
+                        connect_timeout,
+                        deadline
+                    )
+                
+                if backoff_time is not None:
+                    retry_count += 1
+                    logger.info(f"Retrying in {backoff_time:.2f}s (attempt {retry_count}/{max_retries})")
+                    await asyncio.sleep(backoff_time)
+                else:
+                    # Log error and break
+                    await sync_to_async(self._log_error)(
+                        api_config=api_config,
+                        endpoint=endpoint,
+                        request=request_dict,
+                        response=response_dict,
+                        error=error_msg
+                    )
+                    break
+        
+        return request_dict, response_dict
+    
+    def _call_idempotent(
+        self,
+        endpoint: APIEndpoint,
+        data: Optional[Dict[str, Any]],
+        params: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, Any]],
+        idempotency_key: str
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Call an API endpoint at most once per idempotency key
+        
+        Completed calls are replayed from the idempotency store; failed
+        calls release the key so a retry can make them again.
+        
+        Args:
+            endpoint: APIEndpoint to call
+            data: Request data
+            params: Query parameters
+            headers: Additional headers
+            idempotency_key: Key deduplicating the call
+            
+        Returns:
+            Tuple of (request, response)
+        """
+        outcome = self.idempotency.claim(idempotency_key, endpoint)
+        if outcome is not None:
+            logger.info(f"Replaying completed call with idempotency key {idempotency_key}")
+            return outcome
+        
+        try:
+            request_dict, response_dict = self.call_api(
+                endpoint,
+                data=data,
+                params=params,
+                headers=self._get_idempotency_headers(headers, idempotency_key)
+            )
+        except BaseException:
+            self.idempotency.release(idempotency_key)
+            raise
+        
+        if self._is_final_response(response_dict):
+            self.idempotency.complete(idempotency_key, request_dict, response_dict)
+        else:
+            self.idempotency.release(idempotency_key)
+        
+        return request_dict, response_dict
+    
+    async def _acall_idempotent(
+        self,
+        endpoint: APIEndpoint,
+        data: Optional[Dict[str, Any]],
+        params: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, Any]],
+        idempotency_key: str
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Call an API endpoint at most once per idempotency key without blocking the event loop
+        
+        Same semantics as _call_idempotent.
+        """
+        outcome = await sync_to_async(self.idempotency.claim)(idempotency_key, endpoint)
+        if outcome is not None:
+            logger.info(f"Replaying completed call with idempotency key {idempotency_key}")
+            return outcome
+        
+        try:
+            request_dict, response_dict = await self.acall_api(
+                endpoint,
+                data=data,
+                params=params,
+                headers=self._get_idempotency_headers(headers, idempotency_key)
+            )
+        except BaseException:
+            await sync_to_async(self.idempotency.release)(idempotency_key)
+            raise
+        
+        if self._is_final_response(response_dict):
+            await sync_to_async(self.idempotency.complete)(idempotency_key, request_dict, response_dict)
+        else:
+            await sync_to_async(self.idempotency.release)(idempotency_key)
+        
+        return request_dict, response_dict
+    
+    def _get_idempotency_headers(self, headers: Optional[Dict[str, Any]], idempotency_key: str) -> Dict[str, Any]:
+        """
+        Add the idempotency key header, sent on every attempt so the API can deduplicate too
+        """
+        header_name = getattr(settings, 'API_CONNECTOR_IDEMPOTENCY_HEADER', 'Idempotency-Key')
+        if not header_name:
+            return headers
+        return {**(headers or {}), header_name: idempotency_key}
+    
+    def _is_final_response(self, response_dict: Optional[Dict[str, Any]]) -> bool:
+        """
+        Check whether a response is the API's definite answer (worth replaying to duplicates)
+        """
+        status_code = (response_dict or {}).get('status_code') or 0
+        return 0 < status_code < 500 and status_code not in RETRYABLE_STATUS_CODES
+    
     def execute_function(
         self, 
         function_name: str, 
-        function_args: Dict[str, Any]
+        function_args: Dict[str, Any],
+        idempotency_key: Optional[str] = None
     ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
         """
         Execute a function by name
@@ -206,36 +529,461 @@ class APIConnectorService:
         Args:
             function_name: Name of the function to execute
             function_args: Arguments for the function
+            idempotency_key: Key deduplicating the call (see api_connector.idempotency.make_idempotency_key)
             
         Returns:
             Tuple of (request, response)
         """
-        # Get the function definition
+        # Get the cached execution plan (loads the function definition,
+        # endpoint, configuration and authentication on a miss)
         try:
-            func_def = FunctionDefinition.objects.get(
-                name=function_name,
-                is_active=True
-            )
+            plan = self.plans.get_function_plan(function_name)
         except FunctionDefinition.DoesNotExist:
             raise ValueError(f"Function '{function_name}' not found or not active")
         
-        # Get the API endpoint
-        endpoint = func_def.api_endpoint
+        # Map function arguments to API request
+        mapped_args = plan.argument_mapper(function_args)
         
+        # Determine if arguments should be sent as params or data
+        if plan.sends_params:
+            return self.call_api(plan.endpoint_plan.endpoint, params=mapped_args, idempotency_key=idempotency_key)
+        return self.call_api(plan.endpoint_plan.endpoint, data=mapped_args, idempotency_key=idempotency_key)
+    
+    async def aexecute_function(
+        self, 
+        function_name: str, 
+        function_args: Dict[str, Any],
+        idempotency_key: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Execute a function by name without blocking the event loop
+        
+        Args:
+            function_name: Name of the function to execute
+            function_args: Arguments for the function
+            idempotency_key: Key deduplicating the call (see api_connector.idempotency.make_idempotency_key)
+            
+        Returns:
+            Tuple of (request, response)
+        """
+        # Get the cached execution plan; on a miss everything call_api touches
+        # is loaded up front, since lazy relation loading is not allowed in async code
+        try:
+            plan = await self.plans.aget_function_plan(function_name)
+        except FunctionDefinition.DoesNotExist:
+            raise ValueError(f"Function '{function_name}' not found or not active")
+        
+        return await self._aexecute_plan(plan, function_args, idempotency_key)
+    
+    def execute_functions_batch(
+        self,
+        calls: List[Tuple[str, Dict[str, Any]]],
+        max_concurrency: int = 10
+    ) -> List[Tuple[Optional[Dict[str, Any]], Dict[str, Any]]]:
+        """
+        Execute many function calls concurrently
+        
+        Args:
+            calls: List of (function_name, function_args) tuples
+            max_concurrency: Maximum number of calls in flight at once
+            
+        Returns:
+            List of (request, response) tuples in the same order as calls.
+            Calls that fail before reaching the API return (None, {'error': ...}).
+        """
+        # Always on a loop of its own, so the loop's HTTP clients can be closed afterwards
+        return async_to_sync(self._run_functions_batch, force_new_loop=True)(calls, max_concurrency)
+    
+    async def _run_functions_batch(
+        self,
+        calls: List[Tuple[str, Dict[str, Any]]],
+        max_concurrency: int
+    ) -> List[Tuple[Optional[Dict[str, Any]], Dict[str, Any]]]:
+        """
+        Run a batch for execute_functions_batch and close the clients of its event loop
+        """
+        try:
+            return await self.aexecute_functions_batch(calls, max_concurrency=max_concurrency)
+        finally:
+            await self.pool_registry.aclose_async_clients()
+    
+    async def aexecute_functions_batch(
+        self,
+        calls: List[Tuple[str, Dict[str, Any]]],
+        max_concurrency: int = 10
+    ) -> List[Tuple[Optional[Dict[str, Any]], Dict[str, Any]]]:
+        """
+        Execute many function calls concurrently without blocking the event loop
+        
+        All function plans are resolved at once, with a single query for
+        those not cached yet. Calls run
+        concurrently, bounded globally by max_concurrency and per API
+        configuration by its max_concurrent_requests, and each call still goes
+        through the configuration's rate limit.
+        
+        Args:
+            calls: List of (function_name, function_args) tuples
+            max_concurrency: Maximum number of calls in flight at once
+            
+        Returns:
+            List of (request, response) tuples in the same order as calls.
+            Calls that fail before reaching the API return (None, {'error': ...}).
+        """
+        if not calls:
+            return []
+        
+        # Resolve all function plans, loading the missing ones in one query
+        plans = await self.plans.aget_function_plans(function_name for function_name, _ in calls)
+        
+        # One semaphore for the whole batch, plus one per API configuration
+        batch_semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        config_semaphores = {}
+        for plan in plans.values():
+            api_config = plan.endpoint_plan.api_config
+            if api_config.max_concurrent_requests and api_config.id not in config_semaphores:
+                config_semaphores[api_config.id] = asyncio.Semaphore(api_config.max_concurrent_requests)
+        
+        async def run(function_name: str, function_args: Dict[str, Any]):
+            plan = plans.get(function_name)
+            if plan is None:
+                return None, {'error': f"Function '{function_name}' not found or not active"}
+            
+            config_semaphore = config_semaphores.get(plan.endpoint_plan.api_config.id)
+            try:
+                async with batch_semaphore:
+                    if config_semaphore is None:
+                        return await self._aexecute_plan(plan, function_args)
+                    async with config_semaphore:
+                        return await self._aexecute_plan(plan, function_args)
+            except Exception as e:
+                logger.exception(f"Error executing function {function_name}: {str(e)}")
+                return None, {'error': str(e)}
+        
+        return list(await asyncio.gather(*[
+            run(function_name, function_args) for function_name, function_args in calls
+        ]))
+    
+    async def _aexecute_plan(
+        self,
+        plan: FunctionPlan,
+        function_args: Dict[str, Any],
+        idempotency_key: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Execute a function plan without blocking the event loop
+        
+        Args:
+            plan: FunctionPlan object
+            function_args: Arguments for the function
+            idempotency_key: Key deduplicating the call
+            
+        Returns:
+            Tuple of (request, response)
+        """
         # Map function arguments to API request
-        mapped_args = self._map_function_args(func_def, function_args)
+        mapped_args = plan.argument_mapper(function_args)
         
         # Determine if arguments should be sent as params or data
-        params = None
-        data = None
+        if plan.sends_params:
+            return await self.acall_api(plan.endpoint_plan.endpoint, params=mapped_args, idempotency_key=idempotency_key)
+        return await self.acall_api(plan.endpoint_plan.endpoint, data=mapped_args, idempotency_key=idempotency_key)
+    
+    def _build_request(
+        self,
+        plan: EndpointPlan,
+        data: Dict[str, Any] = None,
+        params: Dict[str, Any] = None,
+        headers: Dict[str, Any] = None
+    ) -> Dict[str, Any]:
+        """
+        Build the request for an API endpoint
         
-        if endpoint.http_method.upper() == 'GET':
-            params = mapped_args
+        Args:
+            plan: EndpointPlan of the endpoint to call
+            data: Request data (for POST, PUT, PATCH)
+            params: Query parameters (for GET)
+            headers: Additional headers
+            
+        Returns:
+            Request dict with url, method, headers, params and data
+        """
+        # Merge headers (the plan's static headers are shared, so copy them)
+        request_headers = dict(plan.static_headers)
+        if headers:
+            request_headers.update(headers)
+        
+        # Add authentication (resolved once per APIAuthentication)
+        request_headers.update(plan.auth_strategy.get_headers())
+        
+        # Prepare request data
+        if data and plan.endpoint.request_body_template:
+            data = self._apply_template(plan.endpoint.request_body_template, data)
+        
+        return {
+            'url': plan.url,
+            'method': plan.method,
+            'headers': request_headers,
+            'params': params,
+            'data': data
+        }
+    
+    def _build_response(self, plan: EndpointPlan, response: Any, body: ResponseBody) -> Dict[str, Any]:
+        """
+        Build the response dict for an HTTP response
+        
+        Args:
+            plan: EndpointPlan of the endpoint that was called
+            response: requests or httpx response object
+            body: Response body read under the size cap
+            
+        Returns:
+            Response dict with status_code, headers, data and elapsed time
+            (plus mapped_data for successful responses with a response mapping).
+            Oversize bodies are not stored: data is None and truncated, size
+            and spool_path (if spooled to disk) are set instead. Streamed
+            bodies only keep mapped_data.
+        """
+        response_dict = {
+            'status_code': response.status_code,
+            'headers': dict(response.headers)
+        }
+        
+        if body.streamed:
+            # Only the fields used by the response mapping were materialized
+            response_data = body.document
+            response_dict['data'] = None
+            response_dict['streamed'] = True
+        elif body.truncated:
+            response_data = body.document
+            response_dict['data'] = None
+            response_dict['truncated'] = True
+            response_dict['size'] = body.size
+            if body.spool_path:
+                response_dict['spool_path'] = body.spool_path
         else:
-            data = mapped_args
+            try:
+                response_data = body.json()
+            except ValueError:
+                response_data = {'text': body.text}
+            response_dict['data'] = response_data
+        
+        response_dict['elapsed'] = response.elapsed.total_seconds()
+        
+        # Apply the compiled response mapping if defined
+        if response.status_code < 400 and plan.response_mapper and response_data is not None:
+            response_dict['mapped_data'] = plan.response_mapper(response_data)
+        
+        return response_dict
+    
+    def _load_endpoint(self, endpoint: APIEndpoint) -> APIEndpoint:
+        """
+        Make sure the endpoint's configuration and authentication are loaded
+        
+        Loading them with the endpoint takes one query instead of one per relation.
         
-        # Call the API
-        return self.call_api(endpoint, data=data, params=params)
+        Args:
+            endpoint: APIEndpoint object
+            
+        Returns:
+            APIEndpoint with api_config and authentication cached
+        """
+        if APIEndpoint.api_config.is_cached(endpoint):
+            api_config = endpoint.api_config
+            if not api_config.authentication_id or APIConfiguration.authentication.is_cached(api_config):
+                return endpoint
+        
+        return APIEndpoint.objects.select_related(
+            'api_config',
+            'api_config__authentication'
+        ).get(pk=endpoint.pk)
+    
+    async def _aload_endpoint(self, endpoint: APIEndpoint) -> APIEndpoint:
+        """
+        Make sure the endpoint's configuration and authentication are loaded
+        
+        Args:
+            endpoint: APIEndpoint object
+            
+        Returns:
+            APIEndpoint with api_config and authentication cached
+        """
+        if APIEndpoint.api_config.is_cached(endpoint):
+            api_config = endpoint.api_config
+            if not api_config.authentication_id or APIConfiguration.authentication.is_cached(api_config):
+                return endpoint
+        
+        return await APIEndpoint.objects.select_related(
+            'api_config',
+            'api_config__authentication'
+        ).aget(pk=endpoint.pk)
+    
+    async def _acircuit(self, method: Any, *args: Any) -> Any:
+        """
+        Call a method using the circuit breaker without blocking the event loop on Redis
+        
+        Args:
+            method: Bound method (e.g. _check_circuit, _record_call, _get_retry_backoff)
+            *args: Method arguments
+            
+        Returns:
+            The method's return value
+        """
+        if self.circuit_breaker.shared and getattr(settings, 'CIRCUIT_BREAKER_ENABLED', True):
+            return await sync_to_async(method, thread_sensitive=False)(*args)
+        return method(*args)
+    
+    async def _acache(self, method: Any, *args: Any) -> Any:
+        """
+        Call a response cache method without blocking the event loop on Redis
+        
+        Args:
+            method: Bound ResponseCache method
+            *args: Method arguments
+            
+        Returns:
+            The method's return value
+        """
+        if self.response_cache.shared:
+            return await sync_to_async(method, thread_sensitive=False)(*args)
+        return method(*args)
+    
+    def _send(
+        self,
+        plan: EndpointPlan,
+        request_dict: Dict[str, Any],
+        headers: Dict[str, Any],
+        data: Any,
+        timeout: Union[float, Tuple[float, float]],
+        scope: Optional[CancelScope] = None
+    ) -> Tuple[Any, ResponseBody]:
+        """
+        Make one request and read its body under the size cap
+        
+        Args:
+            plan: EndpointPlan of the endpoint to call
+            request_dict: Request dict built by _build_request
+            headers: Headers to send
+            data: Request data, or the encoded body
+            timeout: Request timeout in seconds, or a (connect, read) tuple
+            scope: CancelScope of a hedged attempt
+            
+        Returns:
+            Tuple of (response, body)
+        """
+        # Lets a hedged call abort the request while it waits for the response
+        with abort_handler(scope.register if scope is not None else None):
+            response = self._make_request(
+                method=request_dict['method'],
+                url=request_dict['url'],
+                headers=headers,
+                params=request_dict['params'],
+                data=data,
+                timeout=timeout,
+                api_config=plan.api_config
+            )
+        
+        # ...and the body read once the response is there
+        if scope is not None:
+            scope.register(response)
+        
+        body = read_body(
+            response,
+            plan.max_response_size,
+            plan.response_paths,
+            stream=plan.stream_response and response.status_code < 400
+        )
+        return response, body
+    
+    async def _asend(
+        self,
+        plan: EndpointPlan,
+        request_dict: Dict[str, Any],
+        headers: Dict[str, Any],
+        data: Any,
+        timeout: Union[float, Tuple[float, float]]
+    ) -> Tuple[Any, ResponseBody]:
+        """
+        Make one request with the async client and read its body under the size cap
+        
+        Args:
+            plan: EndpointPlan of the endpoint to call
+            request_dict: Request dict built by _build_request
+            headers: Headers to send
+            data: Request data, or the encoded body
+            timeout: Request timeout in seconds, or a (connect, read) tuple
+            
+        Returns:
+            Tuple of (response, body)
+        """
+        response = await self._amake_request(
+            method=request_dict['method'],
+            url=request_dict['url'],
+            headers=headers,
+            params=request_dict['params'],
+            data=data,
+            timeout=timeout,
+            api_config=plan.api_config
+        )
+        
+        body = await aread_body(
+            response,
+            plan.max_response_size,
+            plan.response_paths,
+            stream=plan.stream_response and response.status_code < 400
+        )
+        return response, body
+    
+    def _encode_body(
+        self,
+        plan: EndpointPlan,
+        data: Any,
+        headers: Dict[str, Any]
+    ) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Encode a JSON request body with the fast codec and compress it if configured
+        
+        Args:
+            plan: EndpointPlan of the endpoint to call
+            data: Request data
+            headers: Headers to send
+            
+        Returns:
+            Tuple of (body, headers); data that is not a JSON object is returned as is
+        """
+        if plan.method == 'GET' or not data or not isinstance(data, dict):
+            return data, headers
+        
+        try:
+            body = codec.dumpb(data)
+        except (TypeError, ValueError):
+            # Leave it to the HTTP client to report data that cannot be serialized
+            return data, headers
+        
+        if not any(name.lower() == 'content-type' for name in headers):
+            headers = {**headers, 'Content-Type': 'application/json'}
+        
+        if plan.request_compression:
+            compressed = compress_body(body, plan.request_compression, plan.compression_min_size)
+            if compressed is not None:
+                logger.debug(
+                    f"Compressed request body with {plan.request_compression}: {len(body)} -> {len(compressed)} bytes"
+                )
+                body = compressed
+                headers = {**headers, 'Content-Encoding': plan.request_compression}
+        
+        return body, headers
+    
+    def _discard_attempt(self, result: Tuple[Any, ResponseBody]) -> None:
+        """
+        Release the result of an attempt that was superseded (a hedged
+        attempt that lost, or a response that is retried)
+        """
+        _, body = result
+        if body.spool_path:
+            try:
+                os.unlink(body.spool_path)
+            except OSError:
+                pass
     
     def _make_request(
         self, 
@@ -245,7 +993,8 @@ class APIConnectorService:
         params: Dict[str, Any] = None, 
         data: Dict[str, Any] = None,
         auth: Optional[requests.auth.AuthBase] = None,
-        timeout: int = 30
+        timeout: Union[float, Tuple[float, float]] = 30,
+        api_config: Optional[APIConfiguration] = None
     ) -> requests.Response:
         """
         Make an HTTP request
@@ -255,14 +1004,16 @@ class APIConnectorService:
             url: URL to call
             headers: Request headers
             params: Query parameters
-            data: Request data
+            data: Request data (dicts are sent as JSON, bytes as is)
             auth: Authentication object
-            timeout: Request timeout in seconds
+            timeout: Request timeout in seconds, or a (connect, read) tuple
+            api_config: APIConfiguration whose connection pool should be used
             
         Returns:
-            Response object
+            Response object with the body not read yet (see streaming.read_body)
         """
         method = method.upper()
+        session = self.pool_registry.get_session(api_config)
         
         # Convert data to JSON if it's a dict
         json_data = None
@@ -272,176 +1023,377 @@ class APIConnectorService:
         
         # Make the request
         if method == 'GET':
-            return self.session.get(
+            return session.get(
                 url, 
                 headers=headers, 
                 params=params, 
                 auth=auth, 
-                timeout=timeout
+                timeout=timeout,
+                stream=True
             )
         elif method == 'POST':
-            return self.session.post(
+            return session.post(
                 url, 
                 headers=headers, 
                 params=params, 
                 data=data, 
                 json=json_data, 
                 auth=auth, 
-                timeout=timeout
+                timeout=timeout,
+                stream=True
             )
         elif method == 'PUT':
-            return self.session.put(
+            return session.put(
                 url, 
                 headers=headers, 
                 params=params, 
                 data=data, 
                 json=json_data, 
                 auth=auth, 
-                timeout=timeout
+                timeout=timeout,
+                stream=True
             )
         elif method == 'PATCH':
-            return self.session.patch(
+            return session.patch(
                 url, 
                 headers=headers, 
                 params=params, 
                 data=data, 
                 json=json_data, 
                 auth=auth, 
-                timeout=timeout
+                timeout=timeout,
+                stream=True
             )
         elif method == 'DELETE':
-            return self.session.delete(
+            return session.delete(
                 url, 
                 headers=headers, 
                 params=params, 
                 data=data, 
                 json=json_data, 
                 auth=auth, 
-                timeout=timeout
+                timeout=timeout,
+                stream=True
             )
         else:
             raise ValueError(f"Unsupported HTTP method: {method}")
     
-    def _get_auth_headers(self, auth: APIAuthentication) -> Dict[str, str]:
+    async def _amake_request(
+        self, 
+        method: str, 
+        url: str, 
+        headers: Dict[str, Any] = None, 
+        params: Dict[str, Any] = None, 
+        data: Dict[str, Any] = None,
+        auth: Optional[requests.auth.AuthBase] = None,
+        timeout: Union[float, Tuple[float, float]] = 30,
+        api_config: Optional[APIConfiguration] = None
+    ) -> Any:
         """
-        Get authentication headers
+        Make an HTTP request with the async client
         
         Args:
-            auth: APIAuthentication object
+            method: HTTP method
+            url: URL to call
+            headers: Request headers
+            params: Query parameters
+            data: Request data (dicts are sent as JSON, bytes as is)
+            auth: Authentication object
+            timeout: Request timeout in seconds, or a (connect, read) tuple
+            api_config: APIConfiguration whose connection pool should be used
             
         Returns:
-            Dict of authentication headers
+            httpx.Response object with the body not read yet (see streaming.aread_body)
         """
-        headers = {}
+        import httpx
         
-        if auth.auth_type == 'api_key':
-            # API Key authentication
-            if auth.api_key and auth.api_key_name:
-                headers[auth.api_key_name] = auth.api_key
+        method = method.upper()
+        if method not in ('GET', 'POST', 'PUT', 'PATCH', 'DELETE'):
+            raise ValueError(f"Unsupported HTTP method: {method}")
         
-        elif auth.auth_type == 'bearer':
-            # Bearer token authentication
-            if auth.token:
-                headers['Authorization'] = f"Bearer {auth.token}"
+        client = self.pool_registry.get_async_client(api_config)
         
-        # OAuth 2.0 token is handled by _get_auth_object
+        # Convert data to JSON if it's a dict
+        json_data = None
+        if data and isinstance(data, dict):
+            json_data = data
+            data = None
+        
+        # httpx only accepts a body for methods that define one
+        if method == 'GET':
+            json_data = data = None
+        
+        # Pre-encoded (e.g. compressed) bodies are sent as raw content
+        content = None
+        if isinstance(data, bytes):
+            content, data = data, None
+        
+        if isinstance(auth, HTTPBasicAuth):
+            auth = (auth.username, auth.password)
+        
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
         
-        return headers
+        request = client.build_request(
+            method,
+            url,
+            headers=headers,
+            params=params,
+            content=content,
+            data=data,
+            json=json_data,
+            timeout=timeout
+        )
+        return await client.send(request, auth=auth, stream=True)
     
-    def _get_auth_object(self, auth: Optional[APIAuthentication]) -> Optional[requests.auth.AuthBase]:
+    def _check_rate_limit(self, api_config: APIConfiguration) -> Tuple[bool, float]:
         """
-        Get authentication object for requests
+        Check if the API call is within rate limits
+        
+        The decision is made by the configured rate limiter backend
+        (settings.RATE_LIMIT_BACKEND); RateLimitLog is only written
+        asynchronously as an audit trail.
         
         Args:
-            auth: APIAuthentication object
+            api_config: APIConfiguration object
             
         Returns:
-            Authentication object or None
+            Tuple of (within limits, seconds until the next call would be allowed)
         """
-        if not auth:
-            return None
+        if not api_config.rate_limit_enabled:
+            return True, 0.0
         
-        if auth.auth_type == 'basic':
-            # Basic authentication
-            if auth.username and auth.password:
-                return HTTPBasicAuth(auth.username, auth.password)
-        
-        elif auth.auth_type == 'oauth2':
-            # OAuth 2.0 authentication
-            # Check if token is expired and refresh if needed
-            if auth.expires_at and auth.expires_at <= timezone.now():
-                # Token is expired, refresh it
-                # This would be implemented in a real application
-                pass
+        try:
+            return check_rate_limit('api_config', str(api_config.id), api_config.rate_limit)
+            
+        except Exception as e:
+            # Log error but don't block the request
+            logger.exception(f"Error checking rate limit: {str(e)}")
+            return True, 0.0
+    
+    def _wait_for_rate_limit(self, api_config: APIConfiguration) -> None:
+        """
+        Acquire a rate limit slot, waiting for it if the configuration allows
+        
+        Args:
+            api_config: APIConfiguration object
+            
+        Raises:
+            RateLimitExceeded: If no slot is available (within the maximum wait
+                in 'wait' mode); retry_after tells when the next slot frees up
+        """
+        max_wait = self._get_max_rate_limit_wait(api_config)
+        waited = 0.0
         
-        return None
+        while True:
+            allowed, retry_after = self._check_rate_limit(api_config)
+            if allowed:
+                return
+            
+            if waited + retry_after > max_wait:
+                raise RateLimitExceeded(f"Rate limit exceeded for API {api_config.name}", retry_after)
+            
+            logger.info(f"Rate limit reached for API {api_config.name}, waiting {retry_after:.2f}s")
+            time.sleep(retry_after)
+            waited += retry_after
     
-    def _check_rate_limit(self, api_config: APIConfiguration) -> bool:
+    async def _await_rate_limit(self, api_config: APIConfiguration) -> None:
         """
-        Check if the API call is within rate limits
+        Acquire a rate limit slot without blocking the event loop
+        
+        Args:
+            api_config: APIConfiguration object
+            
+        Raises:
+            RateLimitExceeded: If no slot is available (within the maximum wait
+                in 'wait' mode); retry_after tells when the next slot frees up
+        """
+        max_wait = self._get_max_rate_limit_wait(api_config)
+        waited = 0.0
+        
+        while True:
+            allowed, retry_after = await sync_to_async(self._check_rate_limit, thread_sensitive=False)(api_config)
+            if allowed:
+                return
+            
+            if waited + retry_after > max_wait:
+                raise RateLimitExceeded(f"Rate limit exceeded for API {api_config.name}", retry_after)
+            
+            logger.info(f"Rate limit reached for API {api_config.name}, waiting {retry_after:.2f}s")
+            await asyncio.sleep(retry_after)
+            waited += retry_after
+    
+    def _admit_hedge(self, api_config: APIConfiguration) -> bool:
+        """
+        Take a rate limit slot for a hedge request, without waiting for one
         
         Args:
             api_config: APIConfiguration object
             
         Returns:
-            True if within limits, False otherwise
+            True if the hedge may be sent
         """
-        if not api_config.rate_limit_enabled:
+        if not (api_config.rate_limit_enabled and settings.RATE_LIMIT_ENABLED):
             return True
         
-        # Parse rate limit
-        try:
-            limit_parts = api_config.rate_limit.split('/')
-            limit = int(limit_parts[0])
-            period = limit_parts[1].lower()
-            
-            # Calculate window
-            now = timezone.now()
-            
-            if period == 'second':
-                window_start = now.replace(microsecond=0)
-                window_end = window_start + timedelta(seconds=1)
-            elif period == 'minute':
-                window_start = now.replace(second=0, microsecond=0)
-                window_end = window_start + timedelta(minutes=1)
-            elif period == 'hour':
-                window_start = now.replace(minute=0, second=0, microsecond=0)
-                window_end = window_start + timedelta(hours=1)
-            elif period == 'day':
-                window_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-                window_end = window_start + timedelta(days=1)
-            else:
-                # Invalid period, default to hourly
-                window_start = now.replace(minute=0, second=0, microsecond=0)
-                window_end = window_start + timedelta(hours=1)
-            
-            # Check if we have a rate limit log for this window
-            rate_limit_log, created = RateLimitLog.objects.get_or_create(
-                target_type='api_config',
-                target_id=str(api_config.id),
-                window_start=window_start,
-                defaults={
-                    'window_end': window_end,
-                    'limit': limit,
-                    'request_count': 1
-                }
-            )
-            
-            if not created:
-                # Increment request count
-                if rate_limit_log.request_count >= rate_limit_log.limit:
-                    # Rate limit exceeded
-                    return False
-                
-                rate_limit_log.request_count += 1
-                rate_limit_log.save(update_fields=['request_count', 'last_request_at'])
+        allowed, _ = self._check_rate_limit(api_config)
+        if not allowed:
+            logger.debug(f"Rate limit reached for API {api_config.name}, not hedging")
+        return allowed
+    
+    async def _aadmit_hedge(self, api_config: APIConfiguration) -> bool:
+        """
+        Take a rate limit slot for a hedge request without blocking the event loop
+        
+        Args:
+            api_config: APIConfiguration object
             
+        Returns:
+            True if the hedge may be sent
+        """
+        if not (api_config.rate_limit_enabled and settings.RATE_LIMIT_ENABLED):
             return True
+        
+        return await sync_to_async(self._admit_hedge, thread_sensitive=False)(api_config)
+    
+    def _get_max_rate_limit_wait(self, api_config: APIConfiguration) -> float:
+        """
+        Get how long a call may wait for a rate limit slot
+        
+        Args:
+            api_config: APIConfiguration object
             
+        Returns:
+            Maximum wait in seconds (0 when the configuration fails fast)
+        """
+        if api_config.rate_limit_mode == 'wait':
+            return getattr(settings, 'RATE_LIMIT_MAX_WAIT', 5)
+        return 0.0
+    
+    def _check_circuit(self, api_config: APIConfiguration) -> None:
+        """
+        Check the circuit breaker for an API configuration
+        
+        Args:
+            api_config: APIConfiguration object
+            
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        if not getattr(settings, 'CIRCUIT_BREAKER_ENABLED', True):
+            return
+        
+        try:
+            allowed, retry_after = self.circuit_breaker.allow(f"api_config:{api_config.id}")
         except Exception as e:
             # Log error but don't block the request
-            logger.exception(f"Error checking rate limit: {str(e)}")
-            return True
+            logger.exception(f"Error checking circuit breaker: {str(e)}")
+            return
+        
+        if not allowed:
+            raise CircuitOpenError(f"Circuit open for API {api_config.name}", retry_after)
+    
+    def _is_circuit_open(self, api_config: APIConfiguration) -> bool:
+        """
+        Check whether the circuit for an API configuration is open
+        
+        Args:
+            api_config: APIConfiguration object
+            
+        Returns:
+            True if calls are currently being short-circuited
+        """
+        if not getattr(settings, 'CIRCUIT_BREAKER_ENABLED', True):
+            return False
+        
+        try:
+            return self.circuit_breaker.is_open(f"api_config:{api_config.id}")
+        except Exception as e:
+            logger.exception(f"Error checking circuit breaker: {str(e)}")
+            return False
+    
+    def _record_call(self, api_config: APIConfiguration, success: bool, elapsed: float = 0.0) -> None:
+        """
+        Record the outcome of a call attempt with the circuit breaker
+        
+        Args:
+            api_config: APIConfiguration object
+            success: Whether the API answered without a server error
+            elapsed: Attempt duration in seconds
+        """
+        if not getattr(settings, 'CIRCUIT_BREAKER_ENABLED', True):
+            return
+        
+        try:
+            self.circuit_breaker.record(f"api_config:{api_config.id}", success, elapsed)
+        except Exception as e:
+            logger.exception(f"Error recording circuit breaker outcome: {str(e)}")
+    
+    def _get_attempt_timeout(
+        self,
+        connect_timeout: float,
+        read_timeout: float,
+        deadline: Optional[float]
+    ) -> Tuple[float, float]:
+        """
+        Get the (connect, read) timeout for one attempt, capped by the deadline
+        
+        Args:
+            connect_timeout: Connect timeout in seconds
+            read_timeout: Read timeout in seconds
+            deadline: Monotonic deadline for the whole call, or None
+            
+        Returns:
+            Tuple of (connect timeout, read timeout)
+        """
+        if deadline is None:
+            return connect_timeout, read_timeout
+        
+        remaining = max(0.001, deadline - time.monotonic())
+        return min(connect_timeout, remaining), min(read_timeout, remaining)
+    
+    def _get_retry_backoff(
+        self,
+        retry_count: int,
+        api_config: APIConfiguration,
+        connect_timeout: float,
+        deadline: Optional[float],
+        response: Optional[Any] = None
+    ) -> Optional[float]:
+        """
+        Get the backoff before the next retry, if the retry fits in the deadline
+        
+        A retry is skipped when, after backing off, there would not even be
+        enough time left to open a connection.
+        
+        Args:
+            retry_count: Retry attempt about to be made
+            api_config: APIConfiguration object
+            connect_timeout: Connect timeout in seconds
+            deadline: Monotonic deadline for the whole call, or None
+            response: Response object (to check for Retry-After header)
+            
+        Returns:
+            Backoff time in seconds, or None if the retry should be skipped
+        """
+        backoff_time = self._calculate_backoff_time(
+            retry_count,
+            api_config.retry_backoff,
+            response
+        )
+        
+        if deadline is not None and time.monotonic() + backoff_time + connect_timeout > deadline:
+            logger.warning(
+                f"Skipping retry {retry_count} for API {api_config.name}: "
+                f"backoff of {backoff_time:.2f}s would exceed the deadline"
+            )
+            return None
+        
+        if self._is_circuit_open(api_config):
+            logger.warning(f"Skipping retry {retry_count} for API {api_config.name}: circuit is open")
+            return None
+        
+        return backoff_time
     
     def _calculate_backoff_time(
         self, 
@@ -508,118 +1460,6 @@ class APIConnectorService:
         
         return result
     
-    def _apply_mapping(self, mapping: Dict[str, str], data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Apply a mapping to response data
-        
-        Args:
-            mapping: Mapping dict
-            data: Input data
-            
-        Returns:
-            Mapped data
-        """
-        result = {}
-        
-        for target_key, source_path in mapping.items():
-            # Handle simple key mapping
-            if '.' not in source_path:
-                if source_path in data:
-                    result[target_key] = data[source_path]
-            else:
-                # Handle nested paths (e.g., "data.items.0.id")
-                parts = source_path.split('.')
-                value = data
-                for part in parts:
-                    try:
-                        # Handle array indices
-                        if part.isdigit():
-                            part = int(part)
-                        
-                        if isinstance(value, dict) and part in value:
-                            value = value[part]
-                        elif isinstance(value, list) and isinstance(part, int) and part < len(value):
-                            value = value[part]
-                        else:
-                            value = None
-                            break
-                    except (KeyError, TypeError, IndexError):
-                        value = None
-                        break
-                
-                if value is not None:
-                    result[target_key] = value
-        
-        return result
-    
-    def _map_function_args(
-        self, 
-        func_def: FunctionDefinition, 
-        function_args: Dict[str, Any]
-    ) -> Dict[str, Any]:
-        """
-        Map function arguments to API request parameters
-        
-        Args:
-            func_def: Function definition
-            function_args: Arguments from function call
-            
-        Returns:
-            Mapped arguments for the API request
-        """
-        # If no mapping is defined, use the arguments as-is
-        if not func_def.parameter_mapping:
-            return function_args
-        
-        # Apply the mapping
-        mapped_args = {}
-        
-        for target_key, source_path in func_def.parameter_mapping.items():
-            # Handle simple key mapping
-            if isinstance(source_path, str) and source_path in function_args:
-                mapped_args[target_key] = function_args[source_path]
-            
-            # Handle nested paths (e.g., "user.name")
-            elif isinstance(source_path, str) and '.' in source_path:
-                parts = source_path.split('.')
-                value = function_args
-                for part in parts:
-                    if isinstance(value, dict) and part in value:
-                        value = value[part]
-                    else:
-                        value = None
-                        break
-                if value is not None:
-                    mapped_args[target_key] = value
-            
-            # Handle template strings (e.g., "{user.name} <{user.email}>")
-            elif isinstance(source_path, str) and '{' in source_path:
-                template = source_path
-                for arg_name, arg_value in function_args.items():
-                    if isinstance(arg_value, (str, int, float, bool)):
-                        template = template.replace(f"{{{arg_name}}}", str(arg_value))
-                mapped_args[target_key] = template
-            
-            # Handle static values
-            elif isinstance(source_path, dict) and 'static' in source_path:
-                mapped_args[target_key] = source_path['static']
-            
-            # Handle transformations
-            elif isinstance(source_path, dict) and 'transform' in source_path:
-                if source_path['transform'] == 'join' and 'fields' in source_path and 'separator' in source_path:
-                    values = []
-                    for field in source_path['fields']:
-                        if field in function_args:
-                            values.append(str(function_args[field]))
-                    mapped_args[target_key] = source_path['separator'].join(values)
-        
-        # Include any unmapped arguments if they match target keys
-        for key, value in function_args.items():
-            if key not in func_def.parameter_mapping and key not in mapped_args:
-                mapped_args[key] = value
-        
-        return mapped_args
-    
     def _log_error(
         self,
         api_config: APIConfiguration,
@@ -0,0 +1,32 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import APIAuthentication, APIConfiguration, APIEndpoint, FunctionDefinition
+from .auth import get_auth_strategies
+from .oauth import get_token_manager
+from .plans import get_plan_cache
+
+
+@receiver(post_save, sender=APIAuthentication)
+@receiver(post_save, sender=APIConfiguration)
+@receiver(post_save, sender=APIEndpoint)
+@receiver(post_save, sender=FunctionDefinition)
+@receiver(post_delete, sender=APIAuthentication)
+@receiver(post_delete, sender=APIConfiguration)
+@receiver(post_delete, sender=APIEndpoint)
+@receiver(post_delete, sender=FunctionDefinition)
+def invalidate_execution_plans(sender, **kwargs):
+    """
+    Drop cached execution plans when connector configuration changes
+    """
+    get_plan_cache().clear()
+
+
+@receiver(post_save, sender=APIAuthentication)
+@receiver(post_delete, sender=APIAuthentication)
+def invalidate_authentication(sender, instance, **kwargs):
+    """
+    Drop the cached auth strategy and OAuth 2.0 token when credentials are edited
+    """
+    get_auth_strategies().invalidate(instance.pk)
+    get_token_manager().invalidate(instance)
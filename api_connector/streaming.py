@@ -0,0 +1,443 @@
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from core import codec
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+logger = logging.getLogger('api_hub.api_connector.streaming')
+
+# Bytes read from the network at a time
+CHUNK_SIZE = 64 * 1024
+
+# Names of the files oversize response bodies are spooled to
+SPOOL_PREFIX = 'api_response_'
+SPOOL_SUFFIX = '.body'
+
+# Container events reported by ijson.basic_parse
+START_EVENTS = ('start_map', 'start_array')
+END_EVENTS = ('end_map', 'end_array')
+
+
+class ResponseBody:
+    """
+    Body of an HTTP response, read under a size cap
+
+    Exactly one of these holds the body:
+        - content: the raw bytes, for bodies within the cap
+        - spool_path: a file with the full body, for oversize bodies when
+          spooling is enabled (the caller owns the file)
+        - document: only the parts of the JSON body referenced by the
+          response mapping, when the body was parsed incrementally
+    An oversize body that was neither spooled nor parsed is dropped.
+    """
+
+    __slots__ = ('content', 'size', 'truncated', 'spool_path', 'streamed', 'document', 'encoding')
+
+    def __init__(self, encoding: Optional[str] = None):
+        self.content: Optional[bytes] = None
+        self.size = 0
+        self.truncated = False
+        self.spool_path: Optional[str] = None
+        self.streamed = False
+        self.document: Any = None
+        self.encoding = encoding
+
+    @property
+    def text(self) -> str:
+        """
+        Body decoded as text ('' when the body was not kept in memory)
+        """
+        if self.content is None:
+            return ''
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def json(self) -> Any:
+        """
+        Body parsed as JSON
+
+        Raises:
+            ValueError: If the body is not kept in memory or is not valid JSON
+        """
+        if self.content is None:
+            raise ValueError("Response body was not kept in memory")
+        return codec.loads(self.content)
+
+
+class PrunedDocumentBuilder:
+    """
+    Build a JSON document from ijson events, keeping only the given paths
+
+    Paths use the response mapping syntax ("items.*.id"). Everything not on
+    one of the paths is skipped while parsing, so only the referenced parts
+    of the document are ever materialized. Skipped list items are kept as
+    None so list indices stay valid; wildcard and slice segments and
+    negative indices keep every item of a list.
+    """
+
+    def __init__(self, paths: Iterable[str]):
+        """
+        Args:
+            paths: Dotted paths to keep
+        """
+        self.patterns = [tuple(self._compile_segment(segment) for segment in path.split('.')) for path in paths]
+        self.root = None
+        self._stack: List[list] = []
+        self._skip = 0
+
+    @staticmethod
+    def _compile_segment(segment: str) -> Tuple[str, Optional[int], bool]:
+        if segment == '*' or ':' in segment:
+            return segment, None, True
+        try:
+            return segment, int(segment), False
+        except ValueError:
+            return segment, None, False
+
+    @staticmethod
+    def _matches(segment: Tuple[str, Optional[int], bool], step: Any) -> bool:
+        key, index, wildcard = segment
+        if wildcard:
+            return True
+        if isinstance(step, int):
+            return index is not None and (index < 0 or index == step)
+        return key == step
+
+    def feed(self, events: Iterable[Tuple[str, Any]]) -> None:
+        """
+        Consume a batch of ijson.basic_parse events
+        """
+        stack = self._stack
+
+        for event, value in events:
+            if self._skip:
+                if event in START_EVENTS:
+                    self._skip += 1
+                elif event in END_EVENTS:
+                    self._skip -= 1
+                    if not self._skip:
+                        self._advance()
+                continue
+
+            if event == 'map_key':
+                stack[-1][3] = value
+                continue
+
+            if event in END_EVENTS:
+                stack.pop()
+                self._advance()
+                continue
+
+            decision = self._decide()
+            if decision is None:
+                # Not referenced by any path: keep list indices stable and skip it
+                if stack and stack[-1][1] == 'array':
+                    stack[-1][0].append(None)
+                if event in START_EVENTS:
+                    self._skip = 1
+                else:
+                    self._advance()
+                continue
+
+            full, live = decision
+            if event in START_EVENTS:
+                container = {} if event == 'start_map' else []
+                self._attach(container)
+                # Frame: [container, kind, depth, key or index, keep everything, live patterns]
+                stack.append([container, 'map' if event == 'start_map' else 'array', len(stack), 0, full, live])
+            else:
+                self._attach(value)
+                self._advance()
+
+    def _decide(self) -> Optional[Tuple[bool, Optional[list]]]:
+        """
+        Decide whether the next value is kept entirely, partially or skipped
+        """
+        if not self._stack:
+            return (False, self.patterns) if self.patterns else None
+
+        container, kind, depth, step, full, live = self._stack[-1]
+        if full:
+            return True, None
+
+        live = [pattern for pattern in live if self._matches(pattern[depth], step)]
+        if not live:
+            return None
+        if any(len(pattern) == depth + 1 for pattern in live):
+            return True, None
+        return False, live
+
+    def _attach(self, value: Any) -> None:
+        if not self._stack:
+            self.root = value
+            return
+
+        frame = self._stack[-1]
+        if frame[1] == 'map':
+            frame[0][frame[3]] = value
+        else:
+            frame[0].append(value)
+
+    def _advance(self) -> None:
+        if self._stack and self._stack[-1][1] == 'array':
+            self._stack[-1][3] += 1
+
+
+class BodyReader:
+    """
+    Push-style reader enforcing the size cap, shared by the sync and async paths
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        encoding: Optional[str] = None,
+        paths: Optional[Sequence[str]] = None,
+        stream: bool = False
+    ):
+        """
+        Args:
+            max_size: Maximum body size kept in memory in bytes (0 = no limit)
+            encoding: Response text encoding
+            paths: Paths referenced by the response mapping
+            stream: Parse the body incrementally, keeping only `paths`
+        """
+        self.body = ResponseBody(encoding)
+        self.max_size = max_size
+        self.paths = paths
+        self._chunks: List[bytes] = []
+        self._spool = None
+        self._builder = None
+        self._parser = None
+        self._events = None
+        self._parse_failed = False
+
+        if stream and paths and ijson is not None:
+            self._builder = PrunedDocumentBuilder(paths)
+            self._events = ijson.sendable_list()
+            self._parser = ijson.basic_parse_coro(self._events, use_float=True)
+            self.body.streamed = True
+
+    def feed(self, chunk: bytes) -> bool:
+        """
+        Consume a chunk of the body
+
+        Returns:
+            False if the rest of the body should not be read
+        """
+        self.body.size += len(chunk)
+
+        if self._builder is not None:
+            # Nothing is kept once the body turned out not to be valid JSON
+            return self._parse(chunk)
+
+        if self._spool is not None:
+            self._spool.write(chunk)
+            return True
+
+        self._chunks.append(chunk)
+        if not self.max_size or self.body.size <= self.max_size:
+            return True
+
+        self.body.truncated = True
+        if getattr(settings, 'API_CONNECTOR_SPOOL_OVERSIZE', True):
+            self._spool = tempfile.NamedTemporaryFile(
+                prefix=SPOOL_PREFIX,
+                suffix=SPOOL_SUFFIX,
+                dir=getattr(settings, 'API_CONNECTOR_SPOOL_DIR', None),
+                delete=False
+            )
+            self._spool.writelines(self._chunks)
+            self._chunks = []
+            return True
+
+        self._chunks = []
+        return False
+
+    def finish(self) -> ResponseBody:
+        """
+        Finish reading and return the body
+        """
+        body = self.body
+
+        if self._builder is not None:
+            if not self._parse_failed:
+                try:
+                    self._parser.close()
+                    self._flush_events()
+                    body.document = self._builder.root
+                except ijson.JSONError as e:
+                    logger.warning(f"Could not parse streamed response body: {str(e)}")
+            return body
+
+        if self._spool is not None:
+            self._spool.close()
+            body.spool_path = self._spool.name
+            logger.warning(f"Response body of {body.size} bytes exceeded the size cap, spooled to {body.spool_path}")
+            if self.paths and ijson is not None:
+                body.document = self._parse_file(body.spool_path)
+            return body
+
+        if body.truncated:
+            logger.warning(f"Response body exceeded the size cap of {self.max_size} bytes and was dropped")
+            return body
+
+        body.content = b''.join(self._chunks)
+        return body
+
+    def discard(self) -> None:
+        """
+        Release resources after a failed read
+        """
+        self._chunks = []
+        if self._spool is not None:
+            self._spool.close()
+            try:
+                os.unlink(self._spool.name)
+            except OSError:
+                pass
+
+    def _parse(self, chunk: bytes) -> bool:
+        try:
+            self._parser.send(chunk)
+            self._flush_events()
+        except ijson.JSONError as e:
+            logger.warning(f"Could not parse streamed response body: {str(e)}")
+            self._parse_failed = True
+            return False
+        return True
+
+    def _flush_events(self) -> None:
+        if self._events:
+            self._builder.feed(self._events)
+            del self._events[:]
+
+    def _parse_file(self, path: str) -> Any:
+        builder = PrunedDocumentBuilder(self.paths)
+        try:
+            with open(path, 'rb') as spool:
+                builder.feed(ijson.basic_parse(spool, use_float=True))
+        except ijson.JSONError as e:
+            logger.warning(f"Could not parse spooled response body {path}: {str(e)}")
+            return None
+        return builder.root
+
+
+def purge_spool(max_age: float) -> int:
+    """
+    Delete spooled response bodies older than `max_age` seconds
+
+    Args:
+        max_age: Maximum age of spooled bodies to keep in seconds
+
+    Returns:
+        Number of files deleted
+    """
+    directory = getattr(settings, 'API_CONNECTOR_SPOOL_DIR', None) or tempfile.gettempdir()
+    cutoff = time.time() - max_age
+    deleted = 0
+
+    try:
+        entries = list(os.scandir(directory))
+    except OSError as e:
+        logger.warning(f"Could not list spool directory {directory}: {str(e)}")
+        return 0
+
+    for entry in entries:
+        if not (entry.name.startswith(SPOOL_PREFIX) and entry.name.endswith(SPOOL_SUFFIX)):
+            continue
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+                deleted += 1
+        except OSError:
+            # Deleted concurrently or not ours to delete
+            pass
+
+    return deleted
+
+
+def _get_encoding(response: Any) -> Optional[str]:
+    encoding = getattr(response, 'encoding', None)
+    return encoding if isinstance(encoding, str) else None
+
+
+def read_body(
+    response: Any,
+    max_size: int,
+    paths: Optional[Sequence[str]] = None,
+    stream: bool = False
+) -> ResponseBody:
+    """
+    Read a streamed requests/httpx response body under a size cap
+
+    Args:
+        response: Response made with stream=True
+        max_size: Maximum body size kept in memory in bytes (0 = no limit)
+        paths: Paths referenced by the response mapping
+        stream: Parse the body incrementally, keeping only `paths`
+
+    Returns:
+        ResponseBody object
+    """
+    reader = BodyReader(max_size, _get_encoding(response), paths, stream)
+
+    try:
+        if hasattr(response, 'iter_content'):
+            chunks = response.iter_content(CHUNK_SIZE)
+        else:
+            chunks = response.iter_bytes(CHUNK_SIZE)
+
+        for chunk in chunks:
+            if chunk and not reader.feed(chunk):
+                break
+    except BaseException:
+        reader.discard()
+        raise
+    finally:
+        response.close()
+
+    return reader.finish()
+
+
+async def aread_body(
+    response: Any,
+    max_size: int,
+    paths: Optional[Sequence[str]] = None,
+    stream: bool = False
+) -> ResponseBody:
+    """
+    Read a streamed httpx response body under a size cap without blocking the event loop
+
+    Args:
+        response: httpx response sent with stream=True
+        max_size: Maximum body size kept in memory in bytes (0 = no limit)
+        paths: Paths referenced by the response mapping
+        stream: Parse the body incrementally, keeping only `paths`
+
+    Returns:
+        ResponseBody object
+    """
+    reader = BodyReader(max_size, _get_encoding(response), paths, stream)
+
+    try:
+        async for chunk in response.aiter_bytes(CHUNK_SIZE):
+            if chunk and not reader.feed(chunk):
+                break
+    except BaseException:
+        reader.discard()
+        raise
+    finally:
+        await response.aclose()
+
+    # Parsing a spooled body may take a while, so keep it off the event loop
+    return await sync_to_async(reader.finish, thread_sensitive=False)()
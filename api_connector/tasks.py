@@ -0,0 +1,127 @@
+import logging
+from celery import shared_task
+
+from django.conf import settings
+
+from core.ratelimit import RateLimitExceeded
+from .circuit import CircuitOpenError
+from .idempotency import DuplicateRequestError, get_idempotency_store, make_idempotency_key
+from .services import APIConnectorService
+from .streaming import purge_spool
+
+logger = logging.getLogger('api_hub.api_connector.tasks')
+
+@shared_task(
+    bind=True,
+    max_retries=3,
+    acks_late=True
+)
+def execute_function_task(self, function_name, function_args, message_id=None, reschedules=0):
+    """
+    Execute a function asynchronously
+
+    Rate-limited calls are re-enqueued for the moment the limiter says a
+    slot frees up, instead of retrying with a blind backoff; these
+    reschedules are counted apart from the retries after failures, which
+    keep their own limit (max_retries) and backoff. Calls are
+    deduplicated by an idempotency key derived from the message, function
+    and arguments (or the task ID, which retries keep), so a retry after a
+    lost response does not repeat the call.
+
+    Args:
+        function_name: Name of the function to execute
+        function_args: Arguments for the function
+        message_id: ID of the message the call was made for
+        reschedules: Number of times the task was rescheduled for a rate limit slot
+
+    Returns:
+        Dict with the request and response
+    """
+    logger.info(f"Executing function {function_name}")
+
+    # Celery counts every retry in request.retries, including rate limit reschedules
+    retries = self.request.retries - reschedules
+    max_retries = self.max_retries + reschedules
+
+    work_id = message_id if message_id is not None else self.request.id
+    idempotency_key = make_idempotency_key(work_id, function_name, function_args) if work_id is not None else None
+
+    try:
+        service = APIConnectorService()
+        request, response = service.execute_function(function_name, function_args, idempotency_key=idempotency_key)
+
+        return {
+            'request': request,
+            'response': response
+        }
+
+    except RateLimitExceeded as e:
+        logger.info(f"Rate limit reached for function {function_name}, rescheduling in {e.retry_after:.2f}s")
+
+        # Waiting for a rate limit slot is not a failure, so reschedules get
+        # their own budget and leave the regular retries untouched
+        max_reschedules = getattr(settings, 'RATE_LIMIT_MAX_RESCHEDULES', 50)
+        if reschedules >= max_reschedules:
+            logger.warning(f"Giving up on function {function_name} after {reschedules} rate limit reschedules")
+            raise
+        raise self.retry(
+            exc=e,
+            countdown=e.retry_after,
+            kwargs={**(self.request.kwargs or {}), 'reschedules': reschedules + 1},
+            max_retries=self.request.retries + 1
+        )
+
+    except DuplicateRequestError as e:
+        logger.info(f"Function {function_name} is already being executed, checking again in {e.retry_after:.2f}s")
+        raise self.retry(exc=e, countdown=e.retry_after, max_retries=max_retries)
+
+    except CircuitOpenError as e:
+        logger.warning(f"Circuit open for function {function_name}, retrying in {e.retry_after:.2f}s")
+        raise self.retry(exc=e, countdown=e.retry_after, max_retries=max_retries)
+
+    except ValueError:
+        # Unknown or inactive function, retrying will not help
+        logger.exception(f"Error executing function {function_name}")
+        raise
+
+    except Exception as e:
+        logger.exception(f"Error executing function {function_name}: {str(e)}")
+
+        # Retry with exponential backoff
+        raise self.retry(exc=e, countdown=2 ** retries, max_retries=max_retries)
+
+
+@shared_task
+def purge_idempotency_records(max_age_hours=None):
+    """
+    Delete idempotency records of old calls
+
+    Args:
+        max_age_hours: Maximum age of records to keep in hours
+            (defaults to settings.API_CONNECTOR_IDEMPOTENCY_RETENTION)
+    """
+    if max_age_hours is None:
+        max_age_hours = getattr(settings, 'API_CONNECTOR_IDEMPOTENCY_RETENTION', 24)
+
+    deleted = get_idempotency_store().purge(max_age_hours * 3600)
+    logger.info(f"Deleted {deleted} idempotency records older than {max_age_hours} hours")
+
+    return f"Deleted {deleted} idempotency records"
+
+
+@shared_task
+def purge_spooled_responses(max_age_hours=None):
+    """
+    Delete response bodies spooled to disk by old calls
+
+    Args:
+        max_age_hours: Maximum age of spooled bodies to keep in hours
+            (defaults to settings.API_CONNECTOR_SPOOL_RETENTION)
+    """
+    if max_age_hours is None:
+        max_age_hours = getattr(settings, 'API_CONNECTOR_SPOOL_RETENTION', 24)
+
+    deleted = purge_spool(max_age_hours * 3600)
+    logger.info(f"Deleted {deleted} spooled response bodies older than {max_age_hours} hours")
+
+    return f"Deleted {deleted} spooled response bodies"
@@ -1,3 +1,881 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import requests
+from celery.exceptions import Retry
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from core.models import ErrorLog
+from core.ratelimit import RateLimitExceeded
+from .auth import AuthStrategyCache, get_auth_strategies
+from .cache import ResponseCache, get_freshness
+from .circuit import LocalCircuitBreaker
+from .hedging import HedgingController
+from .idempotency import DuplicateRequestError, IdempotencyStore, make_idempotency_key
+from .models import APIAuthentication, APIConfiguration, APIEndpoint, FunctionDefinition, IdempotencyRecord
+from .oauth import OAuth2TokenError, OAuth2TokenManager
+from .plans import ExecutionPlanCache, get_plan_cache
+from .services import APIConnectorService
+from .streaming import ResponseBody, purge_spool
+from .tasks import execute_function_task
+from .transport import ConnectionPoolRegistry, abort_handler
+
+
+class ExecuteFunctionTaskTests(SimpleTestCase):
+
+    def run_task(self, error, retries, reschedules=0):
+        """
+        Run the task body as the given delivery, returning the arguments it retried with
+        """
+        kwargs = {'function_name': 'f', 'function_args': {}, 'message_id': 1, 'reschedules': reschedules}
+        execute_function_task.push_request(retries=retries, kwargs=kwargs)
+        self.addCleanup(execute_function_task.pop_request)
+
+        with mock.patch.object(APIConnectorService, 'execute_function', side_effect=error), \
+                mock.patch.object(execute_function_task, 'retry', side_effect=Retry()) as retry:
+            with self.assertRaises(Retry):
+                execute_function_task.run(**kwargs)
+
+        return retry.call_args.kwargs
+
+    def test_rate_limit_reschedules_are_counted_apart(self):
+        retry = self.run_task(RateLimitExceeded("limited", retry_after=1.5), retries=10, reschedules=10)
+
+        self.assertEqual(retry['countdown'], 1.5)
+        self.assertEqual(retry['kwargs']['reschedules'], 11)
+        self.assertEqual(retry['max_retries'], 11)
+
+    def test_failures_after_reschedules_keep_their_own_budget(self):
+        # 10 reschedules and 1 failed attempt so far
+        retry = self.run_task(ConnectionError("reset"), retries=11, reschedules=10)
+
+        self.assertEqual(retry['countdown'], 2)
+        self.assertEqual(retry['max_retries'], execute_function_task.max_retries + 10)
+        self.assertNotIn('kwargs', retry)
+
+    def test_rate_limit_gives_up_after_max_reschedules(self):
+        kwargs = {'function_name': 'f', 'function_args': {}, 'message_id': 1, 'reschedules': 3}
+        execute_function_task.push_request(retries=3, kwargs=kwargs)
+        self.addCleanup(execute_function_task.pop_request)
+
+        with self.settings(RATE_LIMIT_MAX_RESCHEDULES=3), \
+                mock.patch.object(APIConnectorService, 'execute_function', side_effect=RateLimitExceeded("limited")):
+            with self.assertRaises(RateLimitExceeded):
+                execute_function_task.run(**kwargs)
+
+
+class SpoolTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings_override = override_settings(API_CONNECTOR_SPOOL_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def spool(self, name, age=0):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as f:
+            f.write(b'{}')
+        if age:
+            os.utime(path, (time.time() - age, time.time() - age))
+        return path
+
+    def test_purge_deletes_old_spooled_bodies_only(self):
+        self.spool('api_response_old.body', age=7200)
+        self.spool('api_response_new.body')
+        self.spool('other.body', age=7200)
+
+        self.assertEqual(purge_spool(3600), 1)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['api_response_new.body', 'other.body'])
+
+    def test_retried_response_spool_is_deleted(self):
+        api_config = APIConfiguration.objects.create(
+            name='api', base_url='https://api.example.com', rate_limit_enabled=False, max_retries=1
+        )
+        endpoint = APIEndpoint.objects.create(api_config=api_config, name='items', path='/items')
+
+        paths = [self.spool('api_response_1.body'), self.spool('api_response_2.body')]
+        results = []
+        for path, status_code in zip(paths, (503, 502)):
+            response = mock.Mock(status_code=status_code, headers={}, elapsed=timedelta(seconds=0.1))
+            body = ResponseBody()
+            body.truncated = True
+            body.spool_path = path
+            results.append((response, body))
+
+        service = APIConnectorService()
+        with mock.patch.object(service, '_send', side_effect=results), \
+                mock.patch.object(service, '_get_retry_backoff', return_value=0), \
+                mock.patch.object(service, '_log_error'):
+            _, response = service.call_api(endpoint)
+
+        # The superseded attempt's body is gone, the final one belongs to the caller
+        self.assertEqual(response['spool_path'], paths[1])
+        self.assertEqual(os.listdir(self.directory), ['api_response_2.body'])
+
+
+class ExecuteFunctionsBatchTests(SimpleTestCase):
+
+    def test_sync_batch_closes_the_clients_of_its_loop(self):
+        service = APIConnectorService()
+        clients = []
+
+        async def aexecute_functions_batch(calls, max_concurrency=10):
+            clients.append(service.pool_registry.get_async_client(None))
+            return []
+
+        with mock.patch.object(service, 'aexecute_functions_batch', aexecute_functions_batch):
+            service.execute_functions_batch([('f', {})])
+            service.execute_functions_batch([('f', {})])
+
+        self.assertEqual(len(clients), 2)
+        self.assertIsNot(clients[0], clients[1])
+        self.assertTrue(all(client.is_closed for client in clients))
+
+
+class SharedCircuitBreaker(LocalCircuitBreaker):
+    """
+    Circuit breaker posing as a shared one, recording the threads it is called on
+    """
+
+    shared = True
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.threads = []
+
+    def allow(self, key):
+        self.threads.append(threading.get_ident())
+        return super().allow(key)
+
+    def record(self, key, success, elapsed=0.0):
+        self.threads.append(threading.get_ident())
+        super().record(key, success, elapsed)
+
+    def is_open(self, key):
+        self.threads.append(threading.get_ident())
+        return super().is_open(key)
+
+
+class AsyncCircuitBreakerTests(TestCase):
+
+    async def test_shared_circuit_breaker_is_called_off_the_event_loop(self):
+        api_config = await APIConfiguration.objects.acreate(
+            name='api', base_url='https://api.example.com', rate_limit_enabled=False, max_retries=1
+        )
+        endpoint = await APIEndpoint.objects.acreate(api_config=api_config, name='items', path='/items')
+        response = mock.Mock(status_code=503, headers={}, elapsed=timedelta(seconds=0.1))
+        body = ResponseBody()
+        body.content = b'{}'
+
+        service = APIConnectorService()
+        service.circuit_breaker = SharedCircuitBreaker()
+        with mock.patch.object(service, '_asend', mock.AsyncMock(return_value=(response, body))), \
+                mock.patch.object(service, '_calculate_backoff_time', return_value=0), \
+                mock.patch.object(service, '_log_error'):
+            await service.acall_api(endpoint)
+
+        # allow, record, is_open (before the retry) and record again
+        self.assertEqual(len(service.circuit_breaker.threads), 4)
+        self.assertNotIn(threading.get_ident(), service.circuit_breaker.threads)
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    """
+    Answers after the number of seconds given in the path
+    """
+
+    def do_GET(self):
+        time.sleep(float(self.path.strip('/') or 0))
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+
+class AbortHandleTests(SimpleTestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), SlowHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+        self.session = ConnectionPoolRegistry().get_session(None)
+        self.addCleanup(self.session.close)
+        self.handles = []
+
+    def send_in_thread(self, path):
+        outcome = {}
+
+        def send():
+            with abort_handler(self.handles.append):
+                try:
+                    outcome['status_code'] = self.session.get(self.url + path, timeout=10).status_code
+                except requests.RequestException as e:
+                    outcome['error'] = e
+
+        thread = threading.Thread(target=send)
+        thread.start()
+        return thread, outcome
+
+    def wait_for_handles(self, count):
+        deadline = time.monotonic() + 5
+        while len(self.handles) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self.handles), count)
+
+    def test_aborting_stops_a_request_waiting_for_headers(self):
+        thread, outcome = self.send_in_thread('/5')
+        self.wait_for_handles(1)
+        time.sleep(0.2)
+
+        started = time.monotonic()
+        self.handles[0].close()
+        thread.join(5)
+
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertIn('error', outcome)
+
+    def test_handle_of_a_finished_request_leaves_the_connection_alone(self):
+        with abort_handler(self.handles.append):
+            self.assertEqual(self.session.get(self.url + '/0', timeout=10).status_code, 200)
+
+        # The next request reuses the pooled connection
+        thread, outcome = self.send_in_thread('/0.3')
+        self.wait_for_handles(2)
+        self.assertIs(self.handles[0].connection, self.handles[1].connection)
+        self.handles[0].close()
+        thread.join(5)
+
+        self.assertEqual(outcome, {'status_code': 200})
+
+
+class OAuth2TokenManagerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.manager = OAuth2TokenManager(refresh_margin=300, retry_interval=30)
+        # Inside the refresh margin, but still valid
+        self.auth = APIAuthentication(
+            pk=1, name='oauth', auth_type='oauth2', access_token='old',
+            expires_at=timezone.now() + timedelta(seconds=60)
+        )
+        self.refreshes = []
+        self.release = threading.Event()
+
+    def refresh(self, auth, min_validity):
+        self.refreshes.append(min_validity)
+        self.release.wait(5)
+        raise OAuth2TokenError("token endpoint down")
+
+    def wait_for_refresh(self):
+        deadline = time.monotonic() + 5
+        while self.manager._refreshing and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(self.manager._refreshing)
+
+    def test_background_refresh_is_single_flight(self):
+        with mock.patch.object(self.manager, '_refresh', self.refresh), \
+                self.assertLogs('api_hub.api_connector.oauth', 'ERROR'):
+            tokens = [self.manager.get_token(self.auth) for _ in range(5)]
+            self.release.set()
+            self.wait_for_refresh()
+
+        self.assertEqual(tokens, ['old'] * 5)
+        self.assertEqual(self.refreshes, [300])
+
+    def test_failed_refresh_is_not_retried_before_the_retry_interval(self):
+        self.release.set()
+        with mock.patch.object(self.manager, '_refresh', self.refresh), \
+                self.assertLogs('api_hub.api_connector.oauth', 'ERROR'):
+            self.manager.get_token(self.auth)
+            self.wait_for_refresh()
+            self.assertEqual(self.manager.get_token(self.auth), 'old')
+            self.assertEqual(len(self.refreshes), 1)
+
+            later = time.monotonic() + 31
+            with mock.patch('api_connector.oauth.time.monotonic', return_value=later):
+                self.manager.get_token(self.auth)
+                self.wait_for_refresh()
+
+        self.assertEqual(len(self.refreshes), 2)
+
+
+class Resource:
+    """
+    Closeable stand-in for a connection or response registered with a CancelScope
+    """
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def close(self):
+        self.closed.set()
+
+
+class HedgingControllerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.hedging = HedgingController(window=20, min_samples=5, default_delay=0.05, max_rate=0.1, max_workers=4)
+        self.addCleanup(lambda: self.hedging._executor and self.hedging._executor.shutdown(wait=False))
+
+    def test_delay_is_the_latency_percentile(self):
+        self.assertEqual(self.hedging.get_delay(1, 90), 0.05)
+
+        for latency in range(10, 0, -1):
+            self.hedging.record(1, latency / 10, False, False)
+
+        self.assertEqual(self.hedging.get_delay(1, 90), 1.0)
+
+        # Recomputed every tenth of a window
+        self.hedging.record(1, 0.05, False, False)
+        self.assertEqual(self.hedging.get_delay(1, 90), 1.0)
+        self.hedging.record(1, 0.05, False, False)
+        self.assertEqual(self.hedging.get_delay(1, 90), 0.9)
+
+    def test_hedges_are_capped_at_the_max_rate(self):
+        for hedged in [True] + [False] * 9:
+            self.hedging.record(1, 0.1, hedged, False)
+        self.assertIsNone(self.hedging.get_delay(1, 95))
+
+        # A hedge drops out of the window after `window` calls
+        for _ in range(11):
+            self.hedging.record(1, 0.1, False, False)
+        self.assertIsNotNone(self.hedging.get_delay(1, 95))
+
+    def test_losing_attempt_is_cancelled_and_its_result_discarded(self):
+        resources = []
+        discarded = []
+
+        def attempt(scope):
+            resource = Resource()
+            resources.append(resource)
+            scope.register(resource)
+            if len(resources) == 1:
+                # Stuck until the winner cancels it, then completes anyway
+                resource.closed.wait(5)
+                return 'late'
+            return 'hedge'
+
+        result = self.hedging.call(1, 95, attempt, discard=discarded.append)
+
+        self.assertEqual(result, 'hedge')
+        self.assertTrue(resources[0].closed.wait(5))
+        self.hedging._executor.shutdown(wait=True)
+        self.assertEqual(discarded, ['late'])
+        self.assertEqual(self.hedging.stats()[1]['hedge_wins'], 1)
+
+    def test_hedge_is_not_sent_when_not_admitted(self):
+        calls = []
+
+        def attempt(scope):
+            calls.append(scope)
+            time.sleep(0.2)
+            return 'first'
+
+        self.assertEqual(self.hedging.call(1, 95, attempt, admit=lambda: False), 'first')
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.hedging.stats()[1]['hedged'], 0)
+
+    async def test_async_loser_is_cancelled(self):
+        cancelled = []
+
+        async def attempt():
+            if not cancelled:
+                cancelled.append(False)
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled[0] = True
+                    raise
+            return 'hedge'
+
+        async def admit():
+            return True
+
+        self.assertEqual(await self.hedging.acall(1, 95, attempt, admit=admit), 'hedge')
+        await asyncio.sleep(0)
+        self.assertEqual(cancelled, [True])
+
+    def test_hedge_takes_a_rate_limit_slot(self):
+        api_config = APIConfiguration(pk=1, name='api', rate_limit='1/minute', rate_limit_enabled=True)
+        service = APIConnectorService()
+
+        with mock.patch('api_connector.services.check_rate_limit', return_value=(False, 30.0)) as check_rate_limit:
+            self.assertFalse(service._admit_hedge(api_config))
+            check_rate_limit.assert_called_once_with('api_config', '1', '1/minute')
+
+            api_config.rate_limit_enabled = False
+            self.assertTrue(service._admit_hedge(api_config))
+            self.assertEqual(check_rate_limit.call_count, 1)
+
+
+class ResponseCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(max_entries=2, stale_ttl=3600)
+
+    def request(self, url='https://api.example.com/items', headers=None, params=None):
+        return {'method': 'GET', 'url': url, 'headers': headers or {}, 'params': params, 'data': None}
+
+    def response(self, status_code=200, headers=None, data=None):
+        return {'status_code': status_code, 'headers': headers or {}, 'data': data}
+
+    def test_freshness_from_headers(self):
+        date = 'Wed, 21 Oct 2026 07:28:00 GMT'
+        cases = [
+            ({'Cache-Control': 'public, max-age=60'}, 60.0),
+            ({'cache-control': 'max-age=60, s-maxage=120'}, 120.0),
+            ({'Cache-Control': 'max-age=60', 'Expires': 'Wed, 21 Oct 2026 08:28:00 GMT', 'Date': date}, 60.0),
+            ({'Expires': 'Wed, 21 Oct 2026 07:38:00 GMT', 'Date': date}, 600.0),
+            ({'Expires': '0'}, 0.0),
+            ({'Cache-Control': 'no-cache, max-age=60'}, 0.0),
+            ({'Cache-Control': 'no-store, max-age=60'}, None),
+            ({'Cache-Control': 'max-age=soon'}, 0.0),
+            ({}, 300.0),
+        ]
+        for headers, freshness in cases:
+            with self.subTest(headers=headers):
+                self.assertEqual(get_freshness(headers, 300), freshness)
+
+    def test_keys_are_per_credential(self):
+        key = self.cache.make_key(self.request(params={'a': 1, 'b': 2}))
+
+        self.assertEqual(key, self.cache.make_key(self.request(params={'b': 2, 'a': 1})))
+        self.assertEqual(key, self.cache.make_key(self.request(params={'a': 1, 'b': 2}, headers={'If-None-Match': '"v1"'})))
+        self.assertNotEqual(key, self.cache.make_key(self.request(params={'a': 1, 'b': 2}, headers={'Authorization': 'Bearer x'})))
+        self.assertNotEqual(key, self.cache.make_key(self.request(params={'a': 1, 'b': 2}), APIAuthentication(pk=1)))
+        self.assertNotEqual(
+            self.cache.make_key(self.request(), APIAuthentication(pk=1)),
+            self.cache.make_key(self.request(), APIAuthentication(pk=2))
+        )
+
+    def test_fresh_responses_are_served_from_the_cache(self):
+        key = self.cache.make_key(self.request())
+        self.assertIsNone(self.cache.lookup(key))
+
+        self.cache.update(1, key, None, self.response(headers={'Cache-Control': 'max-age=60'}, data={'n': 1}), 0)
+        entry = self.cache.lookup(key)
+
+        self.assertTrue(entry.is_fresh())
+        self.assertEqual(self.cache.hit(1, entry)['data'], {'n': 1})
+        self.assertTrue(self.cache.hit(1, entry)['cached'])
+
+    def test_not_modified_reuses_the_cached_body(self):
+        key = self.cache.make_key(self.request())
+        self.cache.update(1, key, None, self.response(headers={'ETag': '"v1"', 'Cache-Control': 'no-cache'}, data={'n': 1}), 300)
+
+        entry = self.cache.lookup(key)
+        self.assertFalse(entry.is_fresh())
+        self.assertEqual(entry.get_conditional_headers(), {'If-None-Match': '"v1"'})
+
+        response = self.cache.update(1, key, entry, self.response(304, {'Cache-Control': 'max-age=60'}), 300)
+
+        self.assertEqual(response['data'], {'n': 1})
+        self.assertTrue(response['cached'])
+        self.assertTrue(self.cache.lookup(key).is_fresh())
+
+    def test_unstorable_responses_are_not_cached(self):
+        for response in (
+            self.response(headers={'Cache-Control': 'no-store'}),
+            self.response(500, {'Cache-Control': 'max-age=60'}),
+            self.response(headers={'Cache-Control': 'max-age=0'}),
+            {**self.response(headers={'Cache-Control': 'max-age=60'}), 'truncated': True},
+        ):
+            with self.subTest(response=response):
+                key = self.cache.make_key(self.request())
+                self.cache.update(1, key, None, response, 300)
+                self.assertIsNone(self.cache.lookup(key))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        keys = [self.cache.make_key(self.request(f'https://api.example.com/{n}')) for n in range(3)]
+        response = self.response(headers={'Cache-Control': 'max-age=60'})
+
+        self.cache.update(1, keys[0], None, response, 0)
+        self.cache.update(1, keys[1], None, response, 0)
+        self.cache.lookup(keys[0])
+        self.cache.update(1, keys[2], None, response, 0)
+
+        self.assertIsNotNone(self.cache.lookup(keys[0]))
+        self.assertIsNone(self.cache.lookup(keys[1]))
+        self.assertIsNotNone(self.cache.lookup(keys[2]))
+
+    def test_counters(self):
+        key = self.cache.make_key(self.request())
+        self.cache.update(1, key, None, self.response(headers={'ETag': '"v1"', 'Cache-Control': 'max-age=60'}), 0)
+        entry = self.cache.lookup(key)
+        self.cache.hit(1, entry)
+        self.cache.hit(1, entry)
+        self.cache.update(1, key, entry, self.response(304), 0)
+
+        self.assertEqual(self.cache.stats()[1], {
+            'hits': 2, 'revalidations': 1, 'misses': 1, 'stores': 1, 'hit_ratio': 0.75,
+        })
+
+
+class IdempotencyStoreTests(TestCase):
+
+    def setUp(self):
+        api_config = APIConfiguration.objects.create(name='api', base_url='https://api.example.com')
+        self.endpoint = APIEndpoint.objects.create(api_config=api_config, name='orders', path='/orders', http_method='POST')
+        self.store = IdempotencyStore(lock_timeout=60)
+        self.key = make_idempotency_key(1, 'create_order', {'sku': 'a', 'qty': 1})
+
+    def test_keys_do_not_depend_on_argument_order(self):
+        self.assertEqual(self.key, make_idempotency_key('1', 'create_order', {'qty': 1, 'sku': 'a'}))
+        self.assertNotEqual(self.key, make_idempotency_key(2, 'create_order', {'sku': 'a', 'qty': 1}))
+
+    def test_in_flight_duplicate_is_rejected(self):
+        self.assertIsNone(self.store.claim(self.key, self.endpoint))
+
+        with self.assertRaises(DuplicateRequestError) as raised:
+            self.store.claim(self.key, self.endpoint)
+
+        self.assertEqual(raised.exception.key, self.key)
+        self.assertAlmostEqual(raised.exception.retry_after, 60, delta=5)
+
+    def test_completed_call_is_replayed(self):
+        self.store.claim(self.key, self.endpoint)
+        self.store.complete(self.key, {'url': 'u'}, {'status_code': 201})
+
+        for store in (self.store, IdempotencyStore()):
+            with self.subTest(cached=store is self.store):
+                request, response = store.claim(self.key, self.endpoint)
+                self.assertEqual(request, {'url': 'u'})
+                self.assertEqual(response, {'status_code': 201, 'idempotent_replay': True})
+
+    def test_released_call_can_be_retried(self):
+        self.store.claim(self.key, self.endpoint)
+        self.store.release(self.key)
+
+        self.assertIsNone(self.store.claim(self.key, self.endpoint))
+        record = IdempotencyRecord.objects.get(key=self.key)
+        self.assertEqual((record.status, record.attempts), ('pending', 2))
+
+    def test_expired_claim_is_taken_over(self):
+        self.store.claim(self.key, self.endpoint)
+        IdempotencyRecord.objects.filter(key=self.key).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertIsNone(self.store.claim(self.key, self.endpoint))
+        with self.assertRaises(DuplicateRequestError):
+            self.store.claim(self.key, self.endpoint)
+
+    def test_call_api_replays_instead_of_calling_again(self):
+        service = APIConnectorService()
+        service.idempotency = self.store
+        response = mock.Mock(status_code=201, headers={}, elapsed=timedelta(seconds=0.1))
+        body = ResponseBody()
+        body.content = b'{"id": 7}'
+
+        with mock.patch.object(service, '_send', return_value=(response, body)) as send:
+            _, first = service.call_api(self.endpoint, data={'sku': 'a'}, idempotency_key=self.key)
+            _, second = service.call_api(self.endpoint, data={'sku': 'a'}, idempotency_key=self.key)
+
+        self.assertEqual(send.call_count, 1)
+        self.assertEqual(second['data'], first['data'])
+        self.assertTrue(second['idempotent_replay'])
+
+
+class ExecutionPlanCacheTests(TestCase):
+
+    def setUp(self):
+        api_config = APIConfiguration.objects.create(name='api', base_url='https://api.example.com')
+        self.endpoint = APIEndpoint.objects.create(api_config=api_config, name='orders', path='/orders')
+        FunctionDefinition.objects.create(
+            name='list_orders', description='List orders', parameters_schema={}, api_endpoint=self.endpoint
+        )
+        self.plans = get_plan_cache()
+        self.plans.clear()
+        self.addCleanup(self.plans.clear)
+
+    def load(self):
+        return APIEndpoint.objects.select_related('api_config', 'api_config__authentication').get(pk=self.endpoint.pk)
+
+    def test_edited_endpoint_is_picked_up_by_the_next_call(self):
+        plan = self.plans.get_function_plan('list_orders')
+        self.assertIs(self.plans.get_function_plan('list_orders'), plan)
+
+        self.endpoint.path = '/v2/orders'
+        self.endpoint.save()
+
+        plan = self.plans.get_function_plan('list_orders')
+        self.assertEqual(plan.endpoint_plan.url, 'https://api.example.com/v2/orders')
+
+    def test_plan_of_an_older_endpoint_version_is_not_used(self):
+        plan = self.plans.get_endpoint_plan(self.load())
+
+        # Saved by another process: no signal reaches this one
+        APIEndpoint.objects.filter(pk=self.endpoint.pk).update(
+            path='/v2/orders', updated_at=self.endpoint.updated_at + timedelta(seconds=1)
+        )
+        endpoint = self.load()
+
+        self.assertIsNone(self.plans.peek_endpoint_plan(endpoint))
+        self.assertIsNot(self.plans.get_endpoint_plan(endpoint), plan)
+        self.assertEqual(self.plans.peek_endpoint_plan(endpoint).url, 'https://api.example.com/v2/orders')
+
+    def test_plans_expire_after_the_ttl(self):
+        plans = ExecutionPlanCache(ttl=60)
+        plan = plans.get_function_plan('list_orders')
+
+        with mock.patch('api_connector.plans.time.monotonic', return_value=plan.endpoint_plan.built_at + 61):
+            self.assertIsNot(plans.get_function_plan('list_orders'), plan)
+
+
+class AuthStrategyTests(TestCase):
+
+    def setUp(self):
+        self.auth = APIAuthentication.objects.create(name='auth', auth_type='bearer', token='first')
+        self.api_config = APIConfiguration.objects.create(
+            name='api', base_url='https://api.example.com', authentication=self.auth, max_retries=0,
+            rate_limit_enabled=False
+        )
+        self.endpoint = APIEndpoint.objects.create(api_config=self.api_config, name='orders', path='/orders')
+        get_plan_cache().clear()
+        get_auth_strategies().clear()
+        self.addCleanup(get_plan_cache().clear)
+        self.addCleanup(get_auth_strategies().clear)
+
+    def test_edited_authentication_is_picked_up_by_the_next_call(self):
+        service = APIConnectorService()
+        request, _ = self.call(service)
+        self.assertEqual(request['headers']['Authorization'], 'Bearer first')
+
+        self.auth.token = 'second'
+        self.auth.save()
+
+        request, _ = self.call(service)
+        self.assertEqual(request['headers']['Authorization'], 'Bearer second')
+
+    def test_strategy_of_an_older_authentication_version_is_not_used(self):
+        strategies = AuthStrategyCache()
+        strategy = strategies.get(self.auth)
+        self.assertIs(strategies.get(self.auth), strategy)
+
+        # Saved by another process: no signal reaches this one
+        APIAuthentication.objects.filter(pk=self.auth.pk).update(
+            token='second', updated_at=self.auth.updated_at + timedelta(seconds=1)
+        )
+        auth = APIAuthentication.objects.get(pk=self.auth.pk)
+
+        self.assertEqual(strategies.get(auth).get_headers(), {'Authorization': 'Bearer second'})
+
+    def test_wire_headers_are_sent_but_not_logged(self):
+        APIAuthentication.objects.filter(pk=self.auth.pk).update(auth_type='basic', username='user', password='secret')
+
+        request, response = self.call(APIConnectorService(), status_code=400)
+
+        sent_headers = self.send.call_args.args[2]
+        self.assertEqual(sent_headers['Authorization'], b'Basic dXNlcjpzZWNyZXQ=')
+        self.assertNotIn('Authorization', request['headers'])
+        self.assertEqual(response['status_code'], 400)
+
+        log = ErrorLog.objects.get(component='api_connector')
+        self.assertNotIn('Authorization', log.context['request']['headers'])
+        self.assertNotIn('secret', str(log.context))
+
+    def call(self, service, status_code=200):
+        """
+        Call the endpoint as freshly loaded, with the request mocked
+        """
+        response = mock.Mock(status_code=status_code, headers={}, elapsed=timedelta(seconds=0.1))
+        body = ResponseBody()
+        body.content = b'{}'
+
+        with mock.patch.object(service, '_send', return_value=(response, body)) as self.send:
+            return service.call_api(APIEndpoint.objects.get(pk=self.endpoint.pk))
+
+
+class ConnectionPoolRegistryTests(SimpleTestCase):
+
+    def setUp(self):
+        self.registry = ConnectionPoolRegistry(max_keepalive=300, idle_timeout=60)
+        self.addCleanup(self.registry.close)
+        self.api_config = APIConfiguration(id=1, base_url='https://api.example.com')
+
+    def test_sessions_are_pooled_per_configuration_and_host(self):
+        session = self.registry.get_session(self.api_config)
+
+        self.assertIs(self.registry.get_session(APIConfiguration(id=1, base_url='https://api.example.com')), session)
+        self.assertIsNot(self.registry.get_session(APIConfiguration(id=2, base_url='https://api.example.com')), session)
+
+        # Editing the base URL never reuses connections to the previous host
+        self.api_config.base_url = 'https://eu.api.example.com'
+        self.assertIsNot(self.registry.get_session(self.api_config), session)
+
+    def test_stats(self):
+        for _ in range(3):
+            self.registry.get_session(self.api_config)
+
+        self.assertEqual(self.registry.stats()['1:https://api.example.com'], {
+            'hits': 2, 'misses': 1, 'evictions': 0, 'hit_ratio': 2 / 3, 'open': True, 'requests': 3,
+        })
+
+    def test_idle_sessions_are_evicted(self):
+        session = self.registry.get_session(self.api_config)
+
+        with mock.patch('api_connector.transport.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertEqual(self.registry.evict_idle(), 1)
+
+        stats = self.registry.stats()['1:https://api.example.com']
+        self.assertEqual((stats['evictions'], stats['open']), (1, False))
+        self.assertIsNot(self.registry.get_session(self.api_config), session)
+
+    def test_forked_process_starts_with_an_empty_pool(self):
+        session = self.registry.get_session(self.api_config)
+
+        with mock.patch('api_connector.transport.os.getpid', return_value=os.getpid() + 1):
+            self.assertIsNot(self.registry.get_session(self.api_config), session)
+            self.assertEqual(self.registry.stats()['1:https://api.example.com']['misses'], 1)
+
+
+class AsyncAPICallTests(TestCase):
+
+    def setUp(self):
+        self.api_config = APIConfiguration.objects.create(
+            name='api', base_url='https://api.example.com', rate_limit_enabled=False, max_retries=1
+        )
+        endpoint = APIEndpoint.objects.create(
+            api_config=self.api_config, name='orders', path='/orders', http_method='POST',
+            response_mapping={'order_id': 'order.id'}
+        )
+        FunctionDefinition.objects.create(
+            name='create_order', description='Create an order', parameters_schema={}, api_endpoint=endpoint,
+            parameter_mapping={'sku': 'item.sku', 'quantity': {'static': 1}}
+        )
+        get_plan_cache().clear()
+        self.addCleanup(get_plan_cache().clear)
+
+        self.requests = []
+        self.statuses = []
+        self.in_flight = self.max_in_flight = 0
+
+    async def handle(self, request):
+        """
+        Answer like the API, recording the requests and how many were in flight at once
+        """
+        self.requests.append(request)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+
+        # Streamed like a response from the network, so that httpx records its elapsed time
+        async def content(body):
+            yield body
+
+        status_code = self.statuses.pop(0) if self.statuses else 201
+        body = json.dumps({'order': {'id': len(self.requests)}}).encode()
+        return httpx.Response(status_code, headers={'Content-Type': 'application/json'}, content=content(body))
+
+    def service(self):
+        service = APIConnectorService()
+        service.circuit_breaker = LocalCircuitBreaker()
+        client = httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+        patcher = mock.patch.object(service.pool_registry, 'get_async_client', return_value=client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return service
+
+    async def test_function_call_is_mapped_both_ways(self):
+        request, response = await self.service().aexecute_function('create_order', {'item': {'sku': 'a'}})
+
+        sent = {'sku': 'a', 'quantity': 1, 'item': {'sku': 'a'}}
+        self.assertEqual(json.loads(self.requests[0].content), sent)
+        self.assertEqual(str(self.requests[0].url), 'https://api.example.com/orders')
+        self.assertEqual(request['data'], sent)
+        self.assertEqual(response['status_code'], 201)
+        self.assertEqual(response['mapped_data'], {'order_id': 1})
+
+    async def test_server_errors_are_retried(self):
+        self.statuses = [503]
+        service = self.service()
+
+        with mock.patch.object(service, '_calculate_backoff_time', return_value=0):
+            _, response = await service.aexecute_function('create_order', {'item': {'sku': 'a'}})
+
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(response['status_code'], 201)
+
+    async def test_batch_keeps_the_order_and_the_concurrency_limits(self):
+        await APIConfiguration.objects.filter(pk=self.api_config.pk).aupdate(max_concurrent_requests=2)
+        calls = [('create_order', {'item': {'sku': str(i)}}) for i in range(6)] + [('unknown', {})]
+
+        results = await self.service().aexecute_functions_batch(calls)
+
+        self.assertEqual([request['data']['sku'] for request, _ in results[:6]], [str(i) for i in range(6)])
+        self.assertTrue(all(response['status_code'] == 201 for _, response in results[:6]))
+        self.assertEqual(results[6], (None, {'error': "Function 'unknown' not found or not active"}))
+        self.assertEqual(self.max_in_flight, 2)
+
+
+class TimeoutTests(TestCase):
+
+    def setUp(self):
+        self.api_config = APIConfiguration.objects.create(
+            name='api', base_url='https://api.example.com', rate_limit_enabled=False, max_retries=3,
+            connect_timeout=5, read_timeout=30, total_timeout=10
+        )
+        self.endpoint = APIEndpoint.objects.create(api_config=self.api_config, name='orders', path='/orders')
+        self.service = APIConnectorService()
+        self.service.circuit_breaker = LocalCircuitBreaker()
+
+    def test_endpoint_timeouts_override_the_configuration(self):
+        self.endpoint.read_timeout = 2
+        self.endpoint.save()
+
+        plan = get_plan_cache().get_endpoint_plan(APIEndpoint.objects.get(pk=self.endpoint.pk))
+
+        self.assertEqual(plan.timeouts, (5, 2, 10))
+
+    def test_attempt_timeouts_are_capped_by_the_deadline(self):
+        with mock.patch('api_connector.services.time.monotonic', return_value=100):
+            self.assertEqual(self.service._get_attempt_timeout(5, 30, None), (5, 30))
+            self.assertEqual(self.service._get_attempt_timeout(5, 30, 108), (5, 8))
+            self.assertEqual(self.service._get_attempt_timeout(5, 30, 103), (3, 3))
+            self.assertEqual(self.service._get_attempt_timeout(5, 30, 99), (0.001, 0.001))
+
+    def test_retries_that_would_miss_the_deadline_are_skipped(self):
+        response = mock.Mock(status_code=503, headers={'Retry-After': '6'}, elapsed=timedelta(seconds=0.1))
+        body = ResponseBody()
+        body.content = b'{}'
+
+        with mock.patch.object(self.service, '_send', return_value=(response, body)) as send, \
+                mock.patch('api_connector.services.time.sleep') as sleep:
+            _, result = self.service.call_api(self.endpoint)
+
+        # 6s of backoff plus the 5s connect timeout do not fit in the 10s budget
+        self.assertEqual(send.call_count, 1)
+        sleep.assert_not_called()
+        self.assertEqual(result['status_code'], 503)
+        connect_timeout, read_timeout = send.call_args.args[4]
+        self.assertEqual(connect_timeout, 5)
+        self.assertLessEqual(read_timeout, 10)
+
+    def test_retries_that_fit_in_the_deadline_are_made(self):
+        response = mock.Mock(status_code=503, headers={'Retry-After': '1'}, elapsed=timedelta(seconds=0.1))
+        body = ResponseBody()
+        body.content = b'{}'
+
+        with mock.patch.object(self.service, '_send', return_value=(response, body)) as send, \
+                mock.patch('api_connector.services.time.sleep') as sleep:
+            self.service.call_api(self.endpoint)
+
+        self.assertEqual(send.call_count, 4)
+        self.assertEqual(sleep.call_count, 3)
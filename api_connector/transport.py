@@ -0,0 +1,544 @@
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from django.conf import settings
+
+logger = logging.getLogger('api_hub.api_connector.transport')
+
+# Per-thread callback receiving an AbortHandle for every request sent
+_abort_handlers = threading.local()
+
+
+class AbortHandle:
+    """
+    Closeable handle aborting a request in flight from another thread
+
+    Closing it shuts the connection's socket down, which makes the sending
+    thread's blocked connect, send or read fail right away. It only acts
+    on the request it was handed out for, never on a later request that
+    reuses the pooled connection.
+    """
+
+    __slots__ = ('connection', 'generation')
+
+    def __init__(self, connection: 'AbortableConnectionMixin', generation: int):
+        self.connection = connection
+        self.generation = generation
+
+    def close(self) -> None:
+        self.connection.abort(self.generation)
+
+
+class AbortableConnectionMixin:
+    """
+    urllib3 connection handing out an AbortHandle for each request
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._abort_lock = threading.Lock()
+        self._generation = 0
+        self._aborted = False
+
+    def request(self, *args, **kwargs):
+        with self._abort_lock:
+            self._generation += 1
+            self._aborted = False
+            generation = self._generation
+
+        handler = getattr(_abort_handlers, 'handler', None)
+        if handler is not None:
+            handler(AbortHandle(self, generation))
+
+        return super().request(*args, **kwargs)
+
+    def connect(self):
+        super().connect()
+        with self._abort_lock:
+            aborted = self._aborted
+        if aborted:
+            # Aborted while the socket did not exist yet
+            self.close()
+            raise ConnectionAbortedError("Request aborted")
+
+    def abort(self, generation: int) -> None:
+        """
+        Abort the request with the given generation, if it is still the current one
+        """
+        with self._abort_lock:
+            if generation != self._generation:
+                return
+            self._aborted = True
+            sock = self.sock
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+class AbortableHTTPConnection(AbortableConnectionMixin, HTTPConnection):
+    pass
+
+
+class AbortableHTTPSConnection(AbortableConnectionMixin, HTTPSConnection):
+    pass
+
+
+class AbortableHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = AbortableHTTPConnection
+
+
+class AbortableHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = AbortableHTTPSConnection
+
+
+class AbortableHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connections can be aborted through abort_handler()
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': AbortableHTTPConnectionPool,
+            'https': AbortableHTTPSConnectionPool,
+        }
+
+
+@contextmanager
+def abort_handler(handler: Optional[Callable[[AbortHandle], None]]):
+    """
+    Pass an AbortHandle for every request this thread sends to `handler`
+
+    Only requests made through pooled requests sessions hand out handles;
+    HTTP/2 sessions multiplex requests on one connection and cannot
+    abort a single one.
+
+    Args:
+        handler: Callback receiving the handles (None = no callback)
+    """
+    previous = getattr(_abort_handlers, 'handler', None)
+    _abort_handlers.handler = handler
+    try:
+        yield
+    finally:
+        _abort_handlers.handler = previous
+
+
+class PooledSession:
+    """
+    A pooled HTTP session bound to a single API configuration
+    """
+
+    def __init__(self, session: Any, http2: bool = False):
+        """
+        Initialize the pooled session
+
+        Args:
+            session: Underlying session (requests.Session or HTTP/2 wrapper)
+            http2: Whether the session speaks HTTP/2
+        """
+        self.session = session
+        self.http2 = http2
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+        self.request_count = 0
+
+    def is_expired(self, now: float, max_keepalive: float, idle_timeout: float) -> bool:
+        """
+        Check whether the session should be recycled
+
+        Args:
+            now: Current monotonic time
+            max_keepalive: Maximum lifetime of a session in seconds (0 = unlimited)
+            idle_timeout: Maximum idle time of a session in seconds (0 = unlimited)
+
+        Returns:
+            True if the session should be closed
+        """
+        if max_keepalive and now - self.created_at > max_keepalive:
+            return True
+        if idle_timeout and now - self.last_used_at > idle_timeout:
+            return True
+        return False
+
+    def close(self) -> None:
+        """
+        Close the underlying session and its connections
+        """
+        try:
+            self.session.close()
+        except Exception as e:
+            logger.warning(f"Error closing pooled session: {str(e)}")
+
+
+class HTTP2Session:
+    """
+    Minimal requests-compatible wrapper around an httpx HTTP/2 client
+    """
+
+    def __init__(self, pool_maxsize: int, max_keepalive: float):
+        """
+        Initialize the HTTP/2 session
+
+        Args:
+            pool_maxsize: Maximum number of connections to keep in the pool
+            max_keepalive: Keep-alive expiry for idle connections in seconds
+        """
+        import httpx
+
+        self._httpx = httpx
+        self.client = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=pool_maxsize,
+                max_keepalive_connections=pool_maxsize,
+                keepalive_expiry=max_keepalive or None
+            )
+        )
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, Any] = None,
+        params: Dict[str, Any] = None,
+        data: Any = None,
+        json: Any = None,
+        auth: Optional[requests.auth.AuthBase] = None,
+        timeout: Any = 30,
+        stream: bool = False
+    ):
+        """
+        Make an HTTP request, translating requests-style arguments to httpx
+        """
+        if isinstance(auth, requests.auth.HTTPBasicAuth):
+            auth = self._httpx.BasicAuth(auth.username, auth.password)
+        if isinstance(timeout, tuple):
+            timeout = self._httpx.Timeout(timeout[1], connect=timeout[0])
+
+        # Pre-encoded (e.g. compressed) bodies are sent as raw content
+        content = None
+        if isinstance(data, bytes):
+            content, data = data, None
+
+        # httpx responses expose the same status_code/headers/text/json()/elapsed
+        # attributes that call_api relies on
+        request = self.client.build_request(
+            method,
+            url,
+            headers=headers,
+            params=params,
+            content=content,
+            data=data,
+            json=json,
+            timeout=timeout
+        )
+        return self.client.send(request, auth=auth, stream=stream)
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url: str, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def patch(self, url: str, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+
+    def delete(self, url: str, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def close(self) -> None:
+        self.client.close()
+
+
+class ConnectionPoolRegistry:
+    """
+    Process-wide registry of pooled HTTP sessions, one per API configuration
+
+    Sessions are reused across service instances, Celery tasks and webhook
+    requests handled by the same worker process, so hot integrations keep
+    their TCP/TLS connections warm.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        max_keepalive: float = 300,
+        idle_timeout: float = 60,
+        http2: bool = False
+    ):
+        """
+        Initialize the registry
+
+        Args:
+            pool_connections: Number of per-host urllib3 pools to cache per session
+            pool_maxsize: Maximum number of connections kept per host
+            max_keepalive: Maximum lifetime of a session in seconds (0 = unlimited)
+            idle_timeout: Close sessions unused for this many seconds (0 = never)
+            http2: Use HTTP/2 (requires httpx[http2]) when available
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_keepalive = max_keepalive
+        self.idle_timeout = idle_timeout
+        self.http2 = http2 and self._http2_available()
+
+        self._lock = threading.Lock()
+        self._sessions: Dict[Any, PooledSession] = {}
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._stats: Dict[Any, Dict[str, int]] = {}
+        self._pid = os.getpid()
+
+    def get_session(self, api_config) -> Any:
+        """
+        Get the pooled session for an API configuration
+
+        Args:
+            api_config: APIConfiguration object (or None for a shared default pool)
+
+        Returns:
+            Session object exposing the requests.Session API
+        """
+        key = self._get_key(api_config)
+        now = time.monotonic()
+
+        with self._lock:
+            self._check_fork()
+
+            pooled = self._sessions.get(key)
+            stats = self._stats.setdefault(key, {'hits': 0, 'misses': 0, 'evictions': 0})
+
+            if pooled and pooled.is_expired(now, self.max_keepalive, self.idle_timeout):
+                pooled.close()
+                del self._sessions[key]
+                stats['evictions'] += 1
+                pooled = None
+
+            if pooled:
+                stats['hits'] += 1
+            else:
+                stats['misses'] += 1
+                pooled = PooledSession(self._create_session(), http2=self.http2)
+                self._sessions[key] = pooled
+
+            pooled.last_used_at = now
+            pooled.request_count += 1
+
+            return pooled.session
+
+    def get_async_client(self, api_config) -> Any:
+        """
+        Get the pooled async client for an API configuration
+
+        Async clients are bound to the event loop they were created on, so
+        they are pooled per running loop.
+
+        Args:
+            api_config: APIConfiguration object (or None for a shared default pool)
+
+        Returns:
+            httpx.AsyncClient
+        """
+        key = self._get_key(api_config)
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            self._check_fork()
+
+            clients = self._async_clients.setdefault(loop, {})
+            stats = self._stats.setdefault(key, {'hits': 0, 'misses': 0, 'evictions': 0})
+
+            client = clients.get(key)
+            if client is not None and not client.is_closed:
+                stats['hits'] += 1
+            else:
+                stats['misses'] += 1
+                client = self._create_async_client()
+                clients[key] = client
+
+            return client
+
+    def evict_idle(self) -> int:
+        """
+        Close all sessions that exceeded their idle timeout or keep-alive lifetime
+
+        Returns:
+            Number of evicted sessions
+        """
+        now = time.monotonic()
+        evicted = 0
+
+        with self._lock:
+            for key, pooled in list(self._sessions.items()):
+                if pooled.is_expired(now, self.max_keepalive, self.idle_timeout):
+                    pooled.close()
+                    del self._sessions[key]
+                    self._stats[key]['evictions'] += 1
+                    evicted += 1
+
+        return evicted
+
+    def close(self, api_config=None) -> None:
+        """
+        Close pooled sessions
+
+        Args:
+            api_config: Only close the session for this configuration (defaults to all)
+        """
+        with self._lock:
+            if api_config is not None:
+                keys = [key for key in self._sessions if key[0] == getattr(api_config, 'id', None)]
+            else:
+                keys = list(self._sessions.keys())
+
+            for key in keys:
+                self._sessions.pop(key).close()
+
+    async def aclose_async_clients(self) -> None:
+        """
+        Close the async clients of the running event loop
+
+        To be awaited before a short-lived loop (e.g. one made by
+        async_to_sync) is closed, since its clients are never reused.
+        """
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            clients = self._async_clients.pop(loop, {})
+
+        for client in clients.values():
+            await client.aclose()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get pool hit/miss counters per API configuration
+
+        Returns:
+            Dict keyed by "<api_config_id>:<base_url>" with counters
+        """
+        with self._lock:
+            result = {}
+            for key, counters in self._stats.items():
+                pooled = self._sessions.get(key)
+                total = counters['hits'] + counters['misses']
+                result[f"{key[0]}:{key[1]}"] = {
+                    **counters,
+                    'hit_ratio': counters['hits'] / total if total else 0.0,
+                    'open': pooled is not None,
+                    'requests': pooled.request_count if pooled else 0,
+                }
+            return result
+
+    def _get_key(self, api_config) -> tuple:
+        """
+        Build the registry key for an API configuration
+
+        The base URL is part of the key so that editing a configuration
+        never reuses connections to the previous host.
+        """
+        if api_config is None:
+            return (None, '')
+        return (api_config.id, api_config.base_url)
+
+    def _create_session(self) -> Any:
+        """
+        Create a new pooled session
+        """
+        if self.http2:
+            return HTTP2Session(self.pool_maxsize, self.max_keepalive)
+
+        session = requests.Session()
+        adapter = AbortableHTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _create_async_client(self) -> Any:
+        """
+        Create a new pooled async client
+        """
+        import httpx
+
+        return httpx.AsyncClient(
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=self.pool_maxsize,
+                max_keepalive_connections=self.pool_maxsize,
+                keepalive_expiry=self.idle_timeout or None
+            )
+        )
+
+    def _check_fork(self) -> None:
+        """
+        Drop inherited sessions after a fork (e.g. Celery prefork workers)
+
+        Sockets must never be shared between processes, so a child process
+        starts with an empty pool. Must be called with the lock held.
+        """
+        pid = os.getpid()
+        if pid != self._pid:
+            self._sessions = {}
+            self._async_clients = weakref.WeakKeyDictionary()
+            self._stats = {}
+            self._pid = pid
+
+    @staticmethod
+    def _http2_available() -> bool:
+        """
+        Check whether httpx with HTTP/2 support is installed
+        """
+        try:
+            import httpx  # noqa: F401
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            logger.warning("HTTP/2 requested but httpx[http2] is not installed, falling back to HTTP/1.1")
+            return False
+
+
+_registry: Optional[ConnectionPoolRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_pool_registry() -> ConnectionPoolRegistry:
+    """
+    Get the process-wide connection pool registry
+
+    Returns:
+        ConnectionPoolRegistry configured from settings
+    """
+    global _registry
+
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ConnectionPoolRegistry(
+                    pool_connections=getattr(settings, 'API_CONNECTOR_POOL_CONNECTIONS', 10),
+                    pool_maxsize=getattr(settings, 'API_CONNECTOR_POOL_MAXSIZE', 10),
+                    max_keepalive=getattr(settings, 'API_CONNECTOR_POOL_MAX_KEEPALIVE', 300),
+                    idle_timeout=getattr(settings, 'API_CONNECTOR_POOL_IDLE_TIMEOUT', 60),
+                    http2=getattr(settings, 'API_CONNECTOR_HTTP2', False)
+                )
+
+    return _registry
@@ -157,9 +157,90 @@ CELERY_TIMEZONE = TIME_ZONE
 OPENAI_API_KEY = ''  # Set this in .env file or environment variables
 OPENAI_MODEL = 'gpt-4o'  # Default model to use
 
+# Message receiver batch endpoints
+MESSAGE_RECEIVER_BATCH_MAX_SIZE = 10000  # Maximum messages per batch request
+MESSAGE_RECEIVER_BATCH_MAX_BYTES = 50 * 1024 * 1024  # Maximum body size of webhook batch requests
+MESSAGE_RECEIVER_BULK_CREATE_SIZE = 1000  # Messages inserted per INSERT statement
+
+# Ack-fast webhooks: deliveries are buffered and stored in the background (None = store them in the request)
+MESSAGE_RECEIVER_INGEST_BACKEND = None  # 'message_receiver.ingest.FileIngestBuffer' or 'message_receiver.ingest.RedisIngestBuffer'
+MESSAGE_RECEIVER_INGEST_DIR = BASE_DIR / 'spool/webhooks'  # Segment files of FileIngestBuffer
+MESSAGE_RECEIVER_INGEST_FSYNC = False  # fsync every buffered delivery (survives host crashes, slower)
+MESSAGE_RECEIVER_INGEST_REDIS_URL = CELERY_BROKER_URL  # Stream of RedisIngestBuffer
+MESSAGE_RECEIVER_INGEST_DRAIN_INTERVAL = 0.5  # Seconds between drains of the buffer
+MESSAGE_RECEIVER_INGEST_BATCH_SIZE = 1000  # Deliveries stored per transaction
+
+# Webhook routing table (active webhook paths, cached in each worker)
+MESSAGE_RECEIVER_ROUTES_TTL = 300  # Seconds before the table is reloaded even without invalidation
+MESSAGE_RECEIVER_ROUTES_REDIS_URL = CELERY_BROKER_URL  # Version stamp that propagates changes to all workers (None = per process)
+MESSAGE_RECEIVER_ROUTES_CHECK_INTERVAL = 1  # Seconds between version stamp checks
+MESSAGE_RECEIVER_ROUTES_REDIS_TIMEOUT = 0.25  # Seconds a version stamp check may wait for Redis before the current table is kept
+
+# Deduplication of redelivered messages on (source, external ID); a unique constraint on Message is authoritative
+MESSAGE_RECEIVER_DEDUP_BACKEND = 'message_receiver.dedup.LocalDedupFilter'  # Front filter; 'message_receiver.dedup.RedisDedupFilter' shares it across workers (None = database only)
+MESSAGE_RECEIVER_DEDUP_WINDOW = 3600  # Seconds the front filter remembers an external ID
+MESSAGE_RECEIVER_DEDUP_SIZE = 100000  # External IDs kept by LocalDedupFilter
+MESSAGE_RECEIVER_DEDUP_REDIS_URL = CELERY_BROKER_URL  # Keys of RedisDedupFilter
+
+# JSON encoding/decoding (webhooks, prompts, API connector bodies and cache)
+JSON_CODEC = 'auto'  # 'orjson', 'msgspec' or 'json'; 'auto' uses msgspec, else orjson, else json
+
 # Rate Limiting
 RATE_LIMIT_ENABLED = True
 DEFAULT_RATE_LIMIT = '100/hour'  # Default rate limit for API calls
+RATE_LIMIT_BACKEND = 'core.ratelimit.LocalRateLimiter'  # Use 'core.ratelimit.RedisRateLimiter' to share limits across workers
+RATE_LIMIT_REDIS_URL = CELERY_BROKER_URL
+RATE_LIMIT_AUDIT_FLUSH_INTERVAL = 10  # Seconds between RateLimitLog audit flushes
+RATE_LIMIT_MAX_WAIT = 5  # Seconds a call may block for a slot on APIs in 'wait' rate limit mode
+RATE_LIMIT_MAX_RESCHEDULES = 50  # Times a rate-limited Celery task may be re-enqueued for its next slot
+
+# API Connector connection pooling
+API_CONNECTOR_POOL_CONNECTIONS = 10  # Number of per-host pools cached per API configuration
+API_CONNECTOR_POOL_MAXSIZE = 10  # Maximum keep-alive connections per host
+API_CONNECTOR_POOL_MAX_KEEPALIVE = 300  # Recycle pooled sessions after this many seconds (0 = never)
+API_CONNECTOR_POOL_IDLE_TIMEOUT = 60  # Close pooled sessions idle for this many seconds (0 = never)
+API_CONNECTOR_HTTP2 = False  # Use HTTP/2 for outbound calls (requires httpx[http2])
+API_CONNECTOR_PLAN_TTL = 60  # Seconds a cached function/endpoint execution plan is reused (0 = until invalidated)
+API_CONNECTOR_MAX_RESPONSE_SIZE = 10 * 1024 * 1024  # Response bodies larger than this many bytes are not kept in memory (0 = no limit)
+API_CONNECTOR_SPOOL_OVERSIZE = True  # Spool oversize response bodies to disk instead of dropping them
+API_CONNECTOR_SPOOL_DIR = None  # Directory for spooled response bodies (None = system temp dir)
+API_CONNECTOR_SPOOL_RETENTION = 24  # Hours spooled response bodies are kept by the purge_spooled_responses task
+API_CONNECTOR_IDEMPOTENCY_HEADER = 'Idempotency-Key'  # Header carrying the idempotency key of non-GET calls (None = do not send)
+API_CONNECTOR_IDEMPOTENCY_LOCK_TIMEOUT = 300  # Seconds an in-flight call holds its idempotency key before a retry may take over
+API_CONNECTOR_IDEMPOTENCY_CACHE_SIZE = 1000  # Completed call outcomes kept in each worker's memory for replay
+API_CONNECTOR_IDEMPOTENCY_RETENTION = 24  # Hours idempotency records are kept by the purge_idempotency_records task
+
+# API Connector HTTP cache (for endpoints with cache_enabled)
+API_CONNECTOR_HTTP_CACHE_ENABLED = True
+API_CONNECTOR_HTTP_CACHE_SIZE = 1000  # Entries kept in each worker's in-process LRU
+API_CONNECTOR_HTTP_CACHE_REDIS_URL = None  # Set (e.g. to CELERY_BROKER_URL) to share cached responses across workers
+API_CONNECTOR_HTTP_CACHE_STALE_TTL = 3600  # Seconds stale responses with an ETag/Last-Modified are kept for revalidation
+
+# OAuth 2.0 token refresh (for oauth2 API authentications)
+OAUTH2_REFRESH_MARGIN = 300  # Refresh tokens in the background this many seconds before they expire
+OAUTH2_REDIS_URL = CELERY_BROKER_URL  # Redis used to single-flight refreshes across workers (None = per process)
+OAUTH2_LOCK_TIMEOUT = 30  # Seconds a worker may hold the refresh lock
+OAUTH2_TOKEN_TIMEOUT = 10  # Timeout for token endpoint requests in seconds
+OAUTH2_REFRESH_RETRY_INTERVAL = 30  # Seconds before a failed background refresh is tried again
+
+# API Connector hedged requests (for endpoints with hedge_enabled)
+API_CONNECTOR_HEDGING_ENABLED = True
+API_CONNECTOR_HEDGE_DEFAULT_DELAY = 1.0  # Seconds before hedging until an endpoint has enough recorded latencies
+API_CONNECTOR_HEDGE_MIN_SAMPLES = 20  # Calls recorded before the endpoint's latency percentile is used
+API_CONNECTOR_HEDGE_WINDOW = 200  # Recent calls per endpoint the percentile and hedge rate are computed over
+API_CONNECTOR_HEDGE_MAX_RATE = 0.1  # Maximum share of an endpoint's recent calls that may be hedged
+API_CONNECTOR_HEDGE_MAX_WORKERS = 32  # Threads running hedged requests in each sync worker
+
+# Circuit Breaker (per API configuration)
+CIRCUIT_BREAKER_ENABLED = True
+CIRCUIT_BREAKER_BACKEND = 'api_connector.circuit.LocalCircuitBreaker'  # Use 'api_connector.circuit.RedisCircuitBreaker' to share state across workers
+CIRCUIT_BREAKER_REDIS_URL = CELERY_BROKER_URL
+CIRCUIT_BREAKER_FAILURE_RATE = 0.5  # Share of failed calls in the window that opens the circuit
+CIRCUIT_BREAKER_SLOW_CALL_THRESHOLD = 10  # Calls slower than this many seconds count as failures
+CIRCUIT_BREAKER_MIN_CALLS = 10  # Minimum calls in the window before the circuit can open
+CIRCUIT_BREAKER_WINDOW = 60  # Statistics window in seconds
+CIRCUIT_BREAKER_OPEN_DURATION = 30  # Seconds the circuit stays open before trial calls
+CIRCUIT_BREAKER_HALF_OPEN_CALLS = 3  # Successful trial calls needed to close the circuit
 
 # Logging Configuration
 LOGGING = {
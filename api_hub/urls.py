@@ -3,7 +3,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
-from message_receiver.views import webhook_receiver
+from message_receiver.views import webhook_batch_receiver, webhook_receiver
 
 urlpatterns = [
     # Django admin
@@ -17,6 +17,7 @@ urlpatterns = [
     
     # Webhook endpoints
     path('webhook/<str:path>/', webhook_receiver, name='webhook_receiver'),
+    path('webhook/<str:path>/batch/', webhook_batch_receiver, name='webhook_batch_receiver'),
     
     # Django Browser Reload
     path('__reload__/', include('django_browser_reload.urls')),
@@ -0,0 +1,132 @@
+"""
+Benchmark the JSON codecs
+
+Measures parsing, compact and indented encoding, and the sorted encoding
+used for cache and idempotency keys with every installed codec, on a
+Sentry error event and a WhatsApp message webhook.
+
+Usage:
+    python benchmarks/codec.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.codec import CODECS, JSONCodec  # noqa: E402
+
+
+def sentry_event(frames: int = 30, breadcrumbs: int = 40) -> dict:
+    """
+    Build a Sentry error event with a stack trace and breadcrumbs
+    """
+    return {
+        'event_id': 'a' * 32,
+        'project': '4505',
+        'level': 'error',
+        'platform': 'python',
+        'timestamp': 1700000000.123,
+        'message': 'ZeroDivisionError: division by zero',
+        'culprit': 'app.module_1 in handler_1',
+        'tags': [['environment', 'production'], ['release', '1.4.2'], ['server_name', 'web-3']],
+        'exception': {'values': [{
+            'type': 'ZeroDivisionError',
+            'value': 'division by zero',
+            'mechanism': {'type': 'generic', 'handled': False},
+            'stacktrace': {'frames': [
+                {
+                    'filename': f'app/module_{i}.py',
+                    'abs_path': f'/srv/app/module_{i}.py',
+                    'function': f'handler_{i}',
+                    'module': f'app.module_{i}',
+                    'lineno': 100 + i,
+                    'colno': 8,
+                    'in_app': True,
+                    'context_line': '    result = process(payload)',
+                    'pre_context': ['def handler():', '    try:'],
+                    'post_context': ['    except Exception:', '        raise'],
+                    'vars': {'payload': "{'id': 1}", 'retries': '3'},
+                }
+                for i in range(frames)
+            ]},
+        }]},
+        'breadcrumbs': {'values': [
+            {
+                'timestamp': 1700000000 + i,
+                'category': 'query',
+                'message': f'SELECT * FROM orders WHERE id = {i}',
+                'level': 'info',
+            }
+            for i in range(breadcrumbs)
+        ]},
+        'request': {
+            'url': 'https://example.com/api/orders',
+            'method': 'POST',
+            'headers': [['User-Agent', 'Mozilla/5.0'], ['Accept', 'application/json']],
+        },
+        'contexts': {'os': {'name': 'Linux', 'version': '6.1'}, 'runtime': {'name': 'CPython', 'version': '3.11.7'}},
+    }
+
+
+def whatsapp_message() -> dict:
+    """
+    Build a WhatsApp webhook carrying one text message
+    """
+    return {'object': 'whatsapp_business_account', 'entry': [{'id': '1029384756', 'changes': [{
+        'field': 'messages',
+        'value': {
+            'messaging_product': 'whatsapp',
+            'metadata': {'display_phone_number': '15550001111', 'phone_number_id': '1234567890'},
+            'contacts': [{'profile': {'name': 'Zoë Müller'}, 'wa_id': '4915112345678'}],
+            'messages': [{
+                'from': '4915112345678',
+                'id': 'wamid.HBgLNDkxNTExMjM0NTY3OBUCABIYFjNFQjBDMEI0RjM2RkY0QjY4QjE1AA==',
+                'timestamp': '1700000000',
+                'type': 'text',
+                'text': {'body': 'Hallo, wann kommt meine Bestellung #4711 an? 🙂'},
+            }],
+        },
+    }]}]}
+
+
+CASES = [
+    ('Sentry error event', sentry_event()),
+    ('WhatsApp text message', whatsapp_message()),
+]
+
+
+def measure(function, repeat: int) -> float:
+    """
+    Best time per call in microseconds
+    """
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(number=number, repeat=repeat)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help="Measurements per case (the best is reported)")
+    args = parser.parse_args()
+
+    codecs = [codec_class() for codec_class, available in CODECS.values() if available()]
+
+    for name, document in CASES:
+        data = JSONCodec().dumpb(document)
+        print(f"{name} ({len(data)} bytes)")
+        print(f"  {'codec':10s} {'loads':>9s} {'dumpb':>9s} {'indent':>9s} {'sorted':>9s}  (microseconds per call)")
+        for codec in codecs:
+            if codec.loads(data) != document:
+                sys.exit(f"{name}: {codec.name} does not round-trip the document")
+            print(
+                f"  {codec.name:10s} {measure(lambda: codec.loads(data), args.repeat):9.1f} "
+                f"{measure(lambda: codec.dumpb(document), args.repeat):9.1f} "
+                f"{measure(lambda: codec.dumps(document, indent=True), args.repeat):9.1f} "
+                f"{measure(lambda: codec.dumpb(document, sort_keys=True, default=str), args.repeat):9.1f}"
+            )
+
+
+if __name__ == '__main__':
+    main()
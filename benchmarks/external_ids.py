@@ -0,0 +1,84 @@
+"""
+Benchmark external ID extraction
+
+Compares the built-in Sentry and WhatsApp extractors with the generic path
+accessors compiled from the same default paths, on payloads of typical
+and batch size.
+
+Usage:
+    python benchmarks/external_ids.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from message_receiver.extractors import DEFAULT_EXTERNAL_ID_PATHS, compile_external_id_extractor  # noqa: E402
+
+
+def whatsapp_payload(entries: int, changes: int, messages: int, statuses_first: bool = False) -> dict:
+    """
+    Build a WhatsApp webhook payload
+
+    With `statuses_first`, every entry but the last only carries status
+    updates, so the extractor has to skip them before finding a message.
+    """
+    entry_list = []
+    for i in range(entries):
+        change_list = []
+        for j in range(changes):
+            value = {'messaging_product': 'whatsapp', 'metadata': {'phone_number_id': '1'}}
+            if statuses_first and i < entries - 1:
+                value['statuses'] = [{'id': f'wamid.status.{i}.{j}', 'status': 'read'}]
+            else:
+                value['contacts'] = [{'wa_id': '1', 'profile': {'name': 'name'}}]
+                value['messages'] = [
+                    {'id': f'wamid.{i}.{j}.{k}', 'type': 'text', 'text': {'body': 'hi'}}
+                    for k in range(messages)
+                ]
+            change_list.append({'field': 'messages', 'value': value})
+        entry_list.append({'id': str(i), 'changes': change_list})
+    return {'object': 'whatsapp_business_account', 'entry': entry_list}
+
+
+CASES = [
+    ('sentry', 'Sentry, top-level event_id', {'event_id': 'abc', 'level': 'error'}),
+    ('sentry', 'Sentry, nested event.id', {'action': 'created', 'event': {'id': 'abc'}}),
+    ('whatsapp', 'WhatsApp, 1 entry / 1 message', whatsapp_payload(1, 1, 1)),
+    ('whatsapp', 'WhatsApp, 50x20 entries x 100 messages', whatsapp_payload(50, 20, 100)),
+    ('whatsapp', 'WhatsApp, 500 status-only entries first', whatsapp_payload(500, 4, 10, statuses_first=True)),
+]
+
+
+def measure(function, payload, repeat: int) -> float:
+    """
+    Best time per call in microseconds
+    """
+    timer = timeit.Timer(lambda: function(payload))
+    number, _ = timer.autorange()
+    return min(timer.repeat(number=number, repeat=repeat)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help="Measurements per case (the best is reported)")
+    args = parser.parse_args()
+
+    print(f"{'payload':45s} {'built-in':>10s} {'generic':>10s}  (microseconds per extraction)")
+    for source_type, name, payload in CASES:
+        builtin = compile_external_id_extractor(source_type)
+        # A source type without defaults, configured with the same paths
+        generic = compile_external_id_extractor('webhook', list(DEFAULT_EXTERNAL_ID_PATHS[source_type]))
+        if builtin(payload) != generic(payload):
+            sys.exit(f"{name}: built-in {builtin(payload)!r} != generic {generic(payload)!r}")
+
+        print(
+            f"{name:45s} {measure(builtin, payload, args.repeat):10.2f} "
+            f"{measure(generic, payload, args.repeat):10.2f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark response mapping
+
+Compares compiled response mappings with the per-call path walking that
+APIEndpoint.response_mapping used before (kept below as the baseline),
+on a 5k-item response.
+
+Usage:
+    python benchmarks/response_mapping.py [--repeat N] [--items N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.mapping import compile_response_mapping  # noqa: E402
+
+
+def baseline_apply_mapping(mapping: dict, data: dict) -> dict:
+    """
+    The former APIConnectorService._apply_mapping, splitting every path on every call
+    """
+    result = {}
+
+    for target_key, source_path in mapping.items():
+        if '.' not in source_path:
+            if source_path in data:
+                result[target_key] = data[source_path]
+        else:
+            parts = source_path.split('.')
+            value = data
+            for part in parts:
+                try:
+                    if part.isdigit():
+                        part = int(part)
+
+                    if isinstance(value, dict) and part in value:
+                        value = value[part]
+                    elif isinstance(value, list) and isinstance(part, int) and part < len(value):
+                        value = value[part]
+                    else:
+                        value = None
+                        break
+                except (KeyError, TypeError, IndexError):
+                    value = None
+                    break
+
+            if value is not None:
+                result[target_key] = value
+
+    return result
+
+
+def response(items: int) -> dict:
+    """
+    Build a paginated list response
+    """
+    return {
+        'data': {'items': [
+            {'id': i, 'attrs': {'name': f'item {i}', 'score': str(i * 1.5)}}
+            for i in range(items)
+        ]},
+        'meta': {'page': {'total': items}},
+    }
+
+
+def measure(function, repeat: int) -> float:
+    """
+    Best time per call in microseconds
+    """
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(number=number, repeat=repeat)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help="Measurements per case (the best is reported)")
+    parser.add_argument('--items', type=int, default=5000, help="Items in the response")
+    args = parser.parse_args()
+
+    data = response(args.items)
+    dotted = {
+        'total': 'meta.page.total',
+        'first': 'data.items.0.id',
+        'name': 'data.items.0.attrs.name',
+        'last': f'data.items.{args.items - 1}.attrs.score',
+    }
+    # Without wildcards every item needs its own path, and coercion happens afterwards
+    names = {f'name{i}': f'data.items.{i}.attrs.name' for i in range(args.items)}
+    scores = {f'score{i}': f'data.items.{i}.attrs.score' for i in range(args.items)}
+
+    cases = [
+        # (name, baseline, compiled mapping, the part of its result to compare)
+        (
+            '4 dotted paths',
+            lambda: baseline_apply_mapping(dotted, data),
+            dotted,
+            lambda result: result,
+        ),
+        (
+            f'{args.items} names: per-item paths vs. wildcard',
+            lambda: list(baseline_apply_mapping(names, data).values()),
+            {'names': 'data.items.*.attrs.name'},
+            lambda result: result['names'],
+        ),
+        (
+            f'{args.items} scores as floats: per-item paths vs. wildcard',
+            lambda: [float(value) for value in baseline_apply_mapping(scores, data).values()],
+            {'scores': {'path': 'data.items.*.attrs.score', 'type': 'float'}},
+            lambda result: result['scores'],
+        ),
+    ]
+
+    print(f"{'mapping':50s} {'baseline':>10s} {'compiled':>10s}  (microseconds per call)")
+    for name, baseline, mapping, select in cases:
+        mapper = compile_response_mapping(mapping)
+        if baseline() != select(mapper(data)):
+            sys.exit(f"{name}: compiled mapping does not match the baseline")
+
+        print(f"{name:50s} {measure(baseline, args.repeat):10.1f} {measure(lambda: mapper(data), args.repeat):10.1f}")
+
+
+if __name__ == '__main__':
+    main()
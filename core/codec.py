@@ -0,0 +1,255 @@
+import json
+import logging
+import threading
+from typing import Any, Callable, Optional, Union
+
+from django.conf import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+logger = logging.getLogger('api_hub.core.codec')
+
+# Integers from 19 digits on may not fit in 64 bits (orjson turns those into floats);
+# mapping digits to '0' and the rest to ' ' finds them an order of magnitude faster than a regex
+DIGIT_TABLE = bytes(ord('0') if ord('0') <= byte <= ord('9') else ord(' ') for byte in range(256))
+LONG_DIGITS = b'0' * 19
+
+
+class DecodeError(ValueError):
+    """
+    Raised when a document is not valid JSON, whichever codec is in use
+    """
+
+
+class JSONCodec:
+    """
+    Codec using the standard library json module
+
+    Output matches the other codecs (compact separators, UTF-8 instead of
+    \\u escapes), so hashes of encoded documents such as cache and
+    idempotency keys do not depend on which codec a worker has installed.
+    Two exceptions apply with orjson: floats in exponent notation (1e+100
+    here, 1e100 there) and NaN/Infinity (null there). msgspec differs the
+    same way, but only in unsorted output; sorted output goes through
+    this codec.
+    """
+
+    name = 'json'
+
+    def loads(self, data: Union[bytes, bytearray, str]) -> Any:
+        try:
+            return json.loads(data)
+        except ValueError as e:
+            raise DecodeError(str(e)) from e
+
+    def dumpb(
+        self,
+        obj: Any,
+        indent: bool = False,
+        sort_keys: bool = False,
+        default: Optional[Callable[[Any], Any]] = None
+    ) -> bytes:
+        return self.dumps(obj, indent=indent, sort_keys=sort_keys, default=default).encode('utf-8')
+
+    def dumps(
+        self,
+        obj: Any,
+        indent: bool = False,
+        sort_keys: bool = False,
+        default: Optional[Callable[[Any], Any]] = None
+    ) -> str:
+        if indent:
+            return json.dumps(obj, indent=2, sort_keys=sort_keys, default=default, ensure_ascii=False)
+        return json.dumps(obj, separators=(',', ':'), sort_keys=sort_keys, default=default, ensure_ascii=False)
+
+
+class OrjsonCodec(JSONCodec):
+    """
+    Codec using orjson
+
+    orjson only handles 64-bit integers: documents with longer digit runs
+    are parsed, and objects it cannot serialize are encoded, by the json
+    module, so large numeric IDs are neither rounded nor rejected.
+    """
+
+    name = 'orjson'
+
+    def loads(self, data: Union[bytes, bytearray, str]) -> Any:
+        raw = data.encode('utf-8', 'surrogatepass') if isinstance(data, str) else data
+        if LONG_DIGITS in raw.translate(DIGIT_TABLE):
+            return super().loads(data)
+        try:
+            return orjson.loads(data)
+        except ValueError as e:
+            raise DecodeError(str(e)) from e
+
+    def dumpb(
+        self,
+        obj: Any,
+        indent: bool = False,
+        sort_keys: bool = False,
+        default: Optional[Callable[[Any], Any]] = None
+    ) -> bytes:
+        # Non-string keys are converted like the json module does
+        option = orjson.OPT_NON_STR_KEYS
+        if default is not None:
+            # Datetimes go through default, as they do with the json module
+            option |= orjson.OPT_PASSTHROUGH_DATETIME
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except TypeError:
+            # Integers beyond 64 bits (the json module raises again for unserializable objects)
+            return JSONCodec.dumps(self, obj, indent=indent, sort_keys=sort_keys, default=default).encode('utf-8')
+
+    def dumps(
+        self,
+        obj: Any,
+        indent: bool = False,
+        sort_keys: bool = False,
+        default: Optional[Callable[[Any], Any]] = None
+    ) -> str:
+        return self.dumpb(obj, indent=indent, sort_keys=sort_keys, default=default).decode('utf-8')
+
+
+class MsgspecCodec(JSONCodec):
+    """
+    Codec using msgspec
+    """
+
+    name = 'msgspec'
+
+    def loads(self, data: Union[bytes, bytearray, str]) -> Any:
+        try:
+            return msgspec.json.decode(data)
+        except msgspec.DecodeError as e:
+            raise DecodeError(str(e)) from e
+
+    def dumpb(
+        self,
+        obj: Any,
+        indent: bool = False,
+        sort_keys: bool = False,
+        default: Optional[Callable[[Any], Any]] = None
+    ) -> bytes:
+        if sort_keys:
+            # Sorted output is only used for hashing, where matching the json
+            # module matters more than speed (msgspec encodes datetimes itself)
+            return JSONCodec.dumps(self, obj, indent=indent, sort_keys=True, default=default).encode('utf-8')
+        encoded = msgspec.json.encode(obj, enc_hook=default)
+        if indent:
+            return msgspec.json.format(encoded, indent=2)
+        return encoded
+
+    def dumps(
+        self,
+        obj: Any,
+        indent: bool = False,
+        sort_keys: bool = False,
+        default: Optional[Callable[[Any], Any]] = None
+    ) -> str:
+        return self.dumpb(obj, indent=indent, sort_keys=sort_keys, default=default).decode('utf-8')
+
+
+CODECS = {
+    'orjson': (OrjsonCodec, lambda: orjson is not None),
+    'msgspec': (MsgspecCodec, lambda: msgspec is not None),
+    'json': (JSONCodec, lambda: True),
+}
+
+# Order in which 'auto' picks the first installed codec: msgspec parses
+# integers of any size natively, orjson has to hand them to the json module
+AUTO_ORDER = ('msgspec', 'orjson', 'json')
+
+_codec: Optional[JSONCodec] = None
+_codec_lock = threading.Lock()
+
+
+def get_codec() -> JSONCodec:
+    """
+    Get the process-wide JSON codec
+
+    settings.JSON_CODEC selects 'orjson', 'msgspec' or 'json'; 'auto' picks
+    the first installed one of msgspec and orjson. A codec that is not installed falls back to
+    the json module.
+
+    Returns:
+        Codec object
+    """
+    global _codec
+
+    if _codec is None:
+        with _codec_lock:
+            if _codec is None:
+                name = getattr(settings, 'JSON_CODEC', 'auto')
+                if name == 'auto':
+                    name = next(candidate for candidate in AUTO_ORDER if CODECS[candidate][1]())
+                elif name not in CODECS or not CODECS[name][1]():
+                    logger.warning(f"JSON codec {name} is not available, using json")
+                    name = 'json'
+                _codec = CODECS[name][0]()
+
+    return _codec
+
+
+def loads(data: Union[bytes, bytearray, str]) -> Any:
+    """
+    Parse a JSON document
+
+    Args:
+        data: Document as bytes or str (bytes avoid a decode step)
+
+    Returns:
+        Parsed document
+
+    Raises:
+        DecodeError: If the document is not valid JSON
+    """
+    return get_codec().loads(data)
+
+
+def dumps(
+    obj: Any,
+    indent: bool = False,
+    sort_keys: bool = False,
+    default: Optional[Callable[[Any], Any]] = None
+) -> str:
+    """
+    Serialize an object to a JSON string
+
+    Args:
+        obj: Object to serialize
+        indent: Pretty-print with an indent of two spaces
+        sort_keys: Sort object keys (for stable hashes)
+        default: Called for objects the codec cannot serialize
+
+    Returns:
+        JSON document
+    """
+    return get_codec().dumps(obj, indent=indent, sort_keys=sort_keys, default=default)
+
+
+def dumpb(
+    obj: Any,
+    indent: bool = False,
+    sort_keys: bool = False,
+    default: Optional[Callable[[Any], Any]] = None
+) -> bytes:
+    """
+    Serialize an object to UTF-8 encoded JSON
+
+    Same arguments as dumps; use it for request bodies and hashing, where
+    bytes are needed anyway.
+    """
+    return get_codec().dumpb(obj, indent=indent, sort_keys=sort_keys, default=default)
@@ -0,0 +1,30 @@
+import functools
+from typing import Any, Callable
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def database_sync_to_async(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wrap a function using the ORM to be awaited on an executor thread
+
+    Like sync_to_async(thread_sensitive=False), so it does not queue behind
+    other sync code, but the thread's database connection is closed when
+    it is unusable or past CONN_MAX_AGE, as it would be after a request.
+
+    Args:
+        func: Sync function
+
+    Returns:
+        Async function
+    """
+    @functools.wraps(func)
+    def run(*args: Any, **kwargs: Any) -> Any:
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False)
@@ -0,0 +1,565 @@
+import copy
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Union
+
+logger = logging.getLogger('api_hub.core.mapping')
+
+# Returned by compiled accessors when a path does not resolve
+MISSING = object()
+
+INDEX_REGEX = re.compile(r'^-?\d+$')
+SLICE_REGEX = re.compile(r'^(-?\d*):(-?\d*)(?::(-?\d+))?$')
+PLACEHOLDER_REGEX = re.compile(r'\{([^{}]+)\}')
+
+# Argument values that may be rendered into a template string
+TEMPLATE_SCALARS = (str, int, float, bool)
+
+# Number of compiled parameter mappings kept by get_parameter_mapper
+PARAMETER_MAPPER_CACHE_SIZE = 256
+
+
+def _to_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in ('true', '1', 'yes', 'on'):
+            return True
+        if lowered in ('false', '0', 'no', 'off', ''):
+            return False
+        raise ValueError(f"Cannot convert {value!r} to bool")
+    return bool(value)
+
+
+COERCIONS: Dict[str, Callable[[Any], Any]] = {
+    'str': str,
+    'int': int,
+    'float': float,
+    'bool': _to_bool,
+}
+
+
+def _compile_walk(segments: List[str]) -> Callable[[Any], Any]:
+    """
+    Compile a run of plain keys/indices into a single accessor
+    """
+    steps = tuple(
+        (segment, int(segment) if INDEX_REGEX.match(segment) else None)
+        for segment in segments
+    )
+
+    if len(steps) == 1:
+        # Most paths between wildcards are a single key, which saves the loop
+        key, index = steps[0]
+
+        def step(value):
+            if isinstance(value, dict):
+                return value.get(key, MISSING)
+            if index is not None and isinstance(value, list):
+                try:
+                    return value[index]
+                except IndexError:
+                    return MISSING
+            return MISSING
+
+        return step
+
+    def walk(value):
+        for key, index in steps:
+            if isinstance(value, dict):
+                value = value.get(key, MISSING)
+                if value is MISSING:
+                    return MISSING
+            elif index is not None and isinstance(value, list):
+                try:
+                    value = value[index]
+                except IndexError:
+                    return MISSING
+            else:
+                return MISSING
+        return value
+
+    return walk
+
+
+def _compile_segments(segments: List[str], path: str, first: bool = False) -> Callable[[Any], Any]:
+    """
+    Compile path segments into an accessor, splitting at the first wildcard or slice
+
+    With `first`, wildcards and slices stop at the first item the rest of
+    the path resolves on instead of collecting every item.
+    """
+    for position, segment in enumerate(segments):
+        if segment == '*' or ':' in segment:
+            break
+    else:
+        return _compile_walk(segments)
+
+    head = _compile_walk(segments[:position]) if position else None
+    rest = _compile_segments(segments[position + 1:], path, first) if segments[position + 1:] else None
+
+    selector = None
+    segment = segments[position]
+    if segment != '*':
+        match = SLICE_REGEX.match(segment)
+        if not match:
+            raise ValueError(f"Invalid slice {segment!r} in path {path!r}")
+        selector = slice(*(int(part) if part else None for part in match.groups()))
+
+    if first:
+        def first_match(value):
+            if head is not None:
+                value = head(value)
+
+            if isinstance(value, list):
+                items = value if selector is None else value[selector]
+            elif isinstance(value, dict) and selector is None:
+                items = value.values()
+            else:
+                return MISSING
+
+            for item in items:
+                if rest is not None:
+                    item = rest(item)
+                if item is not MISSING and item is not None:
+                    return item
+            return MISSING
+
+        return first_match
+
+    def fan_out(value):
+        if head is not None:
+            value = head(value)
+
+        if isinstance(value, list):
+            items = value if selector is None else value[selector]
+        elif isinstance(value, dict) and selector is None:
+            items = value.values()
+        else:
+            return MISSING
+
+        if rest is None:
+            return list(items)
+
+        result = []
+        for item in items:
+            item = rest(item)
+            if item is not MISSING and item is not None:
+                result.append(item)
+        return result
+
+    return fan_out
+
+
+def compile_path(path: str) -> Callable[[Any], Any]:
+    """
+    Compile a dotted path into an accessor function
+
+    Segments are dict keys or list indices (negative indices count from the
+    end). A `*` segment maps the rest of the path over every item of a list
+    (or value of a dict) and a `start:stop[:step]` segment over a slice of a
+    list, e.g. "data.items.*.id" or "data.items.:10.id". Nested wildcards
+    produce nested lists; items where the rest of the path does not resolve
+    are skipped.
+
+    Args:
+        path: Dotted path (e.g., "data.items.0.id")
+
+    Returns:
+        Function taking the data and returning the value at the path, or MISSING
+
+    Raises:
+        ValueError: If the path is malformed
+    """
+    if not isinstance(path, str) or not path:
+        raise ValueError(f"Invalid path {path!r}")
+
+    segments = path.split('.')
+    if not all(segments):
+        raise ValueError(f"Invalid path {path!r}")
+
+    return _compile_segments(segments, path)
+
+
+def compile_first_path(path: str) -> Callable[[Any], Any]:
+    """
+    Compile a dotted path into an accessor returning a single value
+
+    Same syntax as compile_path, but a `*` or slice segment yields the
+    first item on which the rest of the path resolves to a non-null value
+    instead of a list, and stops looking at the remaining items. Useful
+    for picking one value out of a potentially large list, e.g.
+    "entry.*.changes.*.value.messages.*.id".
+
+    Args:
+        path: Dotted path
+
+    Returns:
+        Function taking the data and returning the first value at the path, or MISSING
+
+    Raises:
+        ValueError: If the path is malformed
+    """
+    if not isinstance(path, str) or not path:
+        raise ValueError(f"Invalid path {path!r}")
+
+    segments = path.split('.')
+    if not all(segments):
+        raise ValueError(f"Invalid path {path!r}")
+
+    return _compile_segments(segments, path, first=True)
+
+
+def path_has_fan_out(path: str) -> bool:
+    """
+    Check whether a dotted path contains a wildcard or slice segment
+    """
+    return any(segment == '*' or ':' in segment for segment in path.split('.'))
+
+
+def _compile_path_spec(target_key: str, spec: Dict[str, Any]) -> Callable[[Any], Any]:
+    """
+    Compile a {"path", "default", "type"} field spec
+
+    Returns:
+        Function taking the data and returning the (coerced) value, the
+        default, or MISSING
+    """
+    unknown = set(spec) - {'path', 'default', 'type'}
+    if unknown:
+        raise ValueError(f"Unknown option(s) {', '.join(sorted(unknown))} in mapping for {target_key!r}")
+
+    coerce = None
+    if spec.get('type') is not None:
+        coerce = COERCIONS.get(spec['type'])
+        if coerce is None:
+            raise ValueError(
+                f"Unknown type {spec['type']!r} in mapping for {target_key!r} "
+                f"(expected one of {', '.join(COERCIONS)})"
+            )
+
+    accessor = compile_path(spec['path'])
+    many = path_has_fan_out(spec['path'])
+    default = spec.get('default', MISSING)
+
+    def field(data):
+        value = accessor(data)
+
+        if value is not MISSING and value is not None and coerce is not None:
+            try:
+                value = [coerce(item) for item in value] if many else coerce(value)
+            except (ValueError, TypeError):
+                value = MISSING
+
+        if value is MISSING or value is None:
+            # Defaults are shared by every call, so never hand out the same list/dict
+            if isinstance(default, (dict, list)):
+                return copy.deepcopy(default)
+            return default
+
+        return value
+
+    return field
+
+
+def compile_response_mapping(mapping: Dict[str, Union[str, Dict[str, Any]]]) -> Callable[[Any], Dict[str, Any]]:
+    """
+    Compile an APIEndpoint.response_mapping into a mapping function
+
+    Each target field maps either to a dotted path, or to a dict with a
+    "path" and optionally a "default" (used when the path does not resolve
+    or resolves to null) and a "type" to coerce the value to (str, int,
+    float or bool; applied per item for wildcard/slice paths). Fields that
+    do not resolve and have no default are left out of the result.
+
+    Example:
+        {
+            "first_id": "items.0.id",
+            "ids": "items.*.id",
+            "total": {"path": "meta.total", "type": "int", "default": 0}
+        }
+
+    Args:
+        mapping: Response mapping dict
+
+    Returns:
+        Function taking the response data and returning the mapped data
+
+    Raises:
+        ValueError: If the mapping is malformed
+    """
+    if not isinstance(mapping, dict):
+        raise ValueError("Response mapping must be an object")
+
+    fields = []
+    for target_key, spec in mapping.items():
+        if isinstance(spec, str):
+            fields.append((target_key, compile_path(spec)))
+        elif isinstance(spec, dict) and 'path' in spec:
+            fields.append((target_key, _compile_path_spec(target_key, spec)))
+        else:
+            raise ValueError(f"Mapping for {target_key!r} must be a path or an object with a \"path\"")
+
+    fields = tuple(fields)
+
+    def apply(data: Any) -> Dict[str, Any]:
+        result = {}
+
+        for target_key, field in fields:
+            value = field(data)
+            if value is not MISSING and value is not None:
+                result[target_key] = value
+
+        return result
+
+    return apply
+
+
+def response_mapping_paths(mapping: Dict[str, Union[str, Dict[str, Any]]]) -> List[str]:
+    """
+    Get the source paths referenced by a response mapping
+
+    Args:
+        mapping: Response mapping dict
+
+    Returns:
+        List of dotted paths
+    """
+    paths = []
+    for spec in mapping.values():
+        if isinstance(spec, dict):
+            spec = spec.get('path')
+        if isinstance(spec, str) and spec:
+            paths.append(spec)
+    return paths
+
+
+def _compile_argument(source_path: str) -> Callable[[Dict[str, Any]], Any]:
+    """
+    Compile a function argument reference
+
+    A top-level argument literally named like the path wins; otherwise a
+    dotted path is walked into nested arguments.
+    """
+    if '.' not in source_path:
+        return lambda function_args: function_args.get(source_path, MISSING)
+
+    accessor = compile_path(source_path)
+
+    def argument(function_args):
+        value = function_args.get(source_path, MISSING)
+        if value is MISSING:
+            value = accessor(function_args)
+            if value is None:
+                return MISSING
+        return value
+
+    return argument
+
+
+def _compile_template(template: str) -> Callable[[Dict[str, Any]], str]:
+    """
+    Compile a template string such as "{user.name} <{user.email}>"
+
+    Placeholders that do not resolve to a scalar argument are left as-is.
+    Placeholders that are not valid paths (e.g. "{time:%H}") only match a
+    top-level argument literally named like them.
+    """
+    pieces = []
+    position = 0
+    for match in PLACEHOLDER_REGEX.finditer(template):
+        if match.start() > position:
+            pieces.append(template[position:match.start()])
+        name = match.group(1)
+        try:
+            accessor = compile_path(name.strip())
+        except ValueError:
+            accessor = lambda function_args, name=name: function_args.get(name, MISSING)
+        pieces.append((accessor, match.group(0)))
+        position = match.end()
+    if position < len(template):
+        pieces.append(template[position:])
+
+    if all(isinstance(piece, str) for piece in pieces):
+        return lambda function_args: template
+
+    pieces = tuple(pieces)
+
+    def render(function_args):
+        parts = []
+        for piece in pieces:
+            if isinstance(piece, str):
+                parts.append(piece)
+                continue
+            accessor, placeholder = piece
+            value = accessor(function_args)
+            parts.append(str(value) if isinstance(value, TEMPLATE_SCALARS) else placeholder)
+        return ''.join(parts)
+
+    return render
+
+
+def _compile_parameter(target_key: str, source_path: Any) -> Callable[[Dict[str, Any]], Any]:
+    """
+    Compile a single FunctionDefinition.parameter_mapping entry
+    """
+    # Template strings (e.g., "{user.name} <{user.email}>")
+    if isinstance(source_path, str) and '{' in source_path:
+        render = _compile_template(source_path)
+
+        def template(function_args):
+            # An argument literally named like the template still wins
+            value = function_args.get(source_path, MISSING)
+            return render(function_args) if value is MISSING else value
+
+        return template
+
+    # Simple keys and nested paths (e.g., "user.name")
+    if isinstance(source_path, str):
+        if not source_path:
+            raise ValueError(f"Empty source path for {target_key!r}")
+        return _compile_argument(source_path)
+
+    if not isinstance(source_path, dict):
+        raise ValueError(f"Mapping for {target_key!r} must be a string or an object")
+
+    # Static values
+    if 'static' in source_path:
+        value = source_path['static']
+        return lambda function_args: value
+
+    # Transformations
+    if 'transform' in source_path:
+        if source_path['transform'] != 'join':
+            raise ValueError(f"Unknown transform {source_path['transform']!r} in mapping for {target_key!r}")
+
+        fields = source_path.get('fields')
+        separator = source_path.get('separator')
+        if not isinstance(fields, list) or not all(isinstance(field, str) and field for field in fields):
+            raise ValueError(f"\"join\" mapping for {target_key!r} needs a list of \"fields\"")
+        if not isinstance(separator, str):
+            raise ValueError(f"\"join\" mapping for {target_key!r} needs a \"separator\" string")
+
+        accessors = tuple(_compile_argument(field) for field in fields)
+
+        def join(function_args):
+            values = []
+            for accessor in accessors:
+                value = accessor(function_args)
+                if value is not MISSING:
+                    values.append(str(value))
+            return separator.join(values)
+
+        return join
+
+    # Paths with a default and/or type coercion
+    if 'path' in source_path:
+        return _compile_path_spec(target_key, source_path)
+
+    raise ValueError(f"Mapping for {target_key!r} needs one of \"static\", \"transform\" or \"path\"")
+
+
+def compile_parameter_mapping(
+    mapping: Dict[str, Any],
+    strict: bool = True
+) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Compile a FunctionDefinition.parameter_mapping into a mapping function
+
+    Each API parameter maps to one of:
+        - an argument name or dotted path ("user.name")
+        - a template string ("{user.name} <{user.email}>")
+        - {"static": value}
+        - {"transform": "join", "fields": [...], "separator": ", "}
+        - {"path": ..., "default": ..., "type": ...} as in response mappings
+
+    Parameters that do not resolve are left out. Arguments that are not a
+    mapping target are passed through unchanged.
+
+    Args:
+        mapping: Parameter mapping dict
+        strict: Raise on malformed entries instead of logging and leaving them out
+
+    Returns:
+        Function taking the function arguments and returning the API parameters
+
+    Raises:
+        ValueError: If the mapping is malformed and `strict` is set
+    """
+    if not mapping:
+        return lambda function_args: function_args
+
+    if not isinstance(mapping, dict):
+        if strict:
+            raise ValueError("Parameter mapping must be an object")
+        logger.warning("Parameter mapping is not an object, passing the arguments through")
+        return lambda function_args: function_args
+
+    parameters = []
+    for target_key, source_path in mapping.items():
+        try:
+            parameters.append((target_key, _compile_parameter(target_key, source_path)))
+        except ValueError as e:
+            if strict:
+                raise
+            logger.warning(f"Invalid parameter mapping for {target_key!r}, parameter skipped: {str(e)}")
+    parameters = tuple(parameters)
+    targets = frozenset(mapping)
+
+    def apply(function_args: Dict[str, Any]) -> Dict[str, Any]:
+        mapped_args = {}
+
+        for target_key, parameter in parameters:
+            value = parameter(function_args)
+            if value is not MISSING:
+                mapped_args[target_key] = value
+
+        # Include any unmapped arguments
+        for key, value in function_args.items():
+            if key not in targets:
+                mapped_args[key] = value
+
+        return mapped_args
+
+    return apply
+
+
+_parameter_mappers: "OrderedDict[tuple, Callable]" = OrderedDict()
+_parameter_mappers_lock = threading.Lock()
+
+
+def get_parameter_mapper(func_def: Any) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Get the compiled parameter mapping for a function definition
+
+    Compiled mappings are cached per definition version (primary key and
+    updated_at), so an edited definition is recompiled on its next use.
+    Malformed entries are logged and left out rather than failing the
+    call; FunctionDefinition.clean() rejects them when saved from a form.
+
+    Args:
+        func_def: FunctionDefinition object
+
+    Returns:
+        Function taking the function arguments and returning the API parameters
+    """
+    if func_def.pk is None:
+        return compile_parameter_mapping(func_def.parameter_mapping, strict=False)
+
+    key = (func_def.pk, func_def.updated_at)
+
+    with _parameter_mappers_lock:
+        mapper = _parameter_mappers.get(key)
+        if mapper is not None:
+            _parameter_mappers.move_to_end(key)
+            return mapper
+
+    mapper = compile_parameter_mapping(func_def.parameter_mapping, strict=False)
+
+    with _parameter_mappers_lock:
+        _parameter_mappers[key] = mapper
+        while len(_parameter_mappers) > PARAMETER_MAPPER_CACHE_SIZE:
+            _parameter_mappers.popitem(last=False)
+
+    return mapper
@@ -0,0 +1,467 @@
+import atexit
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, NamedTuple, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('api_hub.core.ratelimit')
+
+PERIOD_SECONDS = {
+    'second': 1,
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400,
+}
+
+# A single limit: "100/hour", "300/15minute" or "10/second burst=20"
+RATE_LIMIT_PART = r'\d+/\d*(?:second|minute|hour|day)(?:\s+burst=\d+)?'
+
+# One or more limits separated by semicolons: "10/second;1000/hour"
+RATE_LIMIT_REGEX = rf'^\s*{RATE_LIMIT_PART}\s*(?:;\s*{RATE_LIMIT_PART}\s*)*$'
+
+_part_pattern = re.compile(r'^(\d+)/(\d*)(second|minute|hour|day)(?:\s+burst=(\d+))?$')
+
+# Tolerance for the rounding error of adding up GCRA intervals in float seconds
+GCRA_TOLERANCE = 1e-9
+
+
+class RateLimitExceeded(Exception):
+    """
+    Raised when a call is rejected by a rate limit
+    """
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        """
+        Args:
+            message: Error message
+            retry_after: Seconds until a call would be allowed
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimit(NamedTuple):
+    """
+    A single rate limit
+
+    Without a burst, the limit is enforced as a sliding log: never more than
+    `limit` requests in any `period`-second window. With a burst, it is
+    enforced with GCRA: requests are spaced period/limit apart on average,
+    with up to `burst` requests allowed back to back.
+    """
+    limit: int
+    period: int
+    burst: int = 0
+
+
+@lru_cache(maxsize=256)
+def parse_rate_limit(rate_limit: str) -> Tuple[RateLimit, ...]:
+    """
+    Parse a rate limit specification
+
+    Args:
+        rate_limit: One or more limits separated by semicolons, each in the
+            format number/[multiplier]timeunit with an optional burst
+            (e.g., "10/second;1000/hour", "300/15minute", "100/hour burst=10")
+
+    Returns:
+        Tuple of RateLimit objects
+
+    Raises:
+        ValueError: If the specification is invalid
+    """
+    limits = []
+
+    for part in rate_limit.split(';'):
+        match = _part_pattern.match(part.strip().lower())
+        if not match:
+            raise ValueError(f"Invalid rate limit: {rate_limit}")
+
+        limit, multiplier, unit, burst = match.groups()
+        limits.append(RateLimit(
+            limit=int(limit),
+            period=int(multiplier or 1) * PERIOD_SECONDS[unit],
+            burst=int(burst or 0)
+        ))
+
+    return tuple(limits)
+
+
+class BaseRateLimiter:
+    """
+    Base class for rate limiter backends
+    """
+
+    def acquire(self, key: str, limits: Sequence[RateLimit]) -> Tuple[bool, float]:
+        """
+        Try to consume one request from every limit for a key
+
+        The request is only counted if all limits allow it.
+
+        Args:
+            key: Rate-limited target key
+            limits: Limits to enforce
+
+        Returns:
+            Tuple of (allowed, seconds until a request would be allowed)
+        """
+        raise NotImplementedError
+
+    def reset(self, key: Optional[str] = None) -> None:
+        """
+        Forget the state for a key (or for all keys)
+        """
+        raise NotImplementedError
+
+
+class LocalRateLimiter(BaseRateLimiter):
+    """
+    In-process rate limiter
+
+    Sliding-log limits keep the timestamps of the requests in the current
+    window; burst limits keep a single GCRA theoretical arrival time.
+    Suitable for a single worker process; use RedisRateLimiter to share
+    limits across a Celery fleet.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (key, limit) -> deque of timestamps (sliding log) or [tat] (GCRA)
+        self._state: Dict[Tuple[str, RateLimit], Any] = {}
+
+    def acquire(self, key: str, limits: Sequence[RateLimit]) -> Tuple[bool, float]:
+        now = time.monotonic()
+        retry_after = 0.0
+
+        with self._lock:
+            # Check every limit before consuming any of them
+            for rate in limits:
+                if rate.limit <= 0:
+                    retry_after = max(retry_after, float(rate.period))
+                elif rate.burst:
+                    interval = rate.period / rate.limit
+                    tat = max(self._state.get((key, rate), [now])[0], now)
+                    allow_at = tat - (rate.burst - 1) * interval
+                    if allow_at - now > GCRA_TOLERANCE:
+                        retry_after = max(retry_after, allow_at - now)
+                else:
+                    log = self._state.get((key, rate))
+                    if log is None:
+                        continue
+                    while log and log[0] <= now - rate.period:
+                        log.popleft()
+                    if len(log) >= rate.limit:
+                        retry_after = max(retry_after, log[0] + rate.period - now)
+
+            if retry_after > 0:
+                return False, retry_after
+
+            for rate in limits:
+                if rate.burst:
+                    interval = rate.period / rate.limit
+                    state = self._state.setdefault((key, rate), [now])
+                    state[0] = max(state[0], now) + interval
+                else:
+                    self._state.setdefault((key, rate), deque()).append(now)
+
+        return True, 0.0
+
+    def reset(self, key: Optional[str] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._state.clear()
+            else:
+                for state_key in [k for k in self._state if k[0] == key]:
+                    del self._state[state_key]
+
+
+class RedisRateLimiter(BaseRateLimiter):
+    """
+    Rate limiter shared across processes through Redis
+
+    Sliding-log limits are sorted sets of request timestamps, burst limits
+    are GCRA theoretical arrival times. All limits of a key are checked and
+    consumed atomically by a Lua script, so concurrent workers can never
+    both take the last slot.
+    """
+
+    SCRIPT = """
+local now = tonumber(ARGV[1])
+local member = ARGV[2]
+local retry_after = 0
+
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[i * 3])
+    local window = tonumber(ARGV[i * 3 + 1])
+    local burst = tonumber(ARGV[i * 3 + 2])
+
+    if limit <= 0 then
+        retry_after = math.max(retry_after, window)
+    elseif burst > 0 then
+        local interval = window / limit
+        local tat = math.max(tonumber(redis.call('GET', key) or now), now)
+        local allow_at = tat - (burst - 1) * interval
+        if now < allow_at then
+            retry_after = math.max(retry_after, allow_at - now)
+        end
+    else
+        redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+        if redis.call('ZCARD', key) >= limit then
+            local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+            retry_after = math.max(retry_after, tonumber(oldest[2]) + window - now)
+        end
+    end
+end
+
+if retry_after > 0 then
+    return {0, math.ceil(retry_after)}
+end
+
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[i * 3])
+    local window = tonumber(ARGV[i * 3 + 1])
+    local burst = tonumber(ARGV[i * 3 + 2])
+
+    if burst > 0 then
+        local interval = window / limit
+        local tat = math.max(tonumber(redis.call('GET', key) or now), now) + interval
+        redis.call('SET', key, tostring(tat), 'PX', math.ceil(tat - now))
+    else
+        redis.call('ZADD', key, now, member)
+        redis.call('PEXPIRE', key, window)
+    end
+end
+
+return {1, 0}
+"""
+
+    def __init__(self, url: Optional[str] = None, prefix: str = 'ratelimit'):
+        """
+        Initialize the Redis rate limiter
+
+        Args:
+            url: Redis URL (defaults to settings.RATE_LIMIT_REDIS_URL)
+            prefix: Key prefix
+        """
+        import redis
+
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url or getattr(settings, 'RATE_LIMIT_REDIS_URL', settings.CELERY_BROKER_URL))
+        self.script = self.client.register_script(self.SCRIPT)
+
+    def acquire(self, key: str, limits: Sequence[RateLimit]) -> Tuple[bool, float]:
+        now_ms = int(time.time() * 1000)
+        keys = []
+        args = [now_ms, f"{now_ms}-{uuid.uuid4().hex}"]
+
+        for rate in limits:
+            keys.append(f"{self.prefix}:{key}:{rate.limit}/{rate.period}:{rate.burst}")
+            args.extend([rate.limit, rate.period * 1000, rate.burst])
+
+        allowed, retry_after_ms = self.script(keys=keys, args=args)
+        return bool(allowed), max(0.0, int(retry_after_ms) / 1000.0)
+
+    def reset(self, key: Optional[str] = None) -> None:
+        pattern = f"{self.prefix}:{key}:*" if key is not None else f"{self.prefix}:*"
+        for redis_key in self.client.scan_iter(pattern):
+            self.client.delete(redis_key)
+
+
+class RateLimitAuditBuffer:
+    """
+    Buffer of allowed requests that is flushed to RateLimitLog in the background
+
+    Keeps the audit trail off the hot path: recording is an in-memory
+    counter increment, and a daemon thread writes aggregated counts per
+    window every `flush_interval` seconds.
+    """
+
+    def __init__(self, flush_interval: float = 10):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # (target_type, target_id, window_start) -> [window_end, limit, count]
+        self._counts = defaultdict(lambda: [None, 0, 0])
+        self._thread = None
+        self._pid = None
+
+    def record(self, target_type: str, target_id: str, limit: int, period: int) -> None:
+        """
+        Record an allowed request
+
+        Args:
+            target_type: Type of rate-limited target (e.g., api_config)
+            target_id: Identifier for the rate-limited target
+            limit: Number of requests allowed per period
+            period: Period in seconds
+        """
+        window_start, window_end = self._get_window(period)
+
+        with self._lock:
+            entry = self._counts[(target_type, target_id, window_start)]
+            entry[0] = window_end
+            entry[1] = limit
+            entry[2] += 1
+
+        self._ensure_thread()
+
+    def flush(self) -> None:
+        """
+        Write buffered counts to RateLimitLog
+        """
+        from .models import RateLimitLog
+
+        with self._lock:
+            counts = self._counts
+            self._counts = defaultdict(lambda: [None, 0, 0])
+
+        for (target_type, target_id, window_start), (window_end, limit, count) in counts.items():
+            try:
+                lookup = {
+                    'target_type': target_type,
+                    'target_id': target_id,
+                    'window_start': window_start,
+                }
+                updated = RateLimitLog.objects.filter(**lookup).update(
+                    request_count=F('request_count') + count,
+                    last_request_at=timezone.now()
+                )
+                if not updated:
+                    try:
+                        with transaction.atomic():
+                            RateLimitLog.objects.create(
+                                window_end=window_end,
+                                limit=limit,
+                                request_count=count,
+                                **lookup
+                            )
+                    except IntegrityError:
+                        # Another process created the row in the meantime (rows
+                        # are unique per target and window, see RateLimitLog.Meta)
+                        RateLimitLog.objects.filter(**lookup).update(
+                            request_count=F('request_count') + count,
+                            last_request_at=timezone.now()
+                        )
+            except Exception as e:
+                logger.exception(f"Error flushing rate limit audit log: {str(e)}")
+
+    def _get_window(self, period: int) -> Tuple[datetime, datetime]:
+        """
+        Get the calendar window used to aggregate audit rows
+        """
+        now = timezone.now()
+
+        if period <= PERIOD_SECONDS['second']:
+            window_start = now.replace(microsecond=0)
+        elif period <= PERIOD_SECONDS['minute']:
+            window_start = now.replace(second=0, microsecond=0)
+        elif period <= PERIOD_SECONDS['hour']:
+            window_start = now.replace(minute=0, second=0, microsecond=0)
+        else:
+            window_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        return window_start, window_start + timedelta(seconds=period)
+
+    def _ensure_thread(self) -> None:
+        """
+        Start the flush thread (again after a fork)
+        """
+        pid = os.getpid()
+        if self._pid == pid and self._thread and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._pid == pid and self._thread and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._thread = threading.Thread(
+                target=self._run,
+                name='rate-limit-audit-flush',
+                daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            # Nothing else closes this thread's connection, e.g. after CONN_MAX_AGE
+            # or when the database went away
+            close_old_connections()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+_limiter: Optional[BaseRateLimiter] = None
+_audit_buffer: Optional[RateLimitAuditBuffer] = None
+_init_lock = threading.Lock()
+
+
+def get_rate_limiter() -> BaseRateLimiter:
+    """
+    Get the configured rate limiter backend
+
+    Returns:
+        Instance of settings.RATE_LIMIT_BACKEND
+    """
+    global _limiter
+
+    if _limiter is None:
+        with _init_lock:
+            if _limiter is None:
+                backend = getattr(settings, 'RATE_LIMIT_BACKEND', 'core.ratelimit.LocalRateLimiter')
+                _limiter = import_string(backend)()
+
+    return _limiter
+
+
+def get_audit_buffer() -> RateLimitAuditBuffer:
+    """
+    Get the process-wide rate limit audit buffer
+    """
+    global _audit_buffer
+
+    if _audit_buffer is None:
+        with _init_lock:
+            if _audit_buffer is None:
+                _audit_buffer = RateLimitAuditBuffer(
+                    flush_interval=getattr(settings, 'RATE_LIMIT_AUDIT_FLUSH_INTERVAL', 10)
+                )
+                atexit.register(_audit_buffer.flush)
+
+    return _audit_buffer
+
+
+def check_rate_limit(target_type: str, target_id: str, rate_limit: str) -> Tuple[bool, float]:
+    """
+    Check and consume the rate limit for a target
+
+    Args:
+        target_type: Type of rate-limited target (e.g., api_config)
+        target_id: Identifier for the rate-limited target
+        rate_limit: Rate limit specification (e.g., "10/second;1000/hour")
+
+    Returns:
+        Tuple of (allowed, seconds until a request would be allowed)
+    """
+    limits = parse_rate_limit(rate_limit)
+    allowed, retry_after = get_rate_limiter().acquire(f"{target_type}:{target_id}", limits)
+
+    if allowed:
+        # Audit against the longest window, which is the quota that matters
+        audit_limit = max(limits, key=lambda rate: rate.period)
+        get_audit_buffer().record(target_type, target_id, audit_limit.limit, audit_limit.period)
+
+    return allowed, retry_after
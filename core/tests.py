@@ -1,3 +1,353 @@
-from django.test import TestCase
+import threading
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase
+
+from . import codec
+from .db import database_sync_to_async
+from .mapping import compile_parameter_mapping, compile_response_mapping, get_parameter_mapper
+from .models import RateLimitLog
+from .ratelimit import LocalRateLimiter, RateLimitAuditBuffer, RedisRateLimiter, parse_rate_limit
+
+
+class ResponseMappingTests(SimpleTestCase):
+
+    DATA = {
+        'meta': {'total': '3', 'next': None},
+        'items': [
+            {'id': 1, 'name': 'a', 'tags': ['x', 'y'], 'score': '1.5'},
+            {'id': 2, 'tags': []},
+            {'id': 3, 'name': 'c', 'tags': ['z'], 'score': 'n/a'},
+        ],
+    }
+
+    def test_dotted_paths_and_indices(self):
+        mapper = compile_response_mapping({
+            'total': 'meta.total', 'first': 'items.0.id', 'last': 'items.-1.name', 'tag': 'items.0.tags.1',
+            'out_of_range': 'items.5.id', 'missing': 'meta.page', 'null': 'meta.next', 'through_scalar': 'meta.total.x',
+        })
+
+        self.assertEqual(mapper(self.DATA), {'total': '3', 'first': 1, 'last': 'c', 'tag': 'y'})
+
+    def test_wildcards_and_slices(self):
+        mapper = compile_response_mapping({
+            'ids': 'items.*.id',
+            'names': 'items.*.name',
+            'tags': 'items.*.tags',
+            'nested': 'items.*.tags.*',
+            'head': 'items.:2.id',
+            'tail': 'items.-2:.id',
+            'every_other': 'items.::2.id',
+            'values': 'meta.*',
+            'none': 'meta.total.*',
+        })
+
+        self.assertEqual(mapper(self.DATA), {
+            'ids': [1, 2, 3],
+            # Items where the rest of the path does not resolve are skipped
+            'names': ['a', 'c'],
+            'tags': [['x', 'y'], [], ['z']],
+            'nested': [['x', 'y'], [], ['z']],
+            'head': [1, 2],
+            'tail': [2, 3],
+            'every_other': [1, 3],
+            'values': ['3', None],
+        })
+
+    def test_type_coercion(self):
+        mapper = compile_response_mapping({
+            'total': {'path': 'meta.total', 'type': 'int'},
+            'id': {'path': 'items.0.id', 'type': 'str'},
+            'score': {'path': 'items.0.score', 'type': 'float'},
+            'bad_score': {'path': 'items.2.score', 'type': 'float'},
+            'ids': {'path': 'items.*.id', 'type': 'str'},
+            'scores': {'path': 'items.*.score', 'type': 'float'},
+            'flag': {'path': 'items.1.id', 'type': 'bool'},
+            'bad_flag': {'path': 'meta.total', 'type': 'bool'},
+        })
+
+        # A value that cannot be converted is left out, for lists the whole list
+        self.assertEqual(
+            mapper(self.DATA),
+            {'total': 3, 'id': '1', 'score': 1.5, 'ids': ['1', '2', '3'], 'flag': True}
+        )
+
+    def test_defaults(self):
+        mapper = compile_response_mapping({
+            'next': {'path': 'meta.next', 'default': 'end'},
+            'page': {'path': 'meta.page', 'default': {'number': 1}},
+            'score': {'path': 'items.2.score', 'type': 'float', 'default': 0.0},
+            'total': {'path': 'meta.total', 'default': '0'},
+        })
+
+        first = mapper(self.DATA)
+        self.assertEqual(first, {'next': 'end', 'page': {'number': 1}, 'score': 0.0, 'total': '3'})
+        # Mutable defaults are copied for every call
+        first['page']['number'] = 2
+        self.assertEqual(mapper(self.DATA)['page'], {'number': 1})
+
+    def test_malformed_mappings_are_rejected(self):
+        for mapping in (
+            ['items.0.id'],
+            {'a': ''},
+            {'a': 'items..id'},
+            {'a': 'items.1:x.id'},
+            {'a': {'default': 1}},
+            {'a': {'path': 'items.0.id', 'type': 'date'}},
+            {'a': {'path': 'items.0.id', 'fallback': 1}},
+            {'a': 1},
+        ):
+            with self.subTest(mapping=mapping), self.assertRaises(ValueError):
+                compile_response_mapping(mapping)
+
+
+class ParameterMappingTests(SimpleTestCase):
+
+    def test_placeholders_that_are_not_paths_match_arguments_by_name(self):
+        mapper = compile_parameter_mapping({'q': 'at {time:%H} for { }', 'user': '{user.name}'})
+
+        self.assertEqual(
+            mapper({'time:%H': '10', 'user': {'name': 'ann'}}),
+            {'q': 'at 10 for { }', 'user': 'ann', 'time:%H': '10'}
+        )
+
+    def test_paths_static_values_and_passthrough(self):
+        mapper = compile_parameter_mapping({
+            'q': 'query',
+            'name': 'user.name',
+            'first_tag': 'user.tags.0',
+            'missing': 'user.email',
+            'version': {'static': 2},
+            'limit': {'path': 'options.limit', 'type': 'int', 'default': 10},
+        })
+
+        self.assertEqual(
+            mapper({'query': 'x', 'user': {'name': 'ann', 'tags': ['a']}, 'options': {}, 'extra': 1}),
+            {
+                'q': 'x', 'name': 'ann', 'first_tag': 'a', 'version': 2, 'limit': 10,
+                'query': 'x', 'user': {'name': 'ann', 'tags': ['a']}, 'options': {}, 'extra': 1,
+            }
+        )
+        self.assertEqual(mapper({'options': {'limit': '5'}})['limit'], 5)
+
+    def test_argument_named_like_a_path_wins(self):
+        mapper = compile_parameter_mapping({'name': 'user.name'})
+
+        self.assertEqual(mapper({'user.name': 'flat', 'user': {'name': 'nested'}})['name'], 'flat')
+
+    def test_templates(self):
+        mapper = compile_parameter_mapping({
+            'to': '{user.name} <{user.email}>',
+            'subject': 'Order {order.id} for {user.name}',
+            'unresolved': 'Hi {nobody}',
+            'object': 'Data: {user}',
+        })
+
+        result = mapper({'user': {'name': 'Ann', 'email': 'ann@example.com'}, 'order': {'id': 7}})
+
+        self.assertEqual(result['to'], 'Ann <ann@example.com>')
+        self.assertEqual(result['subject'], 'Order 7 for Ann')
+        self.assertEqual(result['unresolved'], 'Hi {nobody}')
+        # Only scalars are rendered
+        self.assertEqual(result['object'], 'Data: {user}')
+
+    def test_join(self):
+        mapper = compile_parameter_mapping({
+            'address': {'transform': 'join', 'fields': ['street', 'city.name', 'zip'], 'separator': ', '}
+        })
+
+        self.assertEqual(mapper({'street': 'Main St', 'city': {'name': 'Springfield'}})['address'], 'Main St, Springfield')
+
+    def test_strict_compilation_rejects_malformed_entries(self):
+        for entry in ({'transform': 'join', 'fields': ['a']}, {'transform': 'upper'}, {'default': 1}, ''):
+            with self.subTest(entry=entry), self.assertRaises(ValueError):
+                compile_parameter_mapping({'target': entry})
+
+    def test_runtime_mapper_skips_malformed_entries(self):
+        func_def = SimpleNamespace(pk=None, updated_at=None, parameter_mapping={
+            'joined': {'transform': 'join', 'fields': ['a', 'b']},
+            'upper': {'transform': 'upper'},
+            'empty': {},
+            'name': 'user.name',
+        })
+
+        with self.assertLogs('api_hub.core.mapping', 'WARNING') as logs:
+            mapper = get_parameter_mapper(func_def)
+
+        self.assertEqual(len(logs.records), 3)
+        # Skipped targets are still not passed through
+        self.assertEqual(
+            mapper({'user': {'name': 'ann'}, 'a': 1, 'joined': 'x'}),
+            {'name': 'ann', 'user': {'name': 'ann'}, 'a': 1}
+        )
+
+
+class RateLimitAuditBufferTests(TestCase):
+
+    def setUp(self):
+        self.buffer = RateLimitAuditBuffer()
+        patcher = mock.patch.object(self.buffer, '_ensure_thread')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def record(self, times):
+        # Daily windows, so the test does not straddle two of them
+        for _ in range(times):
+            self.buffer.record('api_config', '1', 10, 86400)
+
+    def test_flushes_add_up_in_the_window_row(self):
+        self.record(2)
+        self.buffer.flush()
+        self.record(1)
+        self.buffer.flush()
+
+        log = RateLimitLog.objects.get()
+        self.assertEqual((log.request_count, log.limit), (3, 10))
+
+    def test_flush_adds_to_a_row_created_concurrently(self):
+        self.record(2)
+        window_start, window_end = self.buffer._get_window(86400)
+        RateLimitLog.objects.create(
+            target_type='api_config', target_id='1', window_start=window_start,
+            window_end=window_end, limit=10, request_count=5
+        )
+        update = QuerySet.update
+        calls = []
+
+        def update_missing_first(queryset, **kwargs):
+            # The row did not exist yet when the first update ran
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', update_missing_first):
+            self.buffer.flush()
+
+        self.assertEqual(RateLimitLog.objects.get().request_count, 7)
+
+    def test_flush_thread_closes_old_connections(self):
+        self.buffer.flush_interval = 0
+
+        with mock.patch.object(self.buffer, 'flush', side_effect=SystemExit), \
+                mock.patch('core.ratelimit.close_old_connections') as close_old_connections:
+            with self.assertRaises(SystemExit):
+                self.buffer._run()
+
+        self.assertEqual(close_old_connections.call_count, 2)
+
+
+class DatabaseSyncToAsyncTests(SimpleTestCase):
+
+    async def test_connections_are_closed_around_the_call(self):
+        threads = []
+
+        def query():
+            threads.append(threading.get_ident())
+            return 'result'
+
+        with mock.patch('core.db.close_old_connections') as close_old_connections:
+            result = await database_sync_to_async(query)()
+
+        self.assertEqual(result, 'result')
+        self.assertNotIn(threading.get_ident(), threads)
+        self.assertEqual(close_old_connections.call_count, 2)
+
+
+class CodecTests(SimpleTestCase):
+
+    CODECS = [name for name, (_, available) in codec.CODECS.items() if available()]
+
+    def test_integers_beyond_64_bits_are_kept_exact(self):
+        document = '{"id":123456789012345678901234567890,"n":-9999999999999999999}'
+        for name in self.CODECS:
+            with self.subTest(codec=name):
+                json_codec = codec.CODECS[name][0]()
+                parsed = json_codec.loads(document.encode())
+                self.assertEqual(parsed, {'id': 123456789012345678901234567890, 'n': -9999999999999999999})
+                self.assertEqual(json_codec.loads(document), parsed)
+                self.assertEqual(json_codec.dumps(parsed, default=str), document)
+                self.assertEqual(json_codec.dumpb(parsed, sort_keys=True), document.encode())
+
+    def test_sorted_output_matches_the_json_module(self):
+        document = {'b': [1, 2.5, None, True], 'a': {'z': 'ü', 'y': 1}}
+        expected = codec.JSONCodec().dumpb(document, sort_keys=True)
+        for name in self.CODECS:
+            with self.subTest(codec=name):
+                self.assertEqual(codec.CODECS[name][0]().dumpb(document, sort_keys=True), expected)
+
+    def test_unserializable_objects_still_raise(self):
+        for name in self.CODECS:
+            with self.subTest(codec=name), self.assertRaises(TypeError):
+                codec.CODECS[name][0]().dumpb({'a': object()})
+
+    def test_invalid_documents_raise_decode_error(self):
+        for name in self.CODECS:
+            with self.subTest(codec=name), self.assertRaises(codec.DecodeError):
+                codec.CODECS[name][0]().loads(b'{"a": ')
+
+
+class RateLimiterTestMixin:
+    """
+    Behavior shared by the rate limiter backends, on a clock the test controls
+    """
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('core.ratelimit.time', monotonic=lambda: self.now, time=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.limiter = self.get_limiter()
+
+    def acquire(self, rate_limit, at):
+        self.now = 1000.0 + at
+        allowed, retry_after = self.limiter.acquire('api_config:1', parse_rate_limit(rate_limit))
+        return allowed, round(retry_after, 3)
+
+    def test_burst_is_allowed_back_to_back_then_spaced_at_the_sustained_rate(self):
+        results = [self.acquire('10/second burst=5', at=0) for _ in range(6)]
+
+        self.assertEqual(results, [(True, 0.0)] * 5 + [(False, 0.1)])
+        self.assertEqual(self.acquire('10/second burst=5', at=0.1), (True, 0.0))
+        self.assertEqual(self.acquire('10/second burst=5', at=0.1), (False, 0.1))
+
+    def test_sliding_log_allows_the_limit_in_any_window(self):
+        for at in (0, 10, 20):
+            self.assertEqual(self.acquire('3/minute', at=at), (True, 0.0))
+
+        # Until the oldest request leaves the window
+        self.assertEqual(self.acquire('3/minute', at=30), (False, 30.0))
+        self.assertEqual(self.acquire('3/minute', at=60), (True, 0.0))
+        self.assertEqual(self.acquire('3/minute', at=65), (False, 5.0))
+
+    def test_rejected_requests_consume_no_limit(self):
+        self.assertEqual(self.acquire('2/minute;1/second', at=0), (True, 0.0))
+        self.assertEqual(self.acquire('2/minute;1/second', at=0.5), (False, 0.5))
+        self.assertEqual(self.acquire('2/minute;1/second', at=1), (True, 0.0))
+        self.assertEqual(self.acquire('2/minute;1/second', at=2), (False, 58.0))
+
+    def test_reset_forgets_a_key(self):
+        self.acquire('1/hour', at=0)
+        self.limiter.reset('api_config:1')
+
+        self.assertEqual(self.acquire('1/hour', at=1), (True, 0.0))
+
+
+class LocalRateLimiterTests(RateLimiterTestMixin, SimpleTestCase):
+
+    def get_limiter(self):
+        return LocalRateLimiter()
+
+
+@skipUnless(fakeredis, "fakeredis is not installed")
+class RedisRateLimiterTests(RateLimiterTestMixin, SimpleTestCase):
+
+    def get_limiter(self):
+        # Runs the Lua script through fakeredis
+        with mock.patch('redis.Redis.from_url', return_value=fakeredis.FakeRedis()):
+            return RedisRateLimiter('redis://localhost/0')
@@ -0,0 +1,221 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('api_hub.message_receiver.dedup')
+
+
+class BaseDedupFilter:
+    """
+    Front filter of recently received external IDs
+
+    Remembers the ID of the message stored for each (source, external ID)
+    for `window` seconds, so a redelivery is recognized with a lookup by
+    primary key instead of a failed INSERT. It is only a hint: the unique
+    constraint on Message decides what is a duplicate, and IDs the filter
+    forgot (or never saw, e.g. on another worker) are still caught there.
+    """
+
+    def __init__(self, window: float = 3600):
+        """
+        Args:
+            window: Seconds an external ID is remembered
+        """
+        self.window = window
+
+    def get_many(self, source_id: int, external_ids: Iterable[str]) -> Dict[str, int]:
+        """
+        Get the message IDs remembered for external IDs of a source
+
+        Args:
+            source_id: ID of the MessageSource
+            external_ids: External IDs to look up
+
+        Returns:
+            Dict of external ID to message ID, for the remembered ones only
+        """
+        raise NotImplementedError
+
+    def add_many(self, source_id: int, message_ids: Dict[str, int]) -> None:
+        """
+        Remember the messages stored for external IDs of a source
+
+        Args:
+            source_id: ID of the MessageSource
+            message_ids: Dict of external ID to message ID
+        """
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """
+        Forget all external IDs
+        """
+        raise NotImplementedError
+
+    def get(self, source_id: int, external_id: str) -> Optional[int]:
+        return self.get_many(source_id, [external_id]).get(external_id)
+
+    def add(self, source_id: int, external_id: str, message_id: int) -> None:
+        self.add_many(source_id, {external_id: message_id})
+
+    async def aget(self, source_id: int, external_id: str) -> Optional[int]:
+        return await sync_to_async(self.get, thread_sensitive=False)(source_id, external_id)
+
+    async def aadd(self, source_id: int, external_id: str, message_id: int) -> None:
+        await sync_to_async(self.add, thread_sensitive=False)(source_id, external_id, message_id)
+
+
+class LocalDedupFilter(BaseDedupFilter):
+    """
+    In-process LRU of recently received external IDs
+
+    Bounded to `max_entries`; suitable for a single worker process, or as
+    a cheap first line in front of the database with several workers.
+    """
+
+    def __init__(self, window: float = 3600, max_entries: int = 100000):
+        """
+        Args:
+            window: Seconds an external ID is remembered
+            max_entries: Maximum number of external IDs kept
+        """
+        super().__init__(window)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple[int, str], Tuple[int, float]]' = OrderedDict()
+
+    def get_many(self, source_id: int, external_ids: Iterable[str]) -> Dict[str, int]:
+        now = time.monotonic()
+        found = {}
+
+        with self._lock:
+            for external_id in external_ids:
+                key = (source_id, external_id)
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[1] <= now:
+                    del self._entries[key]
+                    continue
+                found[external_id] = entry[0]
+
+        return found
+
+    def add_many(self, source_id: int, message_ids: Dict[str, int]) -> None:
+        expires_at = time.monotonic() + self.window
+
+        with self._lock:
+            for external_id, message_id in message_ids.items():
+                key = (source_id, external_id)
+                self._entries[key] = (message_id, expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    async def aget(self, source_id: int, external_id: str) -> Optional[int]:
+        # No I/O, so no thread needed
+        return self.get(source_id, external_id)
+
+    async def aadd(self, source_id: int, external_id: str, message_id: int) -> None:
+        self.add(source_id, external_id, message_id)
+
+
+class RedisDedupFilter(BaseDedupFilter):
+    """
+    Recently received external IDs shared by all workers through Redis
+
+    Each external ID is a key holding the message ID, expiring after the
+    window. Redis errors are logged and treated as "not seen", leaving
+    deduplication to the database.
+    """
+
+    def __init__(self, window: float = 3600, url: Optional[str] = None, prefix: str = 'api_hub:dedup'):
+        """
+        Args:
+            window: Seconds an external ID is remembered
+            url: Redis URL (defaults to settings.MESSAGE_RECEIVER_DEDUP_REDIS_URL)
+            prefix: Key prefix
+        """
+        import redis
+
+        super().__init__(window)
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(
+            url or getattr(settings, 'MESSAGE_RECEIVER_DEDUP_REDIS_URL', settings.CELERY_BROKER_URL)
+        )
+
+    def _key(self, source_id: int, external_id: str) -> str:
+        return f"{self.prefix}:{source_id}:{external_id}"
+
+    def get_many(self, source_id: int, external_ids: Iterable[str]) -> Dict[str, int]:
+        external_ids = list(external_ids)
+        if not external_ids:
+            return {}
+
+        try:
+            values = self.client.mget([self._key(source_id, external_id) for external_id in external_ids])
+        except Exception as e:
+            logger.exception(f"Error reading the dedup filter: {str(e)}")
+            return {}
+
+        return {
+            external_id: int(value)
+            for external_id, value in zip(external_ids, values)
+            if value is not None
+        }
+
+    def add_many(self, source_id: int, message_ids: Dict[str, int]) -> None:
+        if not message_ids:
+            return
+
+        window_ms = max(1, int(self.window * 1000))
+        try:
+            pipeline = self.client.pipeline(transaction=False)
+            for external_id, message_id in message_ids.items():
+                pipeline.set(self._key(source_id, external_id), message_id, px=window_ms)
+            pipeline.execute()
+        except Exception as e:
+            logger.exception(f"Error writing the dedup filter: {str(e)}")
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(f"{self.prefix}:*"):
+            self.client.delete(key)
+
+
+_dedup_filter: Optional[BaseDedupFilter] = None
+_dedup_filter_lock = threading.Lock()
+
+
+def get_dedup_filter() -> Optional[BaseDedupFilter]:
+    """
+    Get the process-wide dedup front filter
+
+    Returns:
+        Instance of settings.MESSAGE_RECEIVER_DEDUP_BACKEND, or None if
+        duplicates are only detected by the database
+    """
+    global _dedup_filter
+
+    backend = getattr(settings, 'MESSAGE_RECEIVER_DEDUP_BACKEND', 'message_receiver.dedup.LocalDedupFilter')
+    if not backend:
+        return None
+
+    if _dedup_filter is None:
+        with _dedup_filter_lock:
+            if _dedup_filter is None:
+                kwargs = {'window': getattr(settings, 'MESSAGE_RECEIVER_DEDUP_WINDOW', 3600)}
+                if backend.endswith('LocalDedupFilter'):
+                    kwargs['max_entries'] = getattr(settings, 'MESSAGE_RECEIVER_DEDUP_SIZE', 100000)
+                _dedup_filter = import_string(backend)(**kwargs)
+
+    return _dedup_filter
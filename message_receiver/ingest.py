@@ -0,0 +1,493 @@
+import atexit
+import glob
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, connections
+from django.utils.module_loading import import_string
+
+from core import codec
+
+logger = logging.getLogger('api_hub.message_receiver.ingest')
+
+
+class BaseIngestBuffer:
+    """
+    Base class for write-behind buffers of webhook deliveries
+
+    In ack-fast mode the webhook receiver only appends the delivery (path,
+    headers and raw body) to the buffer and answers 202. A daemon thread
+    drains the buffer every `drain_interval` seconds: deliveries are
+    stored as messages in batches and enqueued for processing together.
+    Deliveries are removed from the buffer only after they were stored, so
+    a crash or a database outage delays them but does not lose them; a
+    delivery may be stored twice if the process dies in between. When a
+    batch fails for another reason, its deliveries are stored one by one
+    and those that still fail are moved to a dead letter queue, so a
+    single bad delivery cannot hold up the ones behind it.
+    """
+
+    def __init__(self, drain_interval: float = 0.5, batch_size: int = 1000):
+        """
+        Initialize the buffer
+
+        Args:
+            drain_interval: Seconds between drains
+            batch_size: Maximum deliveries stored per batch
+        """
+        self.drain_interval = drain_interval
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def append(self, path: str, headers: Dict[str, str], body: str) -> None:
+        """
+        Append a webhook delivery
+
+        Args:
+            path: Webhook path
+            headers: Request headers
+            body: Raw request body
+        """
+        self._append(codec.dumpb({'path': path, 'headers': headers, 'body': body}))
+        self._ensure_thread()
+
+    async def aappend(self, path: str, headers: Dict[str, str], body: str) -> None:
+        """
+        Append a webhook delivery without blocking the event loop
+
+        Args:
+            path: Webhook path
+            headers: Request headers
+            body: Raw request body
+        """
+        await sync_to_async(self.append, thread_sensitive=False)(path, headers, body)
+
+    def drain(self) -> int:
+        """
+        Store buffered deliveries as messages
+
+        Returns:
+            Number of deliveries drained
+        """
+        drained = 0
+        with self._drain_lock:
+            while True:
+                batch = self._read(self.batch_size)
+                if not batch:
+                    break
+                ids = [entry_id for entry_id, _ in batch]
+                try:
+                    self._store([record for _, record in batch])
+                except Exception as e:
+                    if _is_transient(e):
+                        logger.exception(f"Error draining webhook buffer, retrying later: {str(e)}")
+                        self._release(ids)
+                        break
+                    logger.warning(f"Error storing {len(batch)} buffered webhooks, storing them one by one: {str(e)}")
+                    if not self._store_each(batch):
+                        break
+                else:
+                    self._ack(ids)
+                drained += len(ids)
+        return drained
+
+    def _store_each(self, batch: List[Tuple[Any, Dict[str, Any]]]) -> bool:
+        """
+        Store the deliveries of a failed batch one by one
+
+        Deliveries that fail on their own are moved to the dead letter
+        queue; a transient error gives the rest of the batch back.
+
+        Returns:
+            False if the rest of the batch was given back
+        """
+        for position, (entry_id, record) in enumerate(batch):
+            try:
+                self._store([record])
+            except Exception as e:
+                if _is_transient(e):
+                    logger.exception(f"Error draining webhook buffer, retrying later: {str(e)}")
+                    self._release([entry_id for entry_id, _ in batch[position:]])
+                    return False
+                logger.exception(f"Moving webhook delivery for {record.get('path')} to the dead letter queue: {str(e)}")
+                self._dead_letter(entry_id, record, str(e))
+                continue
+            self._ack([entry_id])
+        return True
+
+    def _store(self, records: List[Dict[str, Any]]) -> None:
+        from .services import MessageReceiverService
+
+        MessageReceiverService().receive_webhooks(records)
+
+    def _append(self, record: bytes) -> None:
+        raise NotImplementedError
+
+    def _read(self, count: int) -> List[Tuple[Any, Dict[str, Any]]]:
+        """
+        Claim up to `count` buffered deliveries
+
+        Returns:
+            List of (entry ID, record)
+        """
+        raise NotImplementedError
+
+    def _ack(self, ids: List[Any]) -> None:
+        """
+        Remove stored deliveries from the buffer
+        """
+        raise NotImplementedError
+
+    def _release(self, ids: List[Any]) -> None:
+        """
+        Give claimed deliveries back after they could not be stored
+        """
+        raise NotImplementedError
+
+    def _dead_letter(self, entry_id: Any, record: Dict[str, Any], error: str) -> None:
+        """
+        Move a delivery that cannot be stored out of the buffer
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _decode(data: bytes) -> Optional[Dict[str, Any]]:
+        try:
+            return codec.loads(data)
+        except codec.DecodeError:
+            # A record cut short by a crash while it was written
+            logger.error(f"Dropping corrupt webhook buffer record: {data[:200]!r}")
+            return None
+
+    def _ensure_thread(self) -> None:
+        """
+        Start the drain thread (again after a fork)
+        """
+        pid = os.getpid()
+        if self._pid == pid and self._thread and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._pid == pid and self._thread and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._thread = threading.Thread(
+                target=self._run,
+                name='webhook-ingest-drain',
+                daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.drain_interval)
+            try:
+                self.drain()
+            except Exception as e:
+                # E.g. Redis is down; keep the thread alive and try again
+                logger.exception(f"Error draining webhook buffer: {str(e)}")
+            finally:
+                connections.close_all()
+
+
+class FileIngestBuffer(BaseIngestBuffer):
+    """
+    Write-behind buffer in local append-only log files
+
+    Each process appends newline-delimited JSON records to its own
+    segment file. Draining renames the segment so new deliveries go to a
+    fresh one, claims ready segments by renaming them again (segments left
+    by processes that died are claimed too) and deletes a segment once all
+    its deliveries are stored. Appends survive a crash of the process; set
+    `fsync` to have them survive a crash of the host as well. Dead letters
+    are appended to dead-letter.jsonl in the same directory.
+    """
+
+    def __init__(self, directory: Optional[str] = None, fsync: bool = False, **kwargs):
+        """
+        Initialize the buffer
+
+        Args:
+            directory: Directory of the segment files (defaults to settings.MESSAGE_RECEIVER_INGEST_DIR)
+            fsync: Flush every append to disk before acknowledging the webhook
+            **kwargs: Passed to BaseIngestBuffer
+        """
+        super().__init__(**kwargs)
+        self.directory = str(directory or settings.MESSAGE_RECEIVER_INGEST_DIR)
+        self.fsync = fsync
+        self._fd = None
+        self._fd_pid = None
+        self._segment: Optional[str] = None
+        self._batch: List[Tuple[int, Dict[str, Any]]] = []
+        self._pending: List[Tuple[int, Dict[str, Any]]] = []
+        self.dead_letter_path = os.path.join(self.directory, 'dead-letter.jsonl')
+        os.makedirs(self.directory, exist_ok=True)
+
+    async def aappend(self, path: str, headers: Dict[str, str], body: str) -> None:
+        if self.fsync:
+            await super().aappend(path, headers, body)
+        else:
+            # An append to the page cache is cheaper than handing it to a thread
+            self.append(path, headers, body)
+
+    def _append(self, record: bytes) -> None:
+        with self._lock:
+            pid = os.getpid()
+            if self._fd is None or self._fd_pid != pid:
+                self._fd = os.open(
+                    os.path.join(self.directory, f"{pid}.log"),
+                    os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+                    0o600
+                )
+                self._fd_pid = pid
+            os.write(self._fd, record + b'\n')
+            if self.fsync:
+                os.fsync(self._fd)
+
+    def _read(self, count: int) -> List[Tuple[Any, Dict[str, Any]]]:
+        if not self._pending:
+            self._load_segment()
+        self._batch, self._pending = self._pending[:count], self._pending[count:]
+        return self._batch
+
+    def _ack(self, ids: List[Any]) -> None:
+        acked = set(ids)
+        self._batch = [entry for entry in self._batch if entry[0] not in acked]
+        if not self._batch and not self._pending and self._segment is not None:
+            os.unlink(self._segment)
+            self._segment = None
+
+    def _release(self, ids: List[Any]) -> None:
+        # Write back only what was not stored yet, then give the segment up
+        records = [record for _, record in self._batch + self._pending]
+        self._batch, self._pending = [], []
+        if self._segment is None:
+            return
+
+        # Under a new name, so the segments queued behind it are drained first next time
+        base = os.path.join(self.directory, f"{os.getpid()}-{time.time_ns()}")
+        with open(f"{base}.tmp", 'wb') as f:
+            f.writelines(codec.dumpb(record) + b'\n' for record in records)
+        os.rename(f"{base}.tmp", f"{base}.ready")
+        os.unlink(self._segment)
+        self._segment = None
+
+    def _dead_letter(self, entry_id: Any, record: Dict[str, Any], error: str) -> None:
+        with open(self.dead_letter_path, 'ab') as f:
+            f.write(codec.dumpb({'record': record, 'error': error}) + b'\n')
+        self._ack([entry_id])
+
+    def _load_segment(self) -> None:
+        self._rotate()
+
+        for path in sorted(glob.glob(os.path.join(self.directory, '*.ready')), key=_segment_age) + self._orphans():
+            claimed = path.rsplit('.', 1)[0] + f".draining-{os.getpid()}"
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                # Claimed by another process
+                continue
+
+            with open(claimed, 'rb') as f:
+                records = [self._decode(line) for line in f if line.strip()]
+            self._segment = claimed
+            self._pending = [(index, record) for index, record in enumerate(records) if record is not None]
+            if self._pending:
+                return
+            os.unlink(claimed)
+            self._segment = None
+
+    def _rotate(self) -> None:
+        """
+        Close this process's segment so its deliveries can be drained
+        """
+        with self._lock:
+            if self._fd is None or self._fd_pid != os.getpid():
+                return
+            os.close(self._fd)
+            self._fd = None
+            path = os.path.join(self.directory, f"{self._fd_pid}.log")
+            if os.path.exists(path):
+                os.rename(path, os.path.join(self.directory, f"{self._fd_pid}-{time.time_ns()}.ready"))
+
+    def _orphans(self) -> List[str]:
+        """
+        Get segments left by processes that are no longer running
+        """
+        orphans = []
+        for path in glob.glob(os.path.join(self.directory, '*.log')):
+            owner = os.path.basename(path).split('.')[0]
+            if owner.isdigit() and not _is_running(int(owner)):
+                orphans.append(path)
+        for path in glob.glob(os.path.join(self.directory, '*.draining-*')):
+            owner = path.rsplit('-', 1)[1]
+            if owner.isdigit() and int(owner) != os.getpid() and not _is_running(int(owner)):
+                orphans.append(path)
+        return sorted(orphans)
+
+
+class RedisIngestBuffer(BaseIngestBuffer):
+    """
+    Write-behind buffer in a Redis stream
+
+    Deliveries are added with XADD and drained through a consumer group,
+    so any web process can drain deliveries appended by the others.
+    Deliveries claimed by a consumer that did not acknowledge them within
+    `claim_timeout` seconds are claimed again.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        stream: str = 'api_hub:webhooks',
+        group: str = 'message_receiver',
+        claim_timeout: float = 60,
+        dead_letter_stream: Optional[str] = None,
+        **kwargs
+    ):
+        """
+        Initialize the buffer
+
+        Args:
+            url: Redis URL (defaults to settings.MESSAGE_RECEIVER_INGEST_REDIS_URL)
+            stream: Stream key
+            group: Consumer group name
+            claim_timeout: Seconds before deliveries of a stalled consumer are claimed again
+            dead_letter_stream: Stream key for deliveries that cannot be stored (defaults to "<stream>:dead")
+            **kwargs: Passed to BaseIngestBuffer
+        """
+        import redis
+
+        super().__init__(**kwargs)
+        self.stream = stream
+        self.group = group
+        self.claim_timeout = claim_timeout
+        self.dead_letter_stream = dead_letter_stream or f"{stream}:dead"
+        self.client = redis.Redis.from_url(
+            url or getattr(settings, 'MESSAGE_RECEIVER_INGEST_REDIS_URL', settings.CELERY_BROKER_URL)
+        )
+        self._group_created = False
+
+    def _append(self, record: bytes) -> None:
+        self.client.xadd(self.stream, {'record': record})
+
+    def _read(self, count: int) -> List[Tuple[Any, Dict[str, Any]]]:
+        self._ensure_group()
+        consumer = f"{socket.gethostname()}-{os.getpid()}"
+
+        # Deliveries of stalled consumers first
+        _, entries, *_ = self.client.xautoclaim(
+            self.stream,
+            self.group,
+            consumer,
+            min_idle_time=int(self.claim_timeout * 1000),
+            count=count
+        )
+        if not entries:
+            response = self.client.xreadgroup(self.group, consumer, {self.stream: '>'}, count=count)
+            entries = response[0][1] if response else []
+
+        batch = []
+        for entry_id, fields in entries:
+            record = self._decode(fields[b'record']) if fields else None
+            if record is None:
+                self._ack([entry_id])
+                continue
+            batch.append((entry_id, record))
+        return batch
+
+    def _ack(self, ids: List[Any]) -> None:
+        pipe = self.client.pipeline()
+        pipe.xack(self.stream, self.group, *ids)
+        pipe.xdel(self.stream, *ids)
+        pipe.execute()
+
+    def _release(self, ids: List[Any]) -> None:
+        # Unacknowledged deliveries are claimed again after claim_timeout
+        pass
+
+    def _dead_letter(self, entry_id: Any, record: Dict[str, Any], error: str) -> None:
+        pipe = self.client.pipeline()
+        pipe.xadd(self.dead_letter_stream, {'record': codec.dumpb(record), 'error': error})
+        pipe.xack(self.stream, self.group, entry_id)
+        pipe.xdel(self.stream, entry_id)
+        pipe.execute()
+
+    def _ensure_group(self) -> None:
+        if self._group_created:
+            return
+        import redis
+
+        try:
+            self.client.xgroup_create(self.stream, self.group, id='0', mkstream=True)
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        self._group_created = True
+
+
+def _is_transient(error: Exception) -> bool:
+    """
+    Check whether storing deliveries failed because the database is unavailable
+    """
+    return isinstance(error, (OperationalError, InterfaceError))
+
+
+def _segment_age(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        # Claimed by another process meanwhile
+        return 0.0
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_ingest_buffer: Optional[BaseIngestBuffer] = None
+_ingest_buffer_lock = threading.Lock()
+
+
+def get_ingest_buffer() -> Optional[BaseIngestBuffer]:
+    """
+    Get the process-wide webhook ingest buffer
+
+    Returns:
+        Instance of settings.MESSAGE_RECEIVER_INGEST_BACKEND, or None if
+        ack-fast mode is disabled
+    """
+    global _ingest_buffer
+
+    backend = getattr(settings, 'MESSAGE_RECEIVER_INGEST_BACKEND', None)
+    if not backend:
+        return None
+
+    if _ingest_buffer is None:
+        with _ingest_buffer_lock:
+            if _ingest_buffer is None:
+                kwargs = {
+                    'drain_interval': getattr(settings, 'MESSAGE_RECEIVER_INGEST_DRAIN_INTERVAL', 0.5),
+                    'batch_size': getattr(settings, 'MESSAGE_RECEIVER_INGEST_BATCH_SIZE', 1000),
+                }
+                if backend.endswith('FileIngestBuffer'):
+                    kwargs['fsync'] = getattr(settings, 'MESSAGE_RECEIVER_INGEST_FSYNC', False)
+                _ingest_buffer = import_string(backend)(**kwargs)
+                atexit.register(_ingest_buffer.drain)
+
+    return _ingest_buffer
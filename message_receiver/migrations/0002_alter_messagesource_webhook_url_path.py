@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('message_receiver', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='messagesource',
+            name='webhook_url_path',
+            field=models.CharField(blank=True, db_index=True, help_text='Path for the webhook endpoint (e.g., sentry-webhook)', max_length=100, null=True, verbose_name='Webhook URL Path'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:32
+
+import logging
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+logger = logging.getLogger('api_hub.message_receiver.migrations')
+
+# Prepended to the status message of messages whose external ID was cleared
+DUPLICATE_NOTE = "Duplicate external ID cleared by migration 0003: "
+
+
+def clear_duplicate_external_ids(apps, schema_editor):
+    """
+    Keep the external ID on the oldest message of each duplicate group only,
+    so the unique constraint can be added
+
+    The cleared IDs are kept in the first line of the messages' status
+    message (and logged), so the migration can be reversed.
+    """
+    Message = apps.get_model('message_receiver', 'Message')
+    duplicates = (
+        Message.objects.exclude(external_id__isnull=True).exclude(external_id='')
+        .values('source_id', 'external_id')
+        .annotate(count=Count('id'), first_id=Min('id'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        messages = list(Message.objects.filter(
+            source_id=duplicate['source_id'],
+            external_id=duplicate['external_id']
+        ).exclude(id=duplicate['first_id']))
+
+        logger.warning(
+            f"Clearing external ID {duplicate['external_id']!r} of messages {[message.id for message in messages]}, "
+            f"duplicates of message {duplicate['first_id']} from source {duplicate['source_id']}"
+        )
+        for message in messages:
+            note = f"{DUPLICATE_NOTE}{message.external_id}"
+            message.status_message = f"{note}\n{message.status_message}" if message.status_message else note
+            message.external_id = None
+            message.save(update_fields=['external_id', 'status_message'])
+
+
+def restore_duplicate_external_ids(apps, schema_editor):
+    """
+    Give the messages cleared by clear_duplicate_external_ids their external ID back
+    """
+    Message = apps.get_model('message_receiver', 'Message')
+    for message in Message.objects.filter(status_message__startswith=DUPLICATE_NOTE):
+        note, _, status_message = message.status_message.partition('\n')
+        message.external_id = note[len(DUPLICATE_NOTE):]
+        message.status_message = status_message or None
+        message.save(update_fields=['external_id', 'status_message'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('message_receiver', '0002_alter_messagesource_webhook_url_path'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_external_ids, restore_duplicate_external_ids),
+        migrations.AddConstraint(
+            model_name='message',
+            constraint=models.UniqueConstraint(condition=models.Q(('external_id__isnull', False), models.Q(('external_id', ''), _negated=True)), fields=('source', 'external_id'), name='unique_message_source_external_id'),
+        ),
+    ]
@@ -1,6 +1,9 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from .extractors import compile_external_id_extractor
+
 class MessageSource(models.Model):
     """
     Model to define different sources of messages (Sentry, WhatsApp, etc.)
@@ -23,7 +26,7 @@ class MessageSource(models.Model):
                             help_text=_('Source-specific configuration'))
     
     # Webhook specific
-    webhook_url_path = models.CharField(_('Webhook URL Path'), max_length=100, blank=True, null=True,
+    webhook_url_path = models.CharField(_('Webhook URL Path'), max_length=100, blank=True, null=True, db_index=True,
                                       help_text=_('Path for the webhook endpoint (e.g., sentry-webhook)'))
     webhook_secret = models.CharField(_('Webhook Secret'), max_length=255, blank=True, null=True)
     
@@ -41,6 +44,15 @@ class MessageSource(models.Model):
     
     def __str__(self):
         return f"{self.name} ({self.get_source_type_display()})"
+    
+    def clean(self):
+        super().clean()
+        
+        if isinstance(self.config, dict) and 'external_id_path' in self.config:
+            try:
+                compile_external_id_extractor(self.source_type, self.config['external_id_path'])
+            except ValueError as e:
+                raise ValidationError({'config': str(e)})
 
 
 class Message(models.Model):
@@ -81,6 +93,9 @@ class Message(models.Model):
                                               help_text=_('Higher number means higher priority'))
     processed_at = models.DateTimeField(_('Processed At'), blank=True, null=True)
     
+    # Set on the existing message returned for a redelivered external ID (not stored)
+    duplicate = False
+    
     class Meta:
         verbose_name = _('Message')
         verbose_name_plural = _('Messages')
@@ -89,6 +104,14 @@ class Message(models.Model):
             models.Index(fields=['external_id']),
             models.Index(fields=['received_at']),
         ]
+        constraints = [
+            # Sources redeliver webhooks; each external ID is stored once per source
+            models.UniqueConstraint(
+                fields=['source', 'external_id'],
+                condition=models.Q(external_id__isnull=False) & ~models.Q(external_id=''),
+                name='unique_message_source_external_id'
+            ),
+        ]
     
     def __str__(self):
         return f"Message {self.id} from {self.source.name} ({self.status})"
@@ -0,0 +1,231 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from django.conf import settings
+
+from core.db import database_sync_to_async
+from .extractors import ExternalIdExtractor, compile_external_id_extractor
+from .models import MessageSource
+
+logger = logging.getLogger('api_hub.message_receiver.routing')
+
+
+class SourceRoute:
+    """
+    Everything a webhook hit needs to know about its message source
+
+    Built once per routing table, so handling a webhook needs no query for
+    the source itself.
+    """
+
+    __slots__ = ('source', 'path', 'prompt_template_id', 'webhook_secret', 'extract_external_id')
+
+    def __init__(self, source: MessageSource):
+        """
+        Build the route for a source
+
+        Args:
+            source: Active MessageSource with a webhook path
+        """
+        config = source.config or {}
+
+        self.source = source
+        self.path = source.webhook_url_path
+        self.prompt_template_id = config.get('prompt_template_id')
+        self.webhook_secret = source.webhook_secret or None
+        self.extract_external_id = self._compile_extractor(source, config)
+
+    @staticmethod
+    def _compile_extractor(source: MessageSource, config: dict) -> ExternalIdExtractor:
+        try:
+            return compile_external_id_extractor(source.source_type, config.get('external_id_path'))
+        except ValueError as e:
+            logger.warning(f"Ignoring external_id_path of message source {source.name}: {str(e)}")
+            return compile_external_id_extractor(source.source_type)
+
+
+class WebhookRouter:
+    """
+    In-memory routing table of active webhook paths
+
+    The table is loaded with a single query and resolving a path is a dict
+    lookup. Changes made through the ORM invalidate it via signals; to
+    reach other workers, invalidation bumps a version stamp in Redis which
+    each worker checks at most every `check_interval` seconds. Without
+    Redis (or when it is unreachable) the table is reloaded after `ttl`
+    seconds, which also covers changes that bypass signals such as
+    queryset updates.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 300,
+        redis_url: Optional[str] = None,
+        check_interval: float = 1.0,
+        prefix: str = 'api_hub:webhook_routes',
+        redis_timeout: float = 0.25
+    ):
+        """
+        Initialize the router
+
+        Args:
+            ttl: Maximum age of the routing table in seconds (0 = until invalidated)
+            redis_url: Redis URL for the shared version stamp (None = per process)
+            check_interval: Seconds between version stamp checks
+            prefix: Redis key prefix
+            redis_timeout: Connect and read timeout of Redis calls in seconds; they
+                are made on the request path, so an unreachable Redis must fail fast
+        """
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.version_key = f"{prefix}:version"
+        self._lock = threading.Lock()
+        self._routes: Optional[Dict[str, SourceRoute]] = None
+        self._built_at = 0.0
+        self._version: Optional[bytes] = None
+        self._checked_at = 0.0
+
+        self.client = None
+        if redis_url:
+            import redis
+
+            self.client = redis.Redis.from_url(
+                redis_url,
+                socket_timeout=redis_timeout,
+                socket_connect_timeout=redis_timeout
+            )
+
+    def resolve(self, path: str) -> Optional[SourceRoute]:
+        """
+        Get the route for a webhook path
+
+        Args:
+            path: Webhook path
+
+        Returns:
+            SourceRoute object, or None if no active source uses the path
+        """
+        return self._get_routes().get(path)
+
+    async def aresolve(self, path: str) -> Optional[SourceRoute]:
+        """
+        Get the route for a webhook path without blocking the event loop
+
+        The lookup happens in the event loop while the table is current;
+        only reloading it and checking the version stamp go to a thread.
+
+        Args:
+            path: Webhook path
+
+        Returns:
+            SourceRoute object, or None if no active source uses the path
+        """
+        routes = self._routes
+        if routes is not None and not self._is_due():
+            return routes.get(path)
+        return await database_sync_to_async(self.resolve)(path)
+
+    def invalidate(self) -> None:
+        """
+        Drop the routing table in this process and tell the other workers
+        """
+        with self._lock:
+            self._routes = None
+
+        if self.client is not None:
+            try:
+                self.client.incr(self.version_key)
+            except Exception as e:
+                logger.exception(f"Error bumping webhook routing version: {str(e)}")
+
+    def _get_routes(self) -> Dict[str, SourceRoute]:
+        routes = self._routes
+        if routes is not None and not self._is_expired():
+            return routes
+
+        with self._lock:
+            # Another thread may have rebuilt the table meanwhile
+            if self._routes is None or self._routes is routes:
+                self._build()
+            return self._routes
+
+    def _is_due(self) -> bool:
+        """
+        Check whether the table has to be reloaded or its version checked
+        """
+        now = time.monotonic()
+        if self.ttl and now - self._built_at > self.ttl:
+            return True
+        return self.client is not None and now - self._checked_at >= self.check_interval
+
+    def _is_expired(self) -> bool:
+        if not self._is_due():
+            return False
+
+        now = time.monotonic()
+        if self.ttl and now - self._built_at > self.ttl:
+            return True
+
+        self._checked_at = now
+        return self._read_version() != self._version
+
+    def _build(self) -> None:
+        # Read the version first, so changes made while loading trigger another rebuild
+        version = self._read_version()
+
+        routes = {}
+        sources = MessageSource.objects.filter(
+            is_active=True,
+            webhook_url_path__isnull=False
+        ).exclude(webhook_url_path='').order_by('pk')
+        for source in sources:
+            if source.webhook_url_path in routes:
+                logger.warning(
+                    f"Webhook path {source.webhook_url_path} is used by several active sources, "
+                    f"routing it to {routes[source.webhook_url_path].source.name}"
+                )
+                continue
+            routes[source.webhook_url_path] = SourceRoute(source)
+
+        self._routes = routes
+        self._version = version
+        self._built_at = self._checked_at = time.monotonic()
+        logger.debug(f"Built webhook routing table with {len(routes)} routes")
+
+    def _read_version(self) -> Optional[bytes]:
+        if self.client is None:
+            return None
+        try:
+            return self.client.get(self.version_key)
+        except Exception as e:
+            logger.exception(f"Error reading webhook routing version: {str(e)}")
+            # Keep the current table, the TTL still bounds its age
+            return self._version
+
+
+_webhook_router: Optional[WebhookRouter] = None
+_webhook_router_lock = threading.Lock()
+
+
+def get_webhook_router() -> WebhookRouter:
+    """
+    Get the process-wide webhook routing table
+
+    Returns:
+        WebhookRouter configured from settings
+    """
+    global _webhook_router
+
+    if _webhook_router is None:
+        with _webhook_router_lock:
+            if _webhook_router is None:
+                _webhook_router = WebhookRouter(
+                    ttl=getattr(settings, 'MESSAGE_RECEIVER_ROUTES_TTL', 300),
+                    redis_url=getattr(settings, 'MESSAGE_RECEIVER_ROUTES_REDIS_URL', None),
+                    check_interval=getattr(settings, 'MESSAGE_RECEIVER_ROUTES_CHECK_INTERVAL', 1.0),
+                    redis_timeout=getattr(settings, 'MESSAGE_RECEIVER_ROUTES_REDIS_TIMEOUT', 0.25)
+                )
+
+    return _webhook_router
@@ -1,16 +1,19 @@
-import json
 import logging
 import time
-from typing import Dict, Any, Optional, Union, List
+from typing import Dict, Any, Iterable, Optional, Union, List, Tuple
 
+from asgiref.sync import sync_to_async
 from django.utils import timezone
 from django.conf import settings
-from django.db import transaction
+from django.db import IntegrityError, transaction
 
+from core import codec
 from core.models import ErrorLog
 from openai_processor.models import PromptTemplate
 from openai_processor.services import OpenAIService
+from .dedup import get_dedup_filter
 from .models import MessageSource, Message, ProcessedMessage
+from .routing import get_webhook_router
 
 logger = logging.getLogger('api_hub.message_receiver')
 
@@ -23,7 +26,16 @@ class MessageReceiverService:
         """
         Initialize the message receiver service
         """
-        self.openai_service = OpenAIService()
+        self._openai_service = None
+    
+    @property
+    def openai_service(self) -> OpenAIService:
+        """
+        OpenAI service, created on first use since receiving messages does not need it
+        """
+        if self._openai_service is None:
+            self._openai_service = OpenAIService()
+        return self._openai_service
     
     def receive_message(
         self, 
@@ -35,6 +47,10 @@ class MessageReceiverService:
         """
         Receive a message from a source
         
+        A message with an external ID that was already received from the
+        source is not stored again; the existing message is returned with
+        `duplicate` set instead.
+        
         Args:
             source: MessageSource object
             content: Message content
@@ -42,26 +58,35 @@ class MessageReceiverService:
             priority: Priority for processing (higher = higher priority)
             
         Returns:
-            Created Message object
+            Created Message object, or the existing one for a redelivery
         """
         try:
             # Convert content to JSON-serializable format if needed
-            if isinstance(content, str):
-                try:
-                    # Try to parse as JSON
-                    content = json.loads(content)
-                except json.JSONDecodeError:
-                    # If not valid JSON, store as text
-                    content = {'text': content}
+            content = self._parse_content(content)
+            external_id = self._normalize_external_id(external_id)
+            
+            # Redeliveries remembered by the dedup filter need no INSERT
+            if external_id:
+                duplicate = self._find_duplicates(source, [external_id]).get(external_id)
+                if duplicate is not None:
+                    logger.info(f"Message {external_id} from {source.name} was already received as message {duplicate.id}")
+                    return duplicate
             
             # Create the message
-            message = Message.objects.create(
-                source=source,
-                content=content,
-                external_id=external_id,
-                priority=priority,
-                status='received'
-            )
+            try:
+                message = self._create_message(source, content, external_id, priority)
+            except IntegrityError:
+                # The unique constraint caught a redelivery the dedup filter did not know about
+                if not external_id:
+                    raise
+                duplicate = self._find_duplicates(source, [external_id], check_database=True).get(external_id)
+                if duplicate is None:
+                    raise
+                logger.info(f"Message {external_id} from {source.name} was already received as message {duplicate.id}")
+                return duplicate
+            
+            if external_id:
+                self._remember(source, [message])
             
             logger.info(f"Received message {message.id} from {source.name}")
             
@@ -88,6 +113,216 @@ class MessageReceiverService:
             # Re-raise the exception
             raise
     
+    async def areceive_message(
+        self,
+        source: MessageSource,
+        content: Union[Dict[str, Any], str, List[Any]],
+        external_id: Optional[str] = None,
+        priority: int = 0
+    ) -> Message:
+        """
+        Receive a message from a source without blocking the event loop
+        
+        Same as receive_message, using the async ORM.
+        
+        Args:
+            source: MessageSource object
+            content: Message content
+            external_id: External ID for the message
+            priority: Priority for processing (higher = higher priority)
+            
+        Returns:
+            Created Message object, or the existing one for a redelivery
+        """
+        try:
+            # Convert content to JSON-serializable format if needed
+            content = self._parse_content(content)
+            external_id = self._normalize_external_id(external_id)
+            
+            # Redeliveries remembered by the dedup filter need no INSERT
+            if external_id:
+                duplicate = await self._afind_duplicate(source, external_id)
+                if duplicate is not None:
+                    logger.info(f"Message {external_id} from {source.name} was already received as message {duplicate.id}")
+                    return duplicate
+            
+            # Create the message
+            try:
+                message = await sync_to_async(self._create_message)(source, content, external_id, priority)
+            except IntegrityError:
+                # The unique constraint caught a redelivery the dedup filter did not know about
+                if not external_id:
+                    raise
+                duplicate = await self._afind_duplicate(source, external_id, check_database=True)
+                if duplicate is None:
+                    raise
+                logger.info(f"Message {external_id} from {source.name} was already received as message {duplicate.id}")
+                return duplicate
+            
+            dedup = get_dedup_filter()
+            if external_id and dedup is not None:
+                await dedup.aadd(source.pk, external_id, message.pk)
+            
+            logger.info(f"Received message {message.id} from {source.name}")
+            
+            return message
+            
+        except Exception as e:
+            # Log the error
+            logger.exception(f"Error receiving message from {source.name}: {str(e)}")
+            
+            # Create error log
+            await ErrorLog.objects.acreate(
+                level='error',
+                message=f"Error receiving message from {source.name}: {str(e)}",
+                component='message_receiver',
+                context={
+                    'source_id': source.id,
+                    'content': str(content)[:1000],  # Truncate to avoid huge logs
+                    'external_id': external_id
+                },
+                related_object_type='MessageSource',
+                related_object_id=str(source.id)
+            )
+            
+            # Re-raise the exception
+            raise
+    
+    async def aqueue_message(self, message: Message) -> Optional[ProcessedMessage]:
+        """
+        Queue a received message for processing without blocking the event loop
+        
+        Args:
+            message: Message to process
+            
+        Returns:
+            ProcessedMessage if the message was processed synchronously
+            because Celery is not configured, otherwise None
+        """
+        # Redeliveries were queued when first received
+        if message.duplicate:
+            return None
+        
+        if hasattr(settings, 'CELERY_BROKER_URL') and settings.CELERY_BROKER_URL:
+            from .tasks import process_message_task
+            # Publishing to the broker is blocking I/O
+            await sync_to_async(process_message_task.delay, thread_sensitive=False)(message.id)
+            return None
+        
+        # Process synchronously
+        return await sync_to_async(self.process_message)(message)
+    
+    def receive_messages(
+        self,
+        source: MessageSource,
+        items: List[Dict[str, Any]]
+    ) -> List[Message]:
+        """
+        Receive a batch of messages from a source
+        
+        The messages are inserted with bulk_create in a single transaction,
+        so either the whole batch is stored or none of it. Items with an
+        external ID that was already received from the source, or that
+        repeat an earlier item of the batch, are not stored again.
+        
+        Args:
+            source: MessageSource object
+            items: Dicts with 'content' and optionally 'external_id' and 'priority'
+            
+        Returns:
+            Message objects, in the order of the items: the created ones,
+            the existing ones (with `duplicate` set) for redeliveries, and
+            the same object again for repeats within the batch
+        """
+        try:
+            messages = [
+                Message(
+                    source=source,
+                    content=self._parse_content(item['content']),
+                    external_id=self._normalize_external_id(item.get('external_id')),
+                    priority=item.get('priority') or 0,
+                    status='received'
+                )
+                for item in items
+            ]
+            batch_size = getattr(settings, 'MESSAGE_RECEIVER_BULK_CREATE_SIZE', 1000)
+            external_ids = {message.external_id for message in messages if message.external_id}
+            
+            # Redeliveries remembered by the dedup filter need no INSERT
+            existing = self._find_duplicates(source, external_ids)
+            pending, messages = self._split_duplicates(messages, existing)
+            
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        Message.objects.bulk_create(pending, batch_size=batch_size)
+                except IntegrityError:
+                    # The unique constraint caught redeliveries the dedup filter did not know about
+                    existing = self._find_duplicates(source, external_ids, check_database=True)
+                    pending, messages = self._split_duplicates(messages, existing)
+                    Message.objects.bulk_create(pending, batch_size=batch_size)
+            
+            self._remember(source, pending)
+            
+            if len(pending) < len(messages):
+                logger.info(
+                    f"Received {len(pending)} messages from {source.name}, "
+                    f"ignored {len(messages) - len(pending)} already received"
+                )
+            else:
+                logger.info(f"Received {len(messages)} messages from {source.name}")
+            
+            return messages
+            
+        except Exception as e:
+            # Log the error
+            logger.exception(f"Error receiving message batch from {source.name}: {str(e)}")
+            
+            # Create error log
+            ErrorLog.objects.create(
+                level='error',
+                message=f"Error receiving message batch from {source.name}: {str(e)}",
+                component='message_receiver',
+                context={
+                    'source_id': source.id,
+                    'count': len(items),
+                    'content': str(items[:3])[:1000]  # Truncate to avoid huge logs
+                },
+                related_object_type='MessageSource',
+                related_object_id=str(source.id)
+            )
+            
+            # Re-raise the exception
+            raise
+    
+    def queue_messages(self, messages: List[Message]) -> None:
+        """
+        Queue received messages for processing
+        
+        With Celery configured, the messages are enqueued as a single group;
+        otherwise they are processed synchronously, one after another.
+        Redeliveries returned by receive_messages are skipped.
+        
+        Args:
+            messages: Messages to process
+        """
+        # Redeliveries were queued when first received; repeats within a batch are queued once
+        messages = list({message.pk: message for message in messages if not message.duplicate}.values())
+        if not messages:
+            return
+        
+        if hasattr(settings, 'CELERY_BROKER_URL') and settings.CELERY_BROKER_URL:
+            from celery import group
+            from .tasks import process_message_task
+            group(process_message_task.s(message.id) for message in messages).apply_async()
+        else:
+            for message in messages:
+                try:
+                    self.process_message(message)
+                except Exception:
+                    # Already logged, the message is marked as failed
+                    pass
+    
     def process_message(self, message: Message) -> ProcessedMessage:
         """
         Process a message using OpenAI
@@ -170,17 +405,14 @@ class MessageReceiverService:
         """
         try:
             # Find the message source for this webhook
-            try:
-                source = MessageSource.objects.get(
-                    webhook_url_path=webhook_path,
-                    is_active=True
-                )
-            except MessageSource.DoesNotExist:
+            route = get_webhook_router().resolve(webhook_path)
+            if route is None:
                 logger.warning(f"No active message source found for webhook path: {webhook_path}")
                 return None
+            source = route.source
             
             # Extract external ID from headers or content
-            external_id = self._extract_external_id(source, content, headers)
+            external_id = route.extract_external_id(content, headers)
             
             # Receive the message
             message = self.receive_message(
@@ -189,6 +421,10 @@ class MessageReceiverService:
                 external_id=external_id
             )
             
+            # Redeliveries were queued when first received
+            if message.duplicate:
+                return message
+            
             # Process the message asynchronously if Celery is configured
             if hasattr(settings, 'CELERY_BROKER_URL') and settings.CELERY_BROKER_URL:
                 from .tasks import process_message_task
@@ -218,6 +454,340 @@ class MessageReceiverService:
             # Re-raise the exception
             raise
     
+    async def aprocess_webhook(
+        self,
+        webhook_path: str,
+        content: Union[Dict[str, Any], str, List[Any]],
+        headers: Optional[Dict[str, str]] = None
+    ) -> Optional[Message]:
+        """
+        Process a webhook request without blocking the event loop
+        
+        Same as process_webhook, for the async webhook view.
+        
+        Args:
+            webhook_path: Path of the webhook
+            content: Webhook content
+            headers: Request headers
+            
+        Returns:
+            Created Message object or None if no matching source
+        """
+        try:
+            # Find the message source for this webhook
+            route = await get_webhook_router().aresolve(webhook_path)
+            if route is None:
+                logger.warning(f"No active message source found for webhook path: {webhook_path}")
+                return None
+            source = route.source
+            
+            # Extract external ID from headers or content
+            external_id = route.extract_external_id(content, headers)
+            
+            # Receive the message and process it asynchronously if Celery is configured
+            message = await self.areceive_message(
+                source=source,
+                content=content,
+                external_id=external_id
+            )
+            await self.aqueue_message(message)
+            
+            return message
+            
+        except Exception as e:
+            # Log the error
+            logger.exception(f"Error processing webhook {webhook_path}: {str(e)}")
+            
+            # Create error log
+            await ErrorLog.objects.acreate(
+                level='error',
+                message=f"Error processing webhook {webhook_path}: {str(e)}",
+                component='message_receiver',
+                context={
+                    'webhook_path': webhook_path,
+                    'content': str(content)[:1000],  # Truncate to avoid huge logs
+                    'headers': headers
+                }
+            )
+            
+            # Re-raise the exception
+            raise
+    
+    def process_webhook_batch(
+        self,
+        webhook_path: str,
+        contents: List[Any],
+        headers: Optional[Dict[str, str]] = None
+    ) -> Optional[List[Message]]:
+        """
+        Process a batch of webhook payloads
+        
+        Each payload becomes a message, as if it had been sent to the
+        webhook on its own; the messages are stored in one transaction and
+        queued for processing together. External IDs are only taken from
+        the payloads, since header candidates would give every payload
+        the ID of the batch request.
+        
+        Args:
+            webhook_path: Path of the webhook
+            contents: Webhook payloads
+            headers: Request headers
+            
+        Returns:
+            Created Message objects or None if no matching source
+        """
+        try:
+            # Find the message source for this webhook
+            route = get_webhook_router().resolve(webhook_path)
+            if route is None:
+                logger.warning(f"No active message source found for webhook path: {webhook_path}")
+                return None
+            source = route.source
+            
+            items = []
+            for content in contents:
+                content = self._parse_content(content)
+                items.append({
+                    'content': content,
+                    # The request headers belong to the whole batch, not to any one payload
+                    'external_id': route.extract_external_id(content)
+                })
+            
+            # Receive the messages and queue them for processing
+            messages = self.receive_messages(source, items)
+            self.queue_messages(messages)
+            
+            return messages
+            
+        except Exception as e:
+            # Log the error
+            logger.exception(f"Error processing webhook batch {webhook_path}: {str(e)}")
+            
+            # Create error log
+            ErrorLog.objects.create(
+                level='error',
+                message=f"Error processing webhook batch {webhook_path}: {str(e)}",
+                component='message_receiver',
+                context={
+                    'webhook_path': webhook_path,
+                    'count': len(contents),
+                    'content': str(contents[:3])[:1000],  # Truncate to avoid huge logs
+                    'headers': headers
+                }
+            )
+            
+            # Re-raise the exception
+            raise
+    
+    def receive_webhooks(self, records: List[Dict[str, Any]]) -> List[Message]:
+        """
+        Store webhook deliveries buffered in ack-fast mode and queue them for processing
+        
+        Deliveries are routed like process_webhook does and stored in one
+        transaction; deliveries for paths that no longer have an active
+        source are dropped.
+        
+        Args:
+            records: Dicts with the webhook 'path', request 'headers' and raw 'body'
+            
+        Returns:
+            Message objects as returned by receive_messages
+        """
+        router = get_webhook_router()
+        batches = {}
+        
+        for record in records:
+            route = router.resolve(record['path'])
+            if route is None:
+                logger.warning(f"No active message source found for webhook path: {record['path']}, dropping delivery")
+                continue
+            
+            content = self._parse_content(record['body'])
+            batches.setdefault(route.source.pk, (route.source, []))[1].append({
+                'content': content,
+                'external_id': route.extract_external_id(content, record.get('headers'))
+            })
+        
+        messages = []
+        with transaction.atomic():
+            for source, items in batches.values():
+                messages.extend(self.receive_messages(source, items))
+        
+        try:
+            self.queue_messages(messages)
+        except Exception as e:
+            # The messages are stored; process_pending_messages picks them up later
+            logger.exception(f"Error queueing {len(messages)} webhook messages: {str(e)}")
+        
+        return messages
+    
+    def _find_duplicates(
+        self,
+        source: MessageSource,
+        external_ids: Union[List[str], set],
+        check_database: bool = False
+    ) -> Dict[str, Message]:
+        """
+        Find the messages already stored for external IDs of a source
+        
+        Args:
+            source: MessageSource object
+            external_ids: External IDs to look up
+            check_database: Look up every external ID, not only the ones the dedup filter remembers
+            
+        Returns:
+            Dict of external ID to the existing Message (with `duplicate` set)
+        """
+        dedup = get_dedup_filter()
+        if check_database:
+            lookup = list(external_ids)
+        elif dedup is not None and external_ids:
+            lookup = list(dedup.get_many(source.pk, external_ids))
+        else:
+            lookup = []
+        
+        found = {}
+        batch_size = getattr(settings, 'MESSAGE_RECEIVER_BULK_CREATE_SIZE', 1000)
+        for start in range(0, len(lookup), batch_size):
+            for message in Message.objects.filter(source=source, external_id__in=lookup[start:start + batch_size]):
+                message.duplicate = True
+                found[message.external_id] = message
+        
+        # Remember what only the database knew, so the next redelivery is caught earlier
+        if check_database and found:
+            self._remember(source, found.values())
+        
+        return found
+    
+    async def _afind_duplicate(
+        self,
+        source: MessageSource,
+        external_id: str,
+        check_database: bool = False
+    ) -> Optional[Message]:
+        """
+        Find the message already stored for an external ID without blocking the event loop
+        
+        Args:
+            source: MessageSource object
+            external_id: External ID to look up
+            check_database: Look the external ID up even if the dedup filter does not remember it
+            
+        Returns:
+            The existing Message (with `duplicate` set) or None
+        """
+        dedup = get_dedup_filter()
+        remembered = dedup is not None and await dedup.aget(source.pk, external_id) is not None
+        if not (remembered or check_database):
+            return None
+        
+        message = await Message.objects.filter(source=source, external_id=external_id).afirst()
+        if message is None:
+            return None
+        message.duplicate = True
+        
+        if not remembered and dedup is not None:
+            await dedup.aadd(source.pk, external_id, message.pk)
+        
+        return message
+    
+    def _split_duplicates(
+        self,
+        messages: List[Message],
+        existing: Dict[str, Message]
+    ) -> Tuple[List[Message], List[Message]]:
+        """
+        Separate the messages to store from redeliveries and repeats within a batch
+        
+        Args:
+            messages: Messages of the batch, in order
+            existing: Dict of external ID to the Message already stored for it
+            
+        Returns:
+            Tuple of (messages to store, messages of the batch with
+            redeliveries and repeats replaced by the message they duplicate)
+        """
+        pending = []
+        result = []
+        first = {}
+        
+        for message in messages:
+            external_id = message.external_id
+            if external_id:
+                duplicate = existing.get(external_id) or first.get(external_id)
+                if duplicate is not None:
+                    result.append(duplicate)
+                    continue
+                first[external_id] = message
+            pending.append(message)
+            result.append(message)
+        
+        return pending, result
+    
+    def _remember(self, source: MessageSource, messages: Iterable[Message]) -> None:
+        """
+        Add stored messages with an external ID to the dedup filter
+        """
+        dedup = get_dedup_filter()
+        if dedup is not None:
+            dedup.add_many(source.pk, {message.external_id: message.pk for message in messages if message.external_id})
+    
+    def _create_message(
+        self,
+        source: MessageSource,
+        content: Union[Dict[str, Any], List[Any]],
+        external_id: Optional[str],
+        priority: int
+    ) -> Message:
+        """
+        Insert a received message
+        
+        The INSERT runs in a savepoint, so a duplicate external ID rejected
+        by the unique constraint does not break an enclosing transaction.
+        
+        Raises:
+            IntegrityError: If the external ID was already received from the source
+        """
+        with transaction.atomic():
+            return Message.objects.create(
+                source=source,
+                content=content,
+                external_id=external_id,
+                priority=priority,
+                status='received'
+            )
+    
+    @staticmethod
+    def _normalize_external_id(external_id: Any) -> Optional[str]:
+        """
+        Convert an external ID to the string stored in the database
+        
+        API clients may send numeric IDs; deduplication compares them with
+        the stored strings.
+        """
+        if external_id is None:
+            return None
+        return str(external_id)
+    
+    def _parse_content(self, content: Union[Dict[str, Any], str, List[Any]]) -> Union[Dict[str, Any], List[Any]]:
+        """
+        Convert message content to a JSON-serializable format
+        
+        Args:
+            content: Message content
+            
+        Returns:
+            Parsed content; strings that are not valid JSON are stored as {'text': ...}
+        """
+        if isinstance(content, str):
+            try:
+                # Try to parse as JSON
+                return codec.loads(content)
+            except codec.DecodeError:
+                # If not valid JSON, store as text
+                return {'text': content}
+        return content
+    
     def _get_prompt_template(self, source: MessageSource) -> PromptTemplate:
         """
         Get the prompt template for a message source
@@ -268,79 +838,3 @@ class MessageReceiverService:
                 model=settings.OPENAI_MODEL,
                 function_calling_enabled=True
             )
-    
-    def _extract_external_id(
-        self, 
-        source: MessageSource, 
-        content: Union[Dict[str, Any], str, List[Any]],
-        headers: Optional[Dict[str, str]] = None
-    ) -> Optional[str]:
-        """
-        Extract external ID from message content or headers
-        
-        Args:
-            source: MessageSource object
-            content: Message content
-            headers: Request headers
-            
-        Returns:
-            Extracted external ID or None
-        """
-        # Check source config for external ID path
-        if source.config and 'external_id_path' in source.config:
-            path = source.config['external_id_path']
-            
-            # Check if path is in headers
-            if path.startswith('header:') and headers:
-                header_name = path.split(':', 1)[1]
-                if header_name in headers:
-                    return headers[header_name]
-            
-            # Check if path is in content
-            if isinstance(content, dict):
-                # Handle dot notation (e.g., "data.id")
-                if '.' in path:
-                    parts = path.split('.')
-                    value = content
-                    for part in parts:
-                        if isinstance(value, dict) and part in value:
-                            value = value[part]
-                        else:
-                            value = None
-                            break
-                    if value:
-                        return str(value)
-                # Simple key
-                elif path in content:
-                    return str(content[path])
-        
-        # Source-specific extractors
-        if source.source_type == 'sentry':
-            # Try to extract Sentry event ID
-            if isinstance(content, dict):
-                if 'event_id' in content:
-                    return content['event_id']
-                if 'id' in content:
-                    return content['id']
-                if 'event' in content and isinstance(content['event'], dict):
-                    if 'event_id' in content['event']:
-                        return content['event']['event_id']
-                    if 'id' in content['event']:
-                        return content['event']['id']
-        
-        elif source.source_type == 'whatsapp':
-            # Try to extract WhatsApp message ID
-            if isinstance(content, dict):
-                if 'entry' in content and isinstance(content['entry'], list):
-                    for entry in content['entry']:
-                        if isinstance(entry, dict) and 'changes' in entry and isinstance(entry['changes'], list):
-                            for change in entry['changes']:
-                                if isinstance(change, dict) and 'value' in change and isinstance(change['value'], dict):
-                                    value = change['value']
-                                    if 'messages' in value and isinstance(value['messages'], list):
-                                        for message in value['messages']:
-                                            if isinstance(message, dict) and 'id' in message:
-                                                return message['id']
-        
-        # Fallback: None
-        return None
@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import MessageSource
+from .routing import get_webhook_router
+
+
+@receiver(post_save, sender=MessageSource)
+@receiver(post_delete, sender=MessageSource)
+def invalidate_webhook_routes(sender, **kwargs):
+    """
+    Rebuild the webhook routing table once changes to a message source are committed
+    """
+    transaction.on_commit(get_webhook_router().invalidate)
@@ -1,3 +1,517 @@
-from django.test import TestCase
+import base64
+import os
+import shutil
+import socket
+import tempfile
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.throttling import UserRateThrottle
+
+from core import codec
+from . import dedup, routing
+from .extractors import DEFAULT_EXTERNAL_ID_PATHS, compile_external_id_extractor
+from .ingest import FileIngestBuffer
+from .models import MessageSource, Message
+from .services import MessageReceiverService
+from .views import MessageAPIView
+
+
+@override_settings(
+    CELERY_BROKER_URL='',
+    MESSAGE_RECEIVER_ROUTES_REDIS_URL=None,
+    MESSAGE_RECEIVER_DEDUP_BACKEND='message_receiver.dedup.LocalDedupFilter',
+    MESSAGE_RECEIVER_INGEST_BACKEND=None
+)
+class MessageReceiverTestCase(TestCase):
+    """
+    Base class resetting the process-wide singletons and stubbing out OpenAI processing
+    """
+
+    def setUp(self):
+        routing._webhook_router = None
+        dedup._dedup_filter = None
+        self.addCleanup(setattr, routing, '_webhook_router', None)
+        self.addCleanup(setattr, dedup, '_dedup_filter', None)
+
+        patcher = mock.patch.object(MessageReceiverService, 'process_message')
+        self.process_message = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.service = MessageReceiverService()
+
+
+class WebhookRouterTests(MessageReceiverTestCase):
+
+    def test_unresponsive_redis_does_not_hold_up_routing(self):
+        # Accepts connections but never answers
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen()
+        self.addCleanup(server.close)
+
+        MessageSource.objects.create(name='hooks', source_type='webhook', webhook_url_path='hooks')
+        router = routing.WebhookRouter(
+            redis_url=f"redis://127.0.0.1:{server.getsockname()[1]}/0", check_interval=0, redis_timeout=0.1
+        )
+
+        started = time.monotonic()
+        with self.assertLogs('api_hub.message_receiver.routing', 'ERROR'):
+            route = router.resolve('hooks')
+            router.resolve('hooks')
+
+        self.assertEqual(route.source.name, 'hooks')
+        self.assertLess(time.monotonic() - started, 2)
+
+    async def test_async_reload_closes_the_thread_connection(self):
+        router = routing.WebhookRouter(check_interval=0)
+
+        with mock.patch.object(router, 'resolve', return_value=None) as resolve, \
+                mock.patch('core.db.close_old_connections') as close_old_connections:
+            await router.aresolve('hooks')
+
+        resolve.assert_called_once_with('hooks')
+        self.assertEqual(close_old_connections.call_count, 2)
+
+
+class WebhookBatchTests(MessageReceiverTestCase):
+
+    def test_header_external_id_is_not_applied_to_batch_items(self):
+        source = MessageSource.objects.create(
+            name='hooks', source_type='webhook', webhook_url_path='hooks',
+            config={'external_id_path': ['header:X-Delivery-Id', 'id']}
+        )
+
+        messages = self.service.process_webhook_batch(
+            'hooks', [{'id': 'a'}, {'id': 'b'}, {'text': 'no id'}], {'X-Delivery-Id': 'batch-1'}
+        )
+
+        self.assertEqual(len({message.id for message in messages}), 3)
+        self.assertEqual([message.external_id for message in messages], ['a', 'b', None])
+        self.assertEqual(Message.objects.filter(source=source).count(), 3)
+
+
+class DeduplicationTests(MessageReceiverTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.source = MessageSource.objects.create(name='api', source_type='api')
+
+    def test_numeric_external_id_is_deduplicated(self):
+        first = self.service.receive_message(self.source, {'a': 1}, 123)
+        # Forget it in the filter so the unique constraint has to catch the redelivery
+        dedup.get_dedup_filter().clear()
+        second = self.service.receive_message(self.source, {'a': 1}, 123)
+
+        self.assertEqual(first.external_id, '123')
+        self.assertTrue(second.duplicate)
+        self.assertEqual(second.id, first.id)
+
+    def test_numeric_external_id_is_deduplicated_in_batches(self):
+        first = self.service.receive_message(self.source, {'a': 1}, 7)
+        dedup.get_dedup_filter().clear()
+        messages = self.service.receive_messages(self.source, [{'content': {'a': 1}, 'external_id': 7}])
+
+        self.assertTrue(messages[0].duplicate)
+        self.assertEqual(messages[0].id, first.id)
+
+    async def test_numeric_external_id_is_deduplicated_async(self):
+        first = await self.service.areceive_message(self.source, {'a': 1}, 5)
+        dedup.get_dedup_filter().clear()
+        second = await self.service.areceive_message(self.source, {'a': 1}, 5)
+
+        self.assertTrue(second.duplicate)
+        self.assertEqual(second.id, first.id)
+
+    def test_redelivery_known_to_the_filter_needs_no_insert(self):
+        first = self.service.receive_message(self.source, {'a': 1}, 'x')
+
+        with self.assertNumQueries(1):
+            second = self.service.receive_message(self.source, {'a': 1}, 'x')
+
+        self.assertTrue(second.duplicate)
+        self.assertEqual(second.id, first.id)
+        self.assertEqual(Message.objects.filter(source=self.source).count(), 1)
+
+    def test_repeats_within_a_batch_are_stored_once(self):
+        messages = self.service.receive_messages(self.source, [
+            {'content': {'n': 0}, 'external_id': 'a'},
+            {'content': {'n': 1}, 'external_id': 'b'},
+            {'content': {'n': 2}, 'external_id': 'a'},
+            {'content': {'n': 3}},
+        ])
+
+        self.assertIs(messages[2], messages[0])
+        self.assertFalse(any(message.duplicate for message in messages))
+        self.assertEqual(Message.objects.filter(source=self.source).count(), 3)
+
+    def test_queue_messages_skips_redeliveries_and_repeats(self):
+        self.service.receive_message(self.source, {'a': 1}, 'old')
+        messages = self.service.receive_messages(self.source, [
+            {'content': {'n': 0}, 'external_id': 'old'},
+            {'content': {'n': 1}, 'external_id': 'new'},
+            {'content': {'n': 2}, 'external_id': 'new'},
+        ])
+
+        self.service.queue_messages(messages)
+
+        self.assertEqual(self.process_message.call_args_list, [mock.call(messages[1])])
+
+    def test_webhook_redelivery_is_not_processed_again(self):
+        MessageSource.objects.create(
+            name='hooks', source_type='webhook', webhook_url_path='hooks', config={'external_id_path': ['id']}
+        )
+        # The async view resolves routes on a worker thread, outside the test transaction
+        routing.get_webhook_router().resolve('hooks')
+
+        first = self.client.post('/webhook/hooks/', data={'id': 'd1'}, content_type='application/json')
+        second = self.client.post('/webhook/hooks/', data={'id': 'd1'}, content_type='application/json')
+
+        self.assertNotIn('duplicate', first.json())
+        self.assertTrue(second.json()['duplicate'])
+        self.assertEqual(second.json()['message_id'], first.json()['message_id'])
+        self.assertEqual(self.process_message.call_count, 1)
+
+
+class LocalDedupFilterTests(SimpleTestCase):
+
+    def test_external_ids_are_forgotten_after_the_window(self):
+        dedup_filter = dedup.LocalDedupFilter(window=60)
+        dedup_filter.add(1, 'a', 10)
+
+        self.assertEqual(dedup_filter.get(1, 'a'), 10)
+        self.assertIsNone(dedup_filter.get(2, 'a'))
+        with mock.patch('message_receiver.dedup.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(dedup_filter.get(1, 'a'))
+
+    def test_least_recently_added_entries_are_evicted(self):
+        dedup_filter = dedup.LocalDedupFilter(max_entries=2)
+        dedup_filter.add_many(1, {'a': 1, 'b': 2})
+        dedup_filter.add(1, 'a', 1)
+        dedup_filter.add(1, 'c', 3)
+
+        self.assertEqual(dedup_filter.get_many(1, ['a', 'b', 'c']), {'a': 1, 'c': 3})
+
+
+class BatchEndpointTests(MessageReceiverTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.source = MessageSource.objects.create(
+            name='hooks', source_type='webhook', webhook_url_path='hooks', config={'external_id_path': ['id']}
+        )
+
+    def post_batch(self, body):
+        return self.client.post('/webhook/hooks/batch/', data=body, content_type='application/json')
+
+    def test_webhook_batch_accepts_json_arrays_and_ndjson(self):
+        array = self.post_batch(codec.dumps([{'id': 'a'}, {'id': 'b'}]))
+        ndjson = self.post_batch(b'{"id": "c"}\n\n{"id": "a"}\n')
+
+        self.assertEqual(array.json()['duplicates'], 0)
+        self.assertEqual(ndjson.json()['duplicates'], 1)
+        self.assertEqual(ndjson.json()['message_ids'][1], array.json()['message_ids'][0])
+        self.assertEqual(
+            sorted(Message.objects.filter(source=self.source).values_list('external_id', flat=True)),
+            ['a', 'b', 'c']
+        )
+        self.assertEqual(self.process_message.call_count, 3)
+
+    def test_webhook_batch_rejects_empty_and_invalid_bodies(self):
+        for body in (b'[]', b'', b'{"id": "a"}\nnot json'):
+            with self.subTest(body=body):
+                self.assertEqual(self.post_batch(body).status_code, 400)
+
+        self.assertFalse(Message.objects.exists())
+
+    def test_api_batch_counts_duplicates(self):
+        self.client.force_login(User.objects.create_user('api'))
+        data = {'source_id': self.source.id, 'messages': [
+            {'content': {'n': 0}, 'external_id': 'a'},
+            {'content': {'n': 1}, 'external_id': 'a'},
+            {'content': {'n': 2}},
+        ]}
+
+        response = self.client.post('/api/messages/batch/', data=data, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['duplicates'], 1)
+        self.assertEqual(Message.objects.filter(source=self.source).count(), 2)
+        self.assertEqual(self.process_message.call_count, 2)
+
+    @override_settings(MESSAGE_RECEIVER_BULK_CREATE_SIZE=20)
+    def test_batch_is_stored_with_bulk_inserts(self):
+        items = [{'content': {'n': n}, 'external_id': str(n)} for n in range(50)]
+
+        with CaptureQueriesContext(connection) as queries:
+            messages = self.service.receive_messages(self.source, items)
+
+        inserts = [query for query in queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual([message.external_id for message in messages], [str(n) for n in range(50)])
+        self.assertTrue(all(message.pk for message in messages))
+
+    @override_settings(MESSAGE_RECEIVER_BATCH_MAX_SIZE=2)
+    def test_oversized_batches_are_rejected(self):
+        response = self.post_batch(codec.dumps([{'id': 'a'}, {'id': 'b'}, {'id': 'c'}]))
+
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Message.objects.exists())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AsyncAPIViewTests(MessageReceiverTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.source = MessageSource.objects.create(name='api', source_type='api')
+        self.process_message.return_value = mock.Mock(function_name='create_ticket', processing_time=0.5)
+        User.objects.create_user('api', password='secret')
+
+    def post_message(self, **extra):
+        data = {'source_id': self.source.id, 'content': {'text': 'hello'}, 'external_id': 'm1'}
+        return self.client.post('/api/messages/', data=data, content_type='application/json', **extra)
+
+    def test_message_is_received_and_processed(self):
+        self.client.force_login(User.objects.get(username='api'))
+
+        response = self.post_message()
+        duplicate = self.post_message()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['processed']['function_name'], 'create_ticket')
+        self.assertTrue(duplicate.json()['duplicate'])
+        self.assertEqual(duplicate.json()['message_id'], response.json()['message_id'])
+
+        status = self.client.get(f"/api/messages/{response.json()['message_id']}/")
+        self.assertEqual(status.json()['message']['external_id'], 'm1')
+
+    def test_unauthenticated_requests_are_rejected(self):
+        for response in (self.post_message(), self.client.get('/api/messages/1/')):
+            with self.subTest(path=response.request['PATH_INFO']):
+                self.assertEqual(response.status_code, 403)
+                self.assertEqual(response.json(), {'detail': "Authentication credentials were not provided."})
+
+        self.assertFalse(Message.objects.exists())
+
+    def test_basic_authentication_is_challenged(self):
+        with mock.patch.object(MessageAPIView, 'authentication_classes', [BasicAuthentication]):
+            missing = self.post_message()
+            wrong = self.post_message(HTTP_AUTHORIZATION=self.basic_auth('wrong'))
+            valid = self.post_message(HTTP_AUTHORIZATION=self.basic_auth('secret'))
+
+        for response in (missing, wrong):
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response['WWW-Authenticate'], 'Basic realm="api"')
+        self.assertEqual(wrong.json(), {'detail': "Invalid username/password."})
+        self.assertEqual(valid.status_code, 200)
+
+    def test_requests_are_throttled(self):
+        class Throttle(UserRateThrottle):
+            rate = '1/min'
+
+        self.client.force_login(User.objects.get(username='api'))
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        with mock.patch.object(MessageAPIView, 'throttle_classes', [Throttle]):
+            self.assertEqual(self.post_message().status_code, 200)
+            response = self.post_message()
+
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    @staticmethod
+    def basic_auth(password):
+        return 'Basic ' + base64.b64encode(f'api:{password}'.encode()).decode()
+
+
+class ExternalIdExtractorTests(TestCase):
+
+    PAYLOADS = {
+        'sentry': [
+            {'event_id': 'e1', 'id': 'i1'},
+            {'event_id': '', 'id': 7},
+            {'event_id': {'nested': 1}, 'event': {'event_id': None, 'id': 'i2'}},
+            {'event': 'not an object'},
+            ['not', 'an', 'object'],
+        ],
+        'whatsapp': [
+            {'entry': [{'changes': [{'value': {'messages': [{'id': 'wamid.1'}]}}]}]},
+            {'entry': [
+                {'changes': [{'value': {'statuses': [{'id': 'status'}]}}, 'junk']},
+                {'changes': [{'value': {'messages': [{}, {'id': 42}]}}]},
+            ]},
+            {'entry': [{'changes': [{'value': {'messages': 'not a list'}}]}]},
+            {'entry': {'not': 'a list'}},
+            {},
+        ],
+    }
+
+    def test_built_in_extractors_match_the_default_paths(self):
+        for source_type, payloads in self.PAYLOADS.items():
+            built_in = compile_external_id_extractor(source_type)
+            generic = compile_external_id_extractor('webhook', list(DEFAULT_EXTERNAL_ID_PATHS[source_type]))
+            for payload in payloads:
+                with self.subTest(source_type=source_type, payload=payload):
+                    self.assertEqual(built_in(payload), generic(payload))
+
+    def test_configured_paths_are_tried_before_the_defaults(self):
+        extract = compile_external_id_extractor('sentry', ['header:X-Id', 'data.id'])
+
+        self.assertEqual(extract({'event_id': 'e1', 'data': {'id': 'd1'}}, {'x-id': 'h1'}), 'h1')
+        self.assertEqual(extract({'event_id': 'e1', 'data': {'id': 'd1'}}), 'd1')
+        self.assertEqual(extract({'event_id': 'e1'}), 'e1')
+
+
+class FileIngestBufferTests(MessageReceiverTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.source = MessageSource.objects.create(name='hooks', source_type='webhook', webhook_url_path='hooks')
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        # Drain only when the test says so
+        self.buffer = FileIngestBuffer(directory=self.directory, drain_interval=3600, batch_size=10)
+        self.receive_webhooks = MessageReceiverService.receive_webhooks
+
+    def append(self, *bodies):
+        for body in bodies:
+            self.buffer.append('hooks', {}, codec.dumps(body))
+
+    def stored(self):
+        return sorted(message.content['n'] for message in Message.objects.filter(source=self.source))
+
+    def test_drain_stores_deliveries_and_removes_segments(self):
+        self.append(*({'n': n} for n in range(25)))
+
+        self.assertEqual(self.buffer.drain(), 25)
+        self.assertEqual(self.stored(), list(range(25)))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_poison_delivery_is_dead_lettered(self):
+        receive_webhooks = self.receive_webhooks
+
+        def fail_on_poison(service, records):
+            if any('poison' in record['body'] for record in records):
+                raise ValueError("bad delivery")
+            return receive_webhooks(service, records)
+
+        self.append({'n': 0}, {'n': 1, 'poison': True}, {'n': 2})
+        with mock.patch.object(MessageReceiverService, 'receive_webhooks', fail_on_poison):
+            self.buffer.drain()
+            # Deliveries appended after the poison one are not held up
+            self.append({'n': 3})
+            self.buffer.drain()
+
+        self.assertEqual(self.stored(), [0, 2, 3])
+        with open(self.buffer.dead_letter_path, 'rb') as f:
+            dead_letters = [codec.loads(line) for line in f]
+        self.assertEqual(len(dead_letters), 1)
+        self.assertEqual(codec.loads(dead_letters[0]['record']['body']), {'n': 1, 'poison': True})
+        self.assertEqual(dead_letters[0]['error'], "bad delivery")
+
+    def test_deliveries_are_kept_while_the_database_is_down(self):
+        self.append({'n': 0}, {'n': 1})
+        with mock.patch.object(MessageReceiverService, 'receive_webhooks', side_effect=OperationalError("down")):
+            self.assertEqual(self.buffer.drain(), 0)
+
+        self.assertEqual(self.stored(), [])
+        self.assertFalse(os.path.exists(self.buffer.dead_letter_path))
+
+        self.append({'n': 2})
+        self.assertEqual(self.buffer.drain(), 3)
+        self.assertEqual(self.stored(), [0, 1, 2])
+
+    def test_drain_thread_survives_errors(self):
+        self.buffer.drain_interval = 0
+        calls = []
+
+        def drain():
+            calls.append(1)
+            if len(calls) == 1:
+                raise ConnectionError("redis down")
+            raise SystemExit
+
+        with mock.patch.object(self.buffer, 'drain', drain), mock.patch('message_receiver.ingest.connections'):
+            with self.assertRaises(SystemExit):
+                self.buffer._run()
+
+        self.assertEqual(len(calls), 2)
+
+    def test_segments_of_dead_processes_are_drained(self):
+        # Left behind mid-write by a process that died, its last record cut short
+        with open(os.path.join(self.directory, '999999.log'), 'wb') as f:
+            f.write(codec.dumpb({'path': 'hooks', 'headers': {}, 'body': codec.dumps({'n': 0})}) + b'\n')
+            f.write(b'{"path": "hoo')
+
+        with mock.patch('message_receiver.ingest._is_running', return_value=False), \
+                self.assertLogs('api_hub.message_receiver.ingest', 'ERROR'):
+            self.assertEqual(self.buffer.drain(), 1)
+
+        self.assertEqual(self.stored(), [0])
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_webhook_is_acknowledged_before_it_is_stored(self):
+        routing.get_webhook_router().resolve('hooks')
+
+        with mock.patch('message_receiver.views.get_ingest_buffer', return_value=self.buffer):
+            response = self.client.post('/webhook/hooks/', data={'n': 0}, content_type='application/json')
+            unknown = self.client.post('/webhook/other/', data={'n': 1}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(unknown.status_code, 404)
+        self.assertEqual(self.stored(), [])
+
+        self.assertEqual(self.buffer.drain(), 1)
+        self.assertEqual(self.stored(), [0])
+        self.assertEqual(self.process_message.call_count, 1)
+
+
+class DuplicateExternalIdMigrationTests(TransactionTestCase):
+
+    before = [('message_receiver', '0002_alter_messagesource_webhook_url_path')]
+    after = [('message_receiver', '0003_message_unique_source_external_id')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_cleared_external_ids_are_kept_and_restored(self):
+        apps = self.migrate(self.before)
+        self.addCleanup(self.migrate, MigrationExecutor(connection).loader.graph.leaf_nodes())
+        source = apps.get_model('message_receiver', 'MessageSource').objects.create(name='hooks', source_type='webhook')
+        Message = apps.get_model('message_receiver', 'Message')
+        first, second, third = (
+            Message.objects.create(source=source, content={}, external_id='a', status_message=status_message)
+            for status_message in (None, None, 'failed')
+        )
+
+        with self.assertLogs('api_hub.message_receiver.migrations', 'WARNING'):
+            apps = self.migrate(self.after)
+        Message = apps.get_model('message_receiver', 'Message')
+
+        self.assertEqual(Message.objects.get(pk=first.pk).external_id, 'a')
+        cleared = Message.objects.filter(pk__in=[second.pk, third.pk]).order_by('pk')
+        self.assertEqual([message.external_id for message in cleared], [None, None])
+        self.assertEqual([message.status_message for message in cleared], [
+            "Duplicate external ID cleared by migration 0003: a",
+            "Duplicate external ID cleared by migration 0003: a\nfailed",
+        ])
+
+        apps = self.migrate(self.before)
+        Message = apps.get_model('message_receiver', 'Message')
+
+        restored = Message.objects.order_by('pk')
+        self.assertEqual([message.external_id for message in restored], ['a', 'a', 'a'])
+        self.assertEqual([message.status_message for message in restored], [None, None, 'failed'])
 
-# Create your tests here.
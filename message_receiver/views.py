@@ -1,7 +1,7 @@
-import json
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 
+from asgiref.sync import sync_to_async
 from django.http import JsonResponse, HttpRequest, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
@@ -10,20 +10,27 @@ from django.conf import settings
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
+from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import exceptions, status
 
+from core import codec
 from .models import MessageSource, Message
+from .ingest import get_ingest_buffer
+from .routing import get_webhook_router
 from .services import MessageReceiverService
 
 logger = logging.getLogger('api_hub.message_receiver.views')
 
 @csrf_exempt
 @require_http_methods(["POST"])
-def webhook_receiver(request: HttpRequest, path: str) -> HttpResponse:
+async def webhook_receiver(request: HttpRequest, path: str) -> HttpResponse:
     """
     Generic webhook receiver for all webhook-based message sources
     
+    Async, so under ASGI a burst of deliveries does not tie up a thread
+    per connection.
+    
     Args:
         request: HTTP request
         path: Webhook path
@@ -32,10 +39,17 @@ def webhook_receiver(request: HttpRequest, path: str) -> HttpResponse:
         HTTP response
     """
     try:
+        # In ack-fast mode only buffer the delivery; storing and processing happen in the background
+        buffer = get_ingest_buffer()
+        if buffer is not None:
+            response = await _buffer_webhook(buffer, request, path)
+            if response is not None:
+                return response
+        
         # Get request body
         try:
-            body = json.loads(request.body)
-        except json.JSONDecodeError:
+            body = codec.loads(request.body)
+        except codec.DecodeError:
             body = request.body.decode('utf-8')
         
         # Get request headers
@@ -43,9 +57,16 @@ def webhook_receiver(request: HttpRequest, path: str) -> HttpResponse:
         
         # Process the webhook
         service = MessageReceiverService()
-        message = service.process_webhook(path, body, headers)
+        message = await service.aprocess_webhook(path, body, headers)
         
-        if message:
+        if message and message.duplicate:
+            return JsonResponse({
+                'status': 'success',
+                'message': "Webhook already received",
+                'message_id': str(message.id),
+                'duplicate': True
+            })
+        elif message:
             return JsonResponse({
                 'status': 'success',
                 'message': f"Webhook received and processed",
@@ -66,59 +87,268 @@ def webhook_receiver(request: HttpRequest, path: str) -> HttpResponse:
         }, status=500)
 
 
-@api_view(['POST'])
-@permission_classes([IsAuthenticated])
-def api_message_receiver(request: Request) -> Response:
+async def _buffer_webhook(buffer: Any, request: HttpRequest, path: str) -> Optional[HttpResponse]:
+    """
+    Append a webhook delivery to the ingest buffer
+    
+    Args:
+        buffer: Ingest buffer
+        request: HTTP request
+        path: Webhook path
+        
+    Returns:
+        HTTP response, or None to handle the delivery synchronously because the buffer is unavailable
+    """
+    if await get_webhook_router().aresolve(path) is None:
+        logger.warning(f"No active message source found for webhook path: {path}")
+        return JsonResponse({
+            'status': 'error',
+            'message': f"No message source found for webhook path: {path}"
+        }, status=404)
+    
+    try:
+        body = request.body.decode('utf-8')
+    except UnicodeDecodeError:
+        return JsonResponse({'status': 'error', 'message': "Body is not valid UTF-8"}, status=400)
+    
+    try:
+        await buffer.aappend(path, dict(request.headers), body)
+    except Exception as e:
+        logger.exception(f"Error buffering webhook, handling it synchronously: {str(e)}")
+        return None
+    
+    return JsonResponse({'status': 'accepted', 'message': "Webhook received"}, status=202)
+
+
+def _parse_batch(body: bytes) -> List[Any]:
+    """
+    Parse the body of a batch request
+    
+    Args:
+        body: JSON array, or newline-delimited JSON (one payload per line)
+        
+    Returns:
+        List of payloads
+        
+    Raises:
+        ValueError: If the body or one of its lines is not valid JSON
+    """
+    if body.lstrip().startswith(b'['):
+        try:
+            return codec.loads(body)
+        except codec.DecodeError as e:
+            raise ValueError(f"Invalid JSON array: {str(e)}")
+    
+    payloads = []
+    for number, line in enumerate(body.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            payloads.append(codec.loads(line))
+        except codec.DecodeError as e:
+            raise ValueError(f"Invalid JSON on line {number}: {str(e)}")
+    return payloads
+
+
+def _check_batch_size(count: int) -> Optional[Tuple[Dict[str, Any], int]]:
+    """
+    Validate the number of messages in a batch request
+    
+    Args:
+        count: Number of messages
+        
+    Returns:
+        Tuple of (error response data, status code), or None if the batch is valid
+    """
+    max_size = getattr(settings, 'MESSAGE_RECEIVER_BATCH_MAX_SIZE', 10000)
+    if not count:
+        return {'status': 'error', 'message': "Empty batch"}, 400
+    if count > max_size:
+        return {'status': 'error', 'message': f"Batch of {count} messages exceeds the limit of {max_size}"}, 413
+    return None
+
+
+def _count_duplicates(messages: List[Message]) -> int:
+    """
+    Count the items of a batch that were not stored because their external ID was already received
+    
+    Args:
+        messages: Messages returned by receive_messages
+        
+    Returns:
+        Number of redeliveries and repeats within the batch
+    """
+    return len(messages) - len({message.id for message in messages if not message.duplicate})
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def webhook_batch_receiver(request: HttpRequest, path: str) -> HttpResponse:
+    """
+    Webhook receiver for batches of payloads (e.g. an upstream replaying its backlog)
+    
+    The body is a JSON array or newline-delimited JSON; each payload is
+    stored as a message as if it had been sent to webhook_receiver.
+    
+    Args:
+        request: HTTP request
+        path: Webhook path
+        
+    Returns:
+        HTTP response
+    """
+    try:
+        # Read the body directly, batches are larger than DATA_UPLOAD_MAX_MEMORY_SIZE allows for request.body
+        max_bytes = getattr(settings, 'MESSAGE_RECEIVER_BATCH_MAX_BYTES', 50 * 1024 * 1024)
+        body = request.read(max_bytes + 1)
+        if len(body) > max_bytes:
+            return JsonResponse({
+                'status': 'error',
+                'message': f"Batch exceeds the limit of {max_bytes} bytes"
+            }, status=413)
+        
+        # Parse the batch
+        try:
+            payloads = _parse_batch(body)
+        except ValueError as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+        
+        error = _check_batch_size(len(payloads))
+        if error:
+            return JsonResponse(error[0], status=error[1])
+        
+        # Get request headers
+        headers = {key: value for key, value in request.headers.items()}
+        
+        # Process the batch
+        service = MessageReceiverService()
+        messages = service.process_webhook_batch(path, payloads, headers)
+        
+        if messages is None:
+            return JsonResponse({
+                'status': 'error',
+                'message': f"No message source found for webhook path: {path}"
+            }, status=404)
+        
+        return JsonResponse({
+            'status': 'success',
+            'message': f"Received {len(messages)} messages",
+            'message_ids': [str(message.id) for message in messages],
+            'duplicates': _count_duplicates(messages)
+        })
+            
+    except Exception as e:
+        logger.exception(f"Error processing webhook batch: {str(e)}")
+        
+        return JsonResponse({
+            'status': 'error',
+            'message': f"Error processing webhook batch: {str(e)}"
+        }, status=500)
+
+
+class MessageAPIView(APIView):
+    """
+    REST framework policies of the async API views
+
+    Not routed: the async views run its authentication, permission and
+    throttle checks through _aauthenticate, since the REST framework
+    does not support async views.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+
+async def _aauthenticate(request: HttpRequest, parse_data: bool = False) -> Tuple[Optional[HttpResponse], Any]:
+    """
+    Run the REST framework checks of an async API view
+    
+    The request goes through MessageAPIView.initial (content negotiation,
+    authentication, permissions and throttling) in a thread, since those
+    query the database, and errors are rendered by the view's exception
+    handler, so responses are the same as from a REST framework view.
+    
+    Args:
+        request: HTTP request
+        parse_data: Also parse the request body with the REST framework parsers
+        
+    Returns:
+        Tuple of (error response or None, parsed request data)
+    """
+    def check():
+        view = MessageAPIView()
+        view.setup(request)
+        drf_request = view.initialize_request(request)
+        view.request = drf_request
+        view.headers = view.default_response_headers
+        
+        try:
+            view.initial(drf_request)
+            return None, drf_request.data if parse_data else None
+        except exceptions.APIException as e:
+            response = view.finalize_response(drf_request, view.handle_exception(e))
+            return response.render(), None
+    
+    return await sync_to_async(check)()
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def api_message_receiver(request: HttpRequest) -> HttpResponse:
     """
     API endpoint for receiving messages
     
     Args:
-        request: REST framework request
+        request: HTTP request
         
     Returns:
-        REST framework response
+        HTTP response
     """
+    error, data = await _aauthenticate(request, parse_data=True)
+    if error:
+        return error
+    
     try:
         # Validate request data
-        source_id = request.data.get('source_id')
-        content = request.data.get('content')
-        external_id = request.data.get('external_id')
-        priority = request.data.get('priority', 0)
+        source_id = data.get('source_id')
+        content = data.get('content')
+        external_id = data.get('external_id')
+        priority = data.get('priority', 0)
         
         if not source_id:
-            return Response({
+            return JsonResponse({
                 'status': 'error',
                 'message': "Missing required field: source_id"
             }, status=status.HTTP_400_BAD_REQUEST)
             
         if not content:
-            return Response({
+            return JsonResponse({
                 'status': 'error',
                 'message': "Missing required field: content"
             }, status=status.HTTP_400_BAD_REQUEST)
         
         # Get the message source
         try:
-            source = MessageSource.objects.get(id=source_id, is_active=True)
+            source = await MessageSource.objects.aget(id=source_id, is_active=True)
         except MessageSource.DoesNotExist:
-            return Response({
+            return JsonResponse({
                 'status': 'error',
                 'message': f"Message source not found: {source_id}"
             }, status=status.HTTP_404_NOT_FOUND)
         
-        # Process the message
+        # Receive the message and process it asynchronously if Celery is configured
         service = MessageReceiverService()
-        message = service.receive_message(source, content, external_id, priority)
+        message = await service.areceive_message(source, content, external_id, priority)
+        if message.duplicate:
+            return JsonResponse({
+                'status': 'success',
+                'message': "Message already received",
+                'message_id': str(message.id),
+                'duplicate': True
+            })
+        processed = await service.aqueue_message(message)
         
-        # Process the message asynchronously if Celery is configured
-        if hasattr(settings, 'CELERY_BROKER_URL') and settings.CELERY_BROKER_URL:
-            from .tasks import process_message_task
-            process_message_task.delay(message.id)
-        else:
-            # Process synchronously
-            processed = service.process_message(message)
-            
-            return Response({
+        if processed is not None:
+            return JsonResponse({
                 'status': 'success',
                 'message': "Message received and processed",
                 'message_id': str(message.id),
@@ -128,7 +358,7 @@ def api_message_receiver(request: Request) -> Response:
                 }
             })
         
-        return Response({
+        return JsonResponse({
             'status': 'success',
             'message': "Message received and queued for processing",
             'message_id': str(message.id)
@@ -137,31 +367,106 @@ def api_message_receiver(request: Request) -> Response:
     except Exception as e:
         logger.exception(f"Error receiving message: {str(e)}")
         
-        return Response({
+        return JsonResponse({
             'status': 'error',
             'message': f"Error receiving message: {str(e)}"
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-@api_view(['GET'])
+@api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def message_status(request: Request, message_id: str) -> Response:
+def api_message_batch_receiver(request: Request) -> Response:
     """
-    Get the status of a message
+    API endpoint for receiving a batch of messages from one source
+    
+    Expects {"source_id": ..., "messages": [{"content": ..., "external_id": ..., "priority": ...}, ...]}.
     
     Args:
         request: REST framework request
-        message_id: Message ID
         
     Returns:
         REST framework response
     """
     try:
-        # Get the message
+        # Validate request data
+        source_id = request.data.get('source_id')
+        items = request.data.get('messages')
+        
+        if not source_id:
+            return Response({
+                'status': 'error',
+                'message': "Missing required field: source_id"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not isinstance(items, list):
+            return Response({
+                'status': 'error',
+                'message': "Missing required field: messages"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        error = _check_batch_size(len(items))
+        if error:
+            return Response(error[0], status=error[1])
+        
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or not item.get('content'):
+                return Response({
+                    'status': 'error',
+                    'message': f"Missing required field: messages[{index}].content"
+                }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Get the message source
         try:
-            message = Message.objects.get(id=message_id)
-        except Message.DoesNotExist:
+            source = MessageSource.objects.get(id=source_id, is_active=True)
+        except MessageSource.DoesNotExist:
             return Response({
+                'status': 'error',
+                'message': f"Message source not found: {source_id}"
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        # Receive the messages and queue them for processing
+        service = MessageReceiverService()
+        messages = service.receive_messages(source, items)
+        service.queue_messages(messages)
+        
+        return Response({
+            'status': 'success',
+            'message': f"Received {len(messages)} messages",
+            'message_ids': [str(message.id) for message in messages],
+            'duplicates': _count_duplicates(messages)
+        })
+            
+    except Exception as e:
+        logger.exception(f"Error receiving message batch: {str(e)}")
+        
+        return Response({
+            'status': 'error',
+            'message': f"Error receiving message batch: {str(e)}"
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@require_http_methods(["GET"])
+async def message_status(request: HttpRequest, message_id: str) -> HttpResponse:
+    """
+    Get the status of a message
+    
+    Args:
+        request: HTTP request
+        message_id: Message ID
+        
+    Returns:
+        HTTP response
+    """
+    error, _ = await _aauthenticate(request)
+    if error:
+        return error
+    
+    try:
+        # Get the message with its source and result in one query
+        try:
+            message = await Message.objects.select_related('source', 'processed_result').aget(id=message_id)
+        except Message.DoesNotExist:
+            return JsonResponse({
                 'status': 'error',
                 'message': f"Message not found: {message_id}"
             }, status=status.HTTP_404_NOT_FOUND)
@@ -181,7 +486,7 @@ def message_status(request: Request, message_id: str) -> Response:
             pass
         
         # Return message status
-        return Response({
+        return JsonResponse({
             'status': 'success',
             'message': {
                 'id': str(message.id),
@@ -202,7 +507,7 @@ def message_status(request: Request, message_id: str) -> Response:
     except Exception as e:
         logger.exception(f"Error getting message status: {str(e)}")
         
-        return Response({
+        return JsonResponse({
             'status': 'error',
             'message': f"Error getting message status: {str(e)}"
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
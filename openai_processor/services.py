@@ -1,4 +1,3 @@
-import json
 import logging
 import time
 from typing import Dict, List, Optional, Tuple, Any, Union
@@ -8,6 +7,8 @@ from openai import OpenAI
 from openai.types.chat import ChatCompletion
 
 from api_connector.models import FunctionDefinition
+from core import codec
+from core.mapping import get_parameter_mapper
 from message_receiver.models import Message, ProcessedMessage
 from .models import PromptTemplate, FunctionCallLog, AIModelConfiguration
 
@@ -104,7 +105,7 @@ class OpenAIService:
             if response.choices[0].message.function_call:
                 function_call = response.choices[0].message.function_call
                 function_name = function_call.name
-                function_args = json.loads(function_call.arguments)
+                function_args = codec.loads(function_call.arguments)
                 
                 # Execute the function
                 api_request, api_response = self._execute_function(function_name, function_args, message)
@@ -195,7 +196,7 @@ class OpenAIService:
                     return "\n".join(parts)
             
             # If we can't find a specific field, convert the whole content to string
-            return json.dumps(content, indent=2)
+            return codec.dumps(content, indent=True)
         
         # If content is already a string
         if isinstance(content, str):
@@ -228,9 +229,12 @@ class OpenAIService:
             'source_type': message.source.get_source_type_display(),
             'external_id': message.external_id or '',
             'received_at': message.received_at.isoformat(),
-            'raw_content': json.dumps(message.content, indent=2),
         }
         
+        # Serializing the raw content is the expensive part, only do it when used
+        if '{{raw_content}}' in user_prompt:
+            context['raw_content'] = codec.dumps(message.content, indent=True)
+        
         # Simple placeholder replacement
         for key, value in context.items():
             user_prompt = user_prompt.replace(f"{{{{{key}}}}}", str(value))
@@ -362,7 +366,7 @@ class OpenAIService:
             api_config = endpoint.api_config
             
             # Map function arguments to API request
-            mapped_args = self._map_function_args(func_def, function_args)
+            mapped_args = get_parameter_mapper(func_def)(function_args)
             
             # Build the request
             request = {
@@ -399,71 +403,3 @@ class OpenAIService:
             function_call.save()
             
             return None, {'error': str(e)}
-    
-    def _map_function_args(
-        self, 
-        func_def: FunctionDefinition, 
-        function_args: Dict[str, Any]
-    ) -> Dict[str, Any]:
-        """
-        Map function arguments to API request parameters
-        
-        Args:
-            func_def: Function definition
-            function_args: Arguments from OpenAI
-            
-        Returns:
-            Mapped arguments for the API request
-        """
-        # If no mapping is defined, use the arguments as-is
-        if not func_def.parameter_mapping:
-            return function_args
-        
-        # Apply the mapping
-        mapped_args = {}
-        
-        for target_key, source_path in func_def.parameter_mapping.items():
-            # Handle simple key mapping
-            if isinstance(source_path, str) and source_path in function_args:
-                mapped_args[target_key] = function_args[source_path]
-            
-            # Handle nested paths (e.g., "user.name")
-            elif isinstance(source_path, str) and '.' in source_path:
-                parts = source_path.split('.')
-                value = function_args
-                for part in parts:
-                    if isinstance(value, dict) and part in value:
-                        value = value[part]
-                    else:
-                        value = None
-                        break
-                if value is not None:
-                    mapped_args[target_key] = value
-            
-            # Handle template strings (e.g., "{user.name} <{user.email}>")
-            elif isinstance(source_path, str) and '{' in source_path:
-                template = source_path
-                for arg_name, arg_value in function_args.items():
-                    if isinstance(arg_value, (str, int, float, bool)):
-                        template = template.replace(f"{{{arg_name}}}", str(arg_value))
-                mapped_args[target_key] = template
-            
-            # Handle static values
-            elif isinstance(source_path, dict) and 'static' in source_path:
-                mapped_args[target_key] = source_path['static']
-            
-            # Handle transformations
-            elif isinstance(source_path, dict) and 'transform' in source_path:
-                if source_path['transform'] == 'join' and 'fields' in source_path and 'separator' in source_path:
-                    values = []
-                    for field in source_path['fields']:
-                        if field in function_args:
-                            values.append(str(function_args[field]))
-                    mapped_args[target_key] = source_path['separator'].join(values)
-        
-        # Include any unmapped arguments if they match target keys
-        for key, value in function_args.items():
-            if key not in func_def.parameter_mapping and key not in mapped_args:
-                mapped_args[key] = value
-        
-        return mapped_args